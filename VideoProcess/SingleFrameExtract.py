@@ -1,9 +1,17 @@
 import cv2
 import os
+import sys
 import numpy as np
 from pathlib import Path
 
-def extract_and_split_frames(video_path, output_dir, frame_width=1280, frame_height=720):
+from encoders import encoder_params
+
+# Progress metrics are shared with the Volumetrize tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Volumetrize"))
+from profiling import start_profiling
+from progress import track
+
+def extract_and_split_frames(video_path, output_dir, frame_width=1280, frame_height=720, encoder='jpg'):
     """
     Extract frames from a vertically concatenated video and split each frame 
     into individual smaller frames.
@@ -13,7 +21,9 @@ def extract_and_split_frames(video_path, output_dir, frame_width=1280, frame_hei
         output_dir (str): Directory to save extracted frames
         frame_width (int): Width of individual small videos (default: 1280)
         frame_height (int): Height of individual small videos (default: 720)
+        encoder (str): Encoder or preset from encoders.py (default: jpg, quality 95)
     """
+    extension, write_params = encoder_params(encoder)
     
     # Create output directory if it doesn't exist
     Path(output_dir).mkdir(parents=True, exist_ok=True)
@@ -44,14 +54,17 @@ def extract_and_split_frames(video_path, output_dir, frame_width=1280, frame_hei
         print(f"Warning: Video height ({video_height}) is not evenly divisible by frame height ({frame_height})")
     
     frame_count = 0
+    tracker = track("split", total_frames)
     
     while True:
-        ret, frame = cap.read()
+        with tracker.time("cap.read"):
+            ret, frame = cap.read()
         
         if not ret:
             break
         
         print(f"Processing frame {frame_count + 1}/{total_frames}", end='\r')
+        written = []
         
         # Split the frame into smaller frames
         for video_idx in range(num_videos):
@@ -64,22 +77,27 @@ def extract_and_split_frames(video_path, output_dir, frame_width=1280, frame_hei
             
             # Create filename for this sub-frame
             # Format: frame_{frame_number}_video_{video_index}.jpg
-            filename = f"frame_{frame_count:06d}_video_{video_idx:02d}.jpg"
+            filename = f"frame_{frame_count:06d}_video_{video_idx:02d}{extension}"
             filepath = os.path.join(output_dir, filename)
             
             # Save the sub-frame
-            cv2.imwrite(filepath, sub_frame)
+            with tracker.time("cv2.imwrite"):
+                cv2.imwrite(filepath, sub_frame, write_params)
+            written.append(filepath)
         
         frame_count += 1
+        tracker.add_files(written)
     
     cap.release()
+    tracker.close()
     print(f"\nCompleted! Extracted {frame_count} frames, split into {num_videos} sub-videos each.")
     print(f"Total images saved: {frame_count * num_videos}")
 
-def extract_and_split_frames_organized(video_path, output_dir, frame_width=1280, frame_height=720):
+def extract_and_split_frames_organized(video_path, output_dir, frame_width=1280, frame_height=720, encoder='jpg'):
     """
     Same as above but organizes output into separate folders for each sub-video.
     """
+    extension, write_params = encoder_params(encoder)
     
     # Create output directory if it doesn't exist
     Path(output_dir).mkdir(parents=True, exist_ok=True)
@@ -114,14 +132,17 @@ def extract_and_split_frames_organized(video_path, output_dir, frame_width=1280,
         video_dirs.append(video_dir)
     
     frame_count = 0
+    tracker = track("split", total_frames)
     
     while True:
-        ret, frame = cap.read()
+        with tracker.time("cap.read"):
+            ret, frame = cap.read()
         
         if not ret:
             break
         
         print(f"Processing frame {frame_count + 1}/{total_frames}", end='\r')
+        written = []
         
         # Split the frame into smaller frames
         for video_idx in range(num_videos):
@@ -133,20 +154,26 @@ def extract_and_split_frames_organized(video_path, output_dir, frame_width=1280,
             sub_frame = frame[y_start:y_end, 0:frame_width]
             
             # Create filename for this sub-frame
-            filename = f"frame_{frame_count:06d}.jpg"
+            filename = f"frame_{frame_count:06d}{extension}"
             filepath = os.path.join(video_dirs[video_idx], filename)
             
             # Save the sub-frame
-            cv2.imwrite(filepath, sub_frame)
+            with tracker.time("cv2.imwrite"):
+                cv2.imwrite(filepath, sub_frame, write_params)
+            written.append(filepath)
         
         frame_count += 1
+        tracker.add_files(written)
     
     cap.release()
+    tracker.close()
     print(f"\nCompleted! Extracted {frame_count} frames, split into {num_videos} sub-videos each.")
     print(f"Total images saved: {frame_count * num_videos}")
 
 # Example usage
 if __name__ == "__main__":
+    start_profiling("SingleFrameExtract")
+    
     # Configuration
     input_video_path = "/Users/yaojie/Desktop/sample.mkv"  # Change this to your video path
     output_directory = "/Users/yaojie/Desktop/output/sample_output"  # Change this to your desired output directory
@@ -157,7 +184,8 @@ if __name__ == "__main__":
         video_path=input_video_path,
         output_dir=output_directory,
         frame_width=1280,
-        frame_height=720
+        frame_height=720,
+        encoder='jpg'  # or a preset: 'fastest', 'balanced', 'smallest' (see encoders.py)
     )
     
     # Option 2: Save frames organized in separate folders for each sub-video
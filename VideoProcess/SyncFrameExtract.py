@@ -1,28 +1,57 @@
 import cv2
 import os
-import glob
+import sys
+import queue
+import shutil
+import threading
+import time
 from pathlib import Path
 import numpy as np
 
-def extract_synchronized_frames(input_folder, output_folder):
+from encoders import encoder_matrix, encoder_params
+from framebuffer import FramePool, frames_for_budget, print_pool_stats
+from rawtrack import find_tracks, open_track
+from SyncOffsets import load_sync_offsets
+
+# The project manifest and progress metrics live with the Volumetrize tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Volumetrize"))
+from manifest import ProjectManifest
+from profiling import stage_boundary, start_profiling
+from progress import track
+
+def get_sync_offsets(input_folder, video_paths):
+    """
+    Frames to skip at the start of each video, from the folder's sync_offsets.json
+    (see SyncOffsets.py). Videos without an entry start at frame 0.
+    """
+    offsets = load_sync_offsets(input_folder)
+    if offsets:
+        print("Applying sync offsets:")
+        for path in video_paths:
+            print(f"  {os.path.basename(path)}: skip {offsets.get(os.path.basename(path), 0)} frames")
+    return [offsets.get(os.path.basename(path), 0) for path in video_paths]
+
+def extract_synchronized_frames(input_folder, output_folder, encoder=None):
     """
     Extract frames from multiple videos simultaneously, organizing by frame number.
+    Sync offsets found in the input folder are applied first.
     
     Args:
-        input_folder (str): Path to folder containing .mp4 videos
+        input_folder (str): Path to folder containing .mp4 videos or .vvraw tracks
         output_folder (str): Path where frame folders will be created
+        encoder (str): Encoder or preset from encoders.py, e.g. 'balanced'
+            (None for PNG with OpenCV's default settings)
     """
+    extension, write_params = ('.png', []) if encoder is None else encoder_params(encoder)
     
     # Create output directory if it doesn't exist
     Path(output_folder).mkdir(parents=True, exist_ok=True)
     
-    # Find all .mp4 files in the input folder
-    video_pattern = os.path.join(input_folder, "*.mp4")
-    video_paths = glob.glob(video_pattern)
-    video_paths.sort()  # Sort for consistent ordering
+    # Find all tracks in the input folder (raw tracks from crop.py take precedence over .mp4)
+    video_paths = find_tracks(input_folder)
     
     if not video_paths:
-        print(f"No .mp4 files found in {input_folder}")
+        print(f"No .mp4 or .vvraw tracks found in {input_folder}")
         return False
     
     print(f"Found {len(video_paths)} video files:")
@@ -36,7 +65,7 @@ def extract_synchronized_frames(input_folder, output_folder):
     
     print("\nOpening video files...")
     for i, video_path in enumerate(video_paths):
-        cap = cv2.VideoCapture(video_path)
+        cap = open_track(video_path)
         if not cap.isOpened():
             print(f"Error: Could not open {video_path}")
             # Clean up already opened captures
@@ -61,13 +90,24 @@ def extract_synchronized_frames(input_folder, output_folder):
         
         print(f"  Video {i:02d}: {frame_count} frames, {fps:.1f} FPS, {width}x{height}")
     
+    # Skip each video's lead-in by decoding it; grab() is exact where seeking is not
+    sync_offsets = get_sync_offsets(input_folder, video_paths)
+    for cap, offset in zip(video_captures, sync_offsets):
+        for _ in range(offset):
+            cap.grab()
+    
     # Determine the minimum frame count (stop when shortest video ends)
-    min_frame_count = min(video_frame_counts)
+    min_frame_count = min(count - offset for count, offset in zip(video_frame_counts, sync_offsets))
     print(f"\nWill extract {min_frame_count} frames (limited by shortest video)")
     print(f"Total images to be created: {min_frame_count * len(video_captures)}")
     
     # Extract frames
     print(f"\nStarting frame extraction...")
+    stage_boundary("videos_opened")
+    
+    # Index each frame folder as it is finished, so later tools need not list it again
+    manifest = ProjectManifest(output_folder)
+    tracker = track("extract", min_frame_count)
     
     try:
         for frame_idx in range(min_frame_count):
@@ -81,24 +121,31 @@ def extract_synchronized_frames(input_folder, output_folder):
                 print(f"Processing frame {frame_idx + 1}/{min_frame_count} ({progress:.1f}%)")
             
             # Extract frame from each video
+            written = []
             for video_idx, cap in enumerate(video_captures):
-                ret, frame = cap.read()
+                with tracker.time("cap.read"):
+                    ret, frame = cap.read()
                 
                 if not ret:
                     print(f"Warning: Could not read frame {frame_idx} from video {video_idx}")
                     continue
                 
                 # Save the frame
-                image_filename = f"{video_idx:05d}.png"  # Use PNG for saving alpha data
+                image_filename = f"{video_idx:05d}{extension}"  # PNG by default, it keeps alpha data
                 image_path = os.path.join(frame_folder, image_filename)
 
                 # change all the black pixels to transparent in the frame
                 #frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)  # Convert to BGRA
                 #frame[np.all(frame[:, :, :3] == [0, 0, 0], axis=-1), 3] = 0  # Set alpha channel to 0 for black pixels
                 
-                success = cv2.imwrite(image_path, frame)
+                with tracker.time("cv2.imwrite"):
+                    success = cv2.imwrite(image_path, frame, write_params)
                 if not success:
                     print(f"Warning: Could not save {image_path}")
+                written.append(image_path)
+            
+            manifest.scan_dir(frame_folder, writer=True)
+            tracker.add_files(written)
     
     except KeyboardInterrupt:
         print("\nProcessing interrupted by user")
@@ -113,6 +160,10 @@ def extract_synchronized_frames(input_folder, output_folder):
         print("\nCleaning up...")
         for cap in video_captures:
             cap.release()
+        manifest.scan_dir(output_folder, writer=True)
+        manifest.close()
+        tracker.close()
+        stage_boundary("extracted")
     
     print(f"\n✓ Successfully completed!")
     print(f"✓ Extracted {min_frame_count} frames from {len(video_captures)} videos")
@@ -121,38 +172,187 @@ def extract_synchronized_frames(input_folder, output_folder):
     
     return True
 
+def get_write_params(image_format='png', quality=95):
+    """
+    File extension and cv2.imwrite parameters for an output format.
+    
+    Args:
+        image_format (str): 'jpg', 'png' (level 9), or any encoder or preset from encoders.py
+            ('fastest', 'balanced', 'smallest', 'jpg_444', 'webp_lossless', ...)
+        quality (int): JPEG quality (1-100, only for jpg formats)
+    """
+    return encoder_params(image_format, quality)
+
+# Settings compared by preview_extraction_plan: (label, extension, cv2.imwrite parameters)
+PREVIEW_FORMATS = encoder_matrix()
+
+def extract_frames_buffered(video_captures, sync_offsets, available_frames, output_folder, frame_subfolder,
+                            extension, write_params, manifest, tracker, workers=8, ram_budget_gb=4.0):
+    """
+    Decode every video on its own thread into pooled frame arrays and encode them on `workers` threads.
+    
+    Each video gets a pool sized from ram_budget_gb and its measured frame size, so
+    decode-ahead stops when the encoders fall behind instead of holding ever more
+    frames. Videos are read sequentially (skipped frames are grabbed, not decoded)
+    rather than seeking for every frame.
+    
+    Args:
+        video_captures (list): Opened cv2.VideoCapture per video
+        sync_offsets (list): Frames to skip at the start of each video
+        available_frames (list): Ascending source frame indices to extract
+        output_folder (str): Path where frame folders will be created
+        frame_subfolder (str): Write images to frame_XXXXX/<frame_subfolder>
+        extension (str): Image file extension
+        write_params (list): cv2.imwrite parameters
+        manifest (ProjectManifest): Manifest receiving each finished frame folder
+        tracker (Tracker): Progress tracker
+        workers (int): Encoding threads
+        ram_budget_gb (float): Memory for decoded frames waiting to be encoded, in GiB
+    """
+    # Measure the real frame size of each video from its first frame
+    first_frames = []
+    for cap, offset in zip(video_captures, sync_offsets):
+        for _ in range(offset):
+            cap.grab()
+        ret, frame = cap.read()
+        if not ret:
+            raise RuntimeError("Could not read the first synchronized frame of every video")
+        first_frames.append(frame)
+    
+    per_pool = frames_for_budget([frame.nbytes for frame in first_frames], ram_budget_gb, maximum=len(available_frames))
+    pools = [FramePool(frame.shape, frame.dtype, per_pool) for frame in first_frames]
+    print(f"Buffering up to {per_pool} frames per video "
+          f"({per_pool * sum(frame.nbytes for frame in first_frames) / 1024 ** 3:.2f} GB), {workers} encoders")
+    
+    frame_folders = [os.path.join(output_folder, f"frame_{extract_idx:05d}", frame_subfolder)
+                     for extract_idx in range(len(available_frames))]
+    encode_queue = queue.Queue()
+    done_queue = queue.Queue()
+    
+    def decode_video(video_idx):
+        cap, pool = video_captures[video_idx], pools[video_idx]
+        position = 0
+        extract_idx = 0
+        try:
+            for extract_idx, frame_idx in enumerate(available_frames):
+                while position < frame_idx:
+                    cap.grab()
+                    position += 1
+                buffer = pool.acquire()
+                try:
+                    if position == 0:
+                        np.copyto(buffer, first_frames[video_idx])
+                        ret = True
+                    else:
+                        with tracker.time("cap.read"):
+                            ret, _ = cap.read(buffer)
+                except Exception:
+                    # The buffer never reached an encoder, so it goes back to the pool here
+                    pool.release(buffer)
+                    raise
+                position += 1
+                if not ret:
+                    pool.release(buffer)
+                    print(f"Warning: Could not read frame {frame_idx} from video {video_idx}")
+                    done_queue.put((extract_idx, None))
+                    continue
+                encode_queue.put((extract_idx, video_idx, buffer))
+        except Exception as e:
+            print(f"Error decoding video {video_idx}: {e}")
+            # Account for the frames this video will never deliver, so the folders still complete
+            for missing_idx in range(extract_idx, len(available_frames)):
+                done_queue.put((missing_idx, None))
+    
+    def encode_frames():
+        while True:
+            item = encode_queue.get()
+            if item is None:
+                return
+            extract_idx, video_idx, buffer = item
+            image_path = os.path.join(frame_folders[extract_idx], f"image_{video_idx:05d}{extension}")
+            success = False
+            try:
+                with tracker.time("cv2.imwrite"):
+                    success = cv2.imwrite(image_path, buffer, write_params)
+            except cv2.error:
+                pass
+            finally:
+                # Whatever goes wrong, the decoder gets its buffer back and the frame folder can complete
+                pools[video_idx].release(buffer)
+                if not success:
+                    print(f"Warning: Could not save {image_path}")
+                done_queue.put((extract_idx, image_path if success else None))
+    
+    for frame_folder in frame_folders:
+        Path(frame_folder).mkdir(parents=True, exist_ok=True)
+    
+    decoders = [threading.Thread(target=decode_video, args=(i,), daemon=True) for i in range(len(video_captures))]
+    encoders = [threading.Thread(target=encode_frames, daemon=True) for _ in range(workers)]
+    for thread in decoders + encoders:
+        thread.start()
+    
+    # Frame folders are finished out of order; each is indexed once all its videos are in
+    written = [[] for _ in available_frames]
+    remaining = [len(video_captures)] * len(available_frames)
+    finished = 0
+    try:
+        while finished < len(available_frames):
+            extract_idx, image_path = done_queue.get()
+            if image_path is not None:
+                written[extract_idx].append(image_path)
+            remaining[extract_idx] -= 1
+            if remaining[extract_idx] == 0:
+                finished += 1
+                manifest.scan_dir(frame_folders[extract_idx], writer=True)
+                tracker.add_files(written[extract_idx])
+                if frame_subfolder:
+                    manifest.scan_dir(os.path.dirname(frame_folders[extract_idx]), writer=True)
+                if finished % 10 == 0 or finished == len(available_frames):
+                    print(f"Extracted {finished}/{len(available_frames)} frames "
+                          f"({sum(pool.in_use for pool in pools)} buffered)")
+    finally:
+        for _ in encoders:
+            encode_queue.put(None)
+        for thread in encoders:
+            thread.join()
+    
+    print_pool_stats(pools, "Frame buffers")
+
 def extract_synchronized_frames_with_options(input_folder, output_folder, 
                                            image_format='jpg', quality=95,
-                                           max_frames=None, skip_frames=0):
+                                           max_frames=None, skip_frames=0, frame_subfolder='',
+                                           workers=1, ram_budget_gb=4.0):
     """
     Enhanced version with additional options.
     
     Args:
-        input_folder (str): Path to folder containing .mp4 videos
+        input_folder (str): Path to folder containing .mp4 videos or .vvraw tracks
         output_folder (str): Path where frame folders will be created
-        image_format (str): Output image format ('jpg', 'png')
-        quality (int): JPEG quality (1-100, only for jpg format)
+        image_format (str): Output image format ('jpg', 'png') or encoder / preset (see get_write_params)
+        quality (int): JPEG quality (1-100, only for jpg formats)
         max_frames (int): Maximum number of frames to extract (None for all)
         skip_frames (int): Number of frames to skip between extractions
+        frame_subfolder (str): Write images to frame_XXXXX/<frame_subfolder> (e.g. 'images' for colalign)
+        workers (int): Encoding threads; above 1, videos are decoded in parallel into
+            buffers bounded by ram_budget_gb (see extract_frames_buffered)
+        ram_budget_gb (float): Memory for buffered frames when workers > 1, in GiB
     """
     
     # Create output directory
     Path(output_folder).mkdir(parents=True, exist_ok=True)
     
-    # Find all .mp4 files
-    video_pattern = os.path.join(input_folder, "*.mp4")
-    video_paths = glob.glob(video_pattern)
-    video_paths.sort()
+    # Find all tracks (.vvraw if present, otherwise .mp4)
+    video_paths = find_tracks(input_folder)
     
     if not video_paths:
-        print(f"No .mp4 files found in {input_folder}")
+        print(f"No .mp4 or .vvraw tracks found in {input_folder}")
         return False
     
     print(f"Configuration:")
     print(f"  Input folder: {input_folder}")
     print(f"  Output folder: {output_folder}")
     print(f"  Image format: {image_format.upper()}")
-    print(f"  Quality: {quality}%" if image_format.lower() == 'jpg' else "")
+    print(f"  Quality: {quality}%" if image_format.lower().startswith('jpg') else "")
     print(f"  Skip frames: {skip_frames}")
     print(f"  Max frames: {max_frames if max_frames else 'All'}")
     
@@ -163,7 +363,7 @@ def extract_synchronized_frames_with_options(input_folder, output_folder,
     video_info = []
     
     for i, video_path in enumerate(video_paths):
-        cap = cv2.VideoCapture(video_path)
+        cap = open_track(video_path)
         if not cap.isOpened():
             print(f"Error: Could not open {os.path.basename(video_path)}")
             continue
@@ -190,8 +390,10 @@ def extract_synchronized_frames_with_options(input_folder, output_folder,
         print("No valid video files found!")
         return False
     
+    sync_offsets = get_sync_offsets(input_folder, [info['path'] for info in video_info])
+    
     # Calculate extraction parameters
-    min_frame_count = min(info['frames'] for info in video_info)
+    min_frame_count = min(info['frames'] - offset for info, offset in zip(video_info, sync_offsets))
     
     # Apply frame skipping and max frame limit
     available_frames = list(range(0, min_frame_count, skip_frames + 1))
@@ -206,44 +408,57 @@ def extract_synchronized_frames_with_options(input_folder, output_folder,
     print(f"  Total images: {total_frames_to_extract * len(video_captures)}")
     
     # Set up image writing parameters
-    if image_format.lower() == 'jpg':
-        extension = '.jpg'
-        write_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
-    else:
-        extension = '.png'
-        write_params = [cv2.IMWRITE_PNG_COMPRESSION, 9]
+    extension, write_params = get_write_params(image_format, quality)
     
     # Extract frames
     print(f"\nStarting extraction...")
+    stage_boundary("videos_opened")
+    
+    manifest = ProjectManifest(output_folder)
+    tracker = track("extract", len(available_frames))
     
     try:
-        for extract_idx, frame_idx in enumerate(available_frames):
-            # Create folder for this frame
-            frame_folder = os.path.join(output_folder, f"frame_{extract_idx:05d}")
-            Path(frame_folder).mkdir(parents=True, exist_ok=True)
+        if workers > 1:
+            extract_frames_buffered(video_captures, sync_offsets, available_frames, output_folder, frame_subfolder,
+                                    extension, write_params, manifest, tracker, workers, ram_budget_gb)
+        else:
+            for extract_idx, frame_idx in enumerate(available_frames):
+                # Create folder for this frame
+                frame_folder = os.path.join(output_folder, f"frame_{extract_idx:05d}", frame_subfolder)
+                Path(frame_folder).mkdir(parents=True, exist_ok=True)
             
-            # Progress reporting
-            if extract_idx % 10 == 0 or extract_idx == len(available_frames) - 1:
-                progress = ((extract_idx + 1) / len(available_frames)) * 100
-                print(f"Extracting frame {extract_idx + 1}/{len(available_frames)} "
-                      f"(source frame {frame_idx}) - {progress:.1f}%")
+                # Progress reporting
+                if extract_idx % 10 == 0 or extract_idx == len(available_frames) - 1:
+                    progress = ((extract_idx + 1) / len(available_frames)) * 100
+                    print(f"Extracting frame {extract_idx + 1}/{len(available_frames)} "
+                          f"(source frame {frame_idx}) - {progress:.1f}%")
             
-            # Set all video captures to the correct frame
-            for video_idx, cap in enumerate(video_captures):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                ret, frame = cap.read()
+                # Set all video captures to the correct frame
+                written = []
+                for video_idx, cap in enumerate(video_captures):
+                    with tracker.time("cap.set"):
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx + sync_offsets[video_idx])
+                    with tracker.time("cap.read"):
+                        ret, frame = cap.read()
                 
-                if not ret:
-                    print(f"Warning: Could not read frame {frame_idx} from video {video_idx}")
-                    continue
+                    if not ret:
+                        print(f"Warning: Could not read frame {frame_idx} from video {video_idx}")
+                        continue
                 
-                # Save the frame
-                image_filename = f"image_{video_idx:05d}{extension}"
-                image_path = os.path.join(frame_folder, image_filename)
+                    # Save the frame
+                    image_filename = f"image_{video_idx:05d}{extension}"
+                    image_path = os.path.join(frame_folder, image_filename)
                 
-                success = cv2.imwrite(image_path, frame, write_params)
-                if not success:
-                    print(f"Warning: Could not save {image_path}")
+                    with tracker.time("cv2.imwrite"):
+                        success = cv2.imwrite(image_path, frame, write_params)
+                    if not success:
+                        print(f"Warning: Could not save {image_path}")
+                    written.append(image_path)
+            
+                manifest.scan_dir(frame_folder, writer=True)
+                tracker.add_files(written)
+                if frame_subfolder:
+                    manifest.scan_dir(os.path.dirname(frame_folder), writer=True)
     
     except KeyboardInterrupt:
         print("\nProcessing interrupted by user")
@@ -257,6 +472,10 @@ def extract_synchronized_frames_with_options(input_folder, output_folder,
         # Clean up
         for cap in video_captures:
             cap.release()
+        manifest.scan_dir(output_folder, writer=True)
+        manifest.close()
+        tracker.close()
+        stage_boundary("extracted")
     
     print(f"\n🎉 Extraction completed successfully!")
     print(f"📁 Output structure:")
@@ -270,26 +489,55 @@ def extract_synchronized_frames_with_options(input_folder, output_folder,
     
     return True
 
-def preview_extraction_plan(input_folder):
+def measure_encoding(frame, extension, write_params):
+    """Encoded size in bytes and encode time in seconds for one frame"""
+    start = time.perf_counter()
+    success, encoded = cv2.imencode(extension, frame, write_params)
+    elapsed = time.perf_counter() - start
+    if not success:
+        raise RuntimeError(f"Could not encode a sample frame as {extension}")
+    return len(encoded), elapsed
+
+def preview_extraction_plan(input_folder, output_folder=None, image_format='png', quality=95,
+                            samples_per_video=3, compare_formats=True):
     """
     Preview what would be extracted without actually doing it.
+    
+    A few frames per video are decoded and encoded with the chosen settings, and the
+    measured sizes and encode times are extrapolated to the whole extraction.
+    
+    Args:
+        input_folder (str): Path to folder containing .mp4 videos or .vvraw tracks
+        output_folder (str): Where frames will be written; checked for free space
+        image_format (str): Output image format or encoder, as for the extract functions
+        quality (int): JPEG quality (1-100, only for jpg format)
+        samples_per_video (int): Frames sampled from each video, spread over its length
+        compare_formats (bool): Also measure every setting in PREVIEW_FORMATS
     """
-    video_pattern = os.path.join(input_folder, "*.mp4")
-    video_paths = glob.glob(video_pattern)
-    video_paths.sort()
+    video_paths = find_tracks(input_folder)
     
     if not video_paths:
-        print(f"No .mp4 files found in {input_folder}")
+        print(f"No .mp4 or .vvraw tracks found in {input_folder}")
         return
     
     print(f"Preview for folder: {input_folder}")
     print(f"Found {len(video_paths)} video files:")
     
+    extension, write_params = get_write_params(image_format, quality)
+    formats = [("Selected", extension, write_params)]
+    if compare_formats:
+        formats += PREVIEW_FORMATS
+    
+    sync_offsets = get_sync_offsets(input_folder, video_paths)
     frame_counts = []
     total_size_mb = 0
+    # Per format: sampled bytes and encode seconds, averaged per video then summed
+    bytes_per_frame = {label: 0.0 for label, _, _ in formats}
+    seconds_per_frame = {label: 0.0 for label, _, _ in formats}
+    decode_seconds_per_frame = 0.0
     
     for i, video_path in enumerate(video_paths):
-        cap = cv2.VideoCapture(video_path)
+        cap = open_track(video_path)
         if cap.isOpened():
             frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             fps = cap.get(cv2.CAP_PROP_FPS)
@@ -299,17 +547,37 @@ def preview_extraction_plan(input_folder):
             file_size_mb = os.path.getsize(video_path) / (1024 * 1024)
             total_size_mb += file_size_mb
             
-            frame_counts.append(frame_count)
+            frame_counts.append(frame_count - sync_offsets[i])
             
             print(f"  {i:02d}: {os.path.basename(video_path)}")
             print(f"      Frames: {frame_count}, FPS: {fps:.1f}, Size: {width}x{height}")
             print(f"      File size: {file_size_mb:.1f} MB")
             
+            # Encoded size depends heavily on content, so sample across the whole take
+            sample_indices = np.linspace(0, max(frame_count - 1, 0), samples_per_video + 2)[1:-1].astype(int)
+            samples = []
+            for frame_idx in sample_indices:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_idx))
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                decode_time = time.perf_counter() - start
+                if ret:
+                    samples.append((decode_time, [measure_encoding(frame, ext, params) for _, ext, params in formats]))
+            
+            if samples:
+                decode_seconds_per_frame += np.mean([decode_time for decode_time, _ in samples])
+                for f_idx, (label, _, _) in enumerate(formats):
+                    bytes_per_frame[label] += np.mean([encodings[f_idx][0] for _, encodings in samples])
+                    seconds_per_frame[label] += np.mean([encodings[f_idx][1] for _, encodings in samples])
+                sample_kb = np.mean([encodings[0][0] for _, encodings in samples]) / 1024
+                print(f"      Sampled {len(samples)} frames, ~{sample_kb:.0f} KB per {extension[1:].upper()} image")
+            
             cap.release()
     
     if frame_counts:
         min_frames = min(frame_counts)
         max_frames = max(frame_counts)
+        num_videos = len(frame_counts)
         
         print(f"\nSummary:")
         print(f"  Total videos: {len(video_paths)}")
@@ -318,19 +586,42 @@ def preview_extraction_plan(input_folder):
         print(f"  Will extract: {min_frames} frames per video")
         print(f"  Total images: {min_frames * len(video_paths)}")
         
-        # Estimate output size (rough calculation)
-        estimated_size_mb = (min_frames * len(video_paths) * 0.1)  # ~100KB per image
-        print(f"  Estimated output size: ~{estimated_size_mb:.1f} MB")
+        # bytes_per_frame sums one averaged image per video, so it covers one output frame folder
+        estimated_size_mb = bytes_per_frame["Selected"] * min_frames / (1024 * 1024)
+        estimated_seconds = (seconds_per_frame["Selected"] + decode_seconds_per_frame) * min_frames
+        print(f"  Estimated output size: ~{estimated_size_mb:.1f} MB ({extension[1:].upper()}, sampled)")
+        print(f"  Estimated extraction time: ~{estimated_seconds / 60:.1f} min "
+              f"({min_frames * num_videos / max(estimated_seconds, 1e-9):.1f} images/s, single thread)")
+        
+        # Check the volume the output will land on; walk up to the nearest existing folder
+        check_path = os.path.abspath(output_folder or input_folder)
+        while not os.path.exists(check_path):
+            check_path = os.path.dirname(check_path)
+        free_mb = shutil.disk_usage(check_path).free / (1024 * 1024)
+        print(f"  Free space at {check_path}: {free_mb:.1f} MB")
+        if free_mb < estimated_size_mb * 1.1:
+            print(f"  ⚠ WARNING: not enough free space, short by ~{estimated_size_mb * 1.1 - free_mb:.1f} MB (incl. 10% margin)")
+        
+        if compare_formats:
+            print(f"\nFormat comparison (sampled):")
+            print(f"  {'format':<16}{'per image':>12}{'total':>12}{'encode':>12}")
+            for label, _, _ in formats[1:]:
+                per_image_kb = bytes_per_frame[label] / num_videos / 1024
+                total_gb = bytes_per_frame[label] * min_frames / (1024 ** 3)
+                encode_ms = seconds_per_frame[label] / num_videos * 1000
+                print(f"  {label:<16}{per_image_kb:>9.0f} KB{total_gb:>9.2f} GB{encode_ms:>9.1f} ms")
 
 # Example usage
 if __name__ == "__main__":
+    start_profiling("SyncFrameExtract")
+    
     # Configuration
     input_folder = "/Users/yaojie/Desktop/VV-Datasets/0709-GS/resynced_V"      # Folder containing .mp4 files
     output_folder = "/Users/yaojie/Desktop/VV-Datasets/0718-GS/synced_F_bg" # Where frame folders will be created
     
     # Preview what will be extracted (optional)
     print("=== PREVIEW ===")
-    preview_extraction_plan(input_folder)
+    preview_extraction_plan(input_folder, output_folder)
     print("\n" + "="*50 + "\n")
     
     # Check if input folder exists
@@ -348,10 +639,12 @@ if __name__ == "__main__":
         success = extract_synchronized_frames_with_options(
             input_folder=input_folder,
             output_folder=output_folder,
-            image_format='jpg',  # or 'png'
+            image_format='jpg',  # or 'png', or a preset: 'fastest', 'balanced', 'smallest' (see encoders.py)
             quality=95,          # JPEG quality
             max_frames=100,      # Limit to first 100 frames (None for all)
-            skip_frames=0        # Extract every frame (1 = every other frame)
+            skip_frames=0,       # Extract every frame (1 = every other frame)
+            workers=1,           # Encoding threads; above 1 decodes all videos in parallel
+            ram_budget_gb=4.0    # RAM for decoded frames waiting to be encoded (workers > 1)
         )
         """
         
@@ -0,0 +1,170 @@
+import cv2
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from rawtrack import find_tracks, open_track
+
+SYNC_OFFSETS_FILE = "sync_offsets.json"
+
+def read_activity_signals(video_path, max_seconds=60, thumbnail_width=64):
+    """
+    Stream the start of a video as tiny grayscale thumbnails.
+
+    Args:
+        video_path (str): Path to the video
+        max_seconds (float): Only the first max_seconds are read (None for all)
+        thumbnail_width (int): Width the frames are shrunk to before any analysis
+
+    Returns:
+        tuple: (mean luminance per frame, motion per frame, fps)
+    """
+    cap = open_track(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    max_frames = int(max_seconds * fps) if max_seconds else None
+
+    thumbnails = []
+    try:
+        while max_frames is None or len(thumbnails) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            height = max(1, round(frame.shape[0] * thumbnail_width / frame.shape[1]))
+            small = cv2.resize(frame, (thumbnail_width, height), interpolation=cv2.INTER_AREA)
+            thumbnails.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+    finally:
+        cap.release()
+
+    if len(thumbnails) < 2:
+        raise RuntimeError(f"Not enough frames in {video_path}")
+
+    stack = np.stack(thumbnails).astype(np.float32)
+    luminance = stack.mean(axis=(1, 2))
+    motion = np.zeros(len(stack), dtype=np.float32)
+    motion[1:] = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2))
+    return luminance, motion, fps
+
+def detect_flash(luminance, sigma=8.0, min_jump=10.0):
+    """
+    First frame where luminance jumps far above its usual frame-to-frame change.
+
+    Args:
+        luminance (np.ndarray): Mean luminance per frame
+        sigma (float): Jump size in robust standard deviations of the frame-to-frame change
+        min_jump (float): Smallest jump in grey levels that can count as a flash
+
+    Returns:
+        int: Frame index of the flash, or None
+    """
+    jumps = np.diff(luminance)
+    # Median absolute deviation ignores the flash itself when estimating the noise
+    noise = 1.4826 * np.median(np.abs(jumps - np.median(jumps)))
+    candidates = np.flatnonzero(jumps > max(min_jump, sigma * noise))
+    return int(candidates[0]) + 1 if len(candidates) else None
+
+def cross_correlation_lag(signal, reference, max_lag):
+    """
+    Lag that best aligns signal to reference (signal[t + lag] ~ reference[t]),
+    found with one FFT cross-correlation over all lags at once.
+
+    Returns:
+        tuple: (lag in frames, normalized correlation at that lag)
+    """
+    a = (signal - signal.mean()) / (signal.std() or 1.0)
+    b = (reference - reference.mean()) / (reference.std() or 1.0)
+    size = 1 << int(np.ceil(np.log2(len(a) + len(b))))
+    correlation = np.fft.irfft(np.fft.rfft(a, size) * np.conj(np.fft.rfft(b, size)), size)
+
+    # Index k holds lag k, index size - k holds lag -k
+    lags = np.arange(-max_lag, max_lag + 1)
+    values = correlation[lags % size]
+    best = int(np.argmax(values))
+    return int(lags[best]), min(1.0, float(values[best] / min(len(a), len(b))))
+
+def estimate_sync_offsets(video_paths, max_seconds=60, max_lag_seconds=10, workers=4):
+    """
+    Estimate how many frames each video must skip so all start on the same moment.
+
+    The trigger flash is used when it is found in every video; otherwise the
+    motion signals are cross-correlated against the first video.
+
+    Args:
+        video_paths (list): Paths to the videos, all at the same frame rate
+        max_seconds (float): Length of the analysed start of each video
+        max_lag_seconds (float): Largest offset searched by cross-correlation
+        workers (int): Videos decoded in parallel
+
+    Returns:
+        dict: {"method", "offsets": {video name: frames to skip}, "confidence": {video name: score}}
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        signals = list(executor.map(lambda p: read_activity_signals(p, max_seconds), video_paths))
+
+    names = [os.path.basename(p) for p in video_paths]
+    flashes = [detect_flash(luminance) for luminance, _, _ in signals]
+
+    if all(flash is not None for flash in flashes):
+        method = "flash"
+        starts = flashes
+        confidence = [1.0] * len(video_paths)
+    else:
+        method = "motion"
+        reference = signals[0][1]
+        max_lag = int(max_lag_seconds * signals[0][2])
+        starts, confidence = [], []
+        for _, motion, _ in signals:
+            lag, score = cross_correlation_lag(motion, reference, max_lag)
+            starts.append(lag)
+            confidence.append(round(score, 3))
+
+    # Offsets are frames to skip, so the latest-starting video skips none
+    earliest = min(starts)
+    return {
+        "method": method,
+        "offsets": {name: int(start - earliest) for name, start in zip(names, starts)},
+        "confidence": dict(zip(names, confidence)),
+    }
+
+def write_sync_offsets(input_folder, result):
+    path = os.path.join(input_folder, SYNC_OFFSETS_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+def load_sync_offsets(input_folder):
+    """
+    Per-video frame offsets written by estimate_sync_offsets, or {} if the folder has none.
+
+    Returns:
+        dict: {video file name: number of frames to skip at the start}
+    """
+    path = os.path.join(input_folder, SYNC_OFFSETS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["offsets"]
+
+# Example usage
+if __name__ == "__main__":
+    # Configuration
+    input_folder = "/Users/yaojie/Desktop/VV-Datasets/0709-GS/raw_V"  # Folder containing .mp4 files or .vvraw tracks
+
+    video_paths = find_tracks(input_folder)
+
+    if not video_paths:
+        print(f"Error: No .mp4 or .vvraw tracks found in '{input_folder}'")
+    else:
+        print(f"Estimating sync offsets for {len(video_paths)} videos...")
+        result = estimate_sync_offsets(video_paths)
+
+        print(f"\nMethod: {result['method']}")
+        for name, offset in result["offsets"].items():
+            print(f"  {name}: skip {offset} frames (confidence {result['confidence'][name]})")
+
+        path = write_sync_offsets(input_folder, result)
+        print(f"\n✓ Offsets saved to: {path}")
+        print("SyncFrameExtract applies them automatically when extracting from this folder.")
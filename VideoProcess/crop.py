@@ -1,9 +1,104 @@
 import cv2
 import os
+import sys
+import queue
+import shutil
+import threading
 import numpy as np
 from pathlib import Path
 
-def split_horizontal_canvas_video(input_video_path, output_dir, track_width=720, track_height=1280, num_tracks=20):
+from framebuffer import FramePool, SharedFrame, frames_for_budget, print_pool_stats
+from rawtrack import RAW_EXTENSION, RawTrackWriter
+
+# Progress metrics are shared with the Volumetrize tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Volumetrize"))
+from profiling import start_profiling
+from progress import track
+
+def write_tracks_buffered(cap, video_writers, track_width, track_height, ram_budget_gb, tracker):
+    """
+    Decode the canvas on this thread while every track is encoded on its own thread.
+    
+    Canvas frames come from a pool sized by ram_budget_gb; each one returns to the
+    pool once all tracks have written their slice, so a slow encoder makes decoding
+    wait instead of buffering without limit.
+    
+    Returns:
+        int: Number of canvas frames processed
+    """
+    ret, first = cap.read()
+    if not ret:
+        return 0
+    
+    pool = FramePool(first.shape, first.dtype, frames_for_budget(first.nbytes, ram_budget_gb))
+    print(f"  Buffering up to {pool.count} canvas frames ({pool.count * first.nbytes / 1024 ** 3:.2f} GB)")
+    track_queues = [queue.Queue() for _ in video_writers]
+    # First exception of any track thread, raised again once all threads have stopped
+    errors = []
+    
+    def write_track(track_idx):
+        x_start = track_idx * track_width
+        while True:
+            shared = track_queues[track_idx].get()
+            if shared is None:
+                return
+            try:
+                # After a failure the queued frames are only drained, so the decoder never waits on them
+                if not errors:
+                    with tracker.time("VideoWriter.write"):
+                        video_writers[track_idx].write(shared.array[0:track_height, x_start:x_start + track_width])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                shared.done()
+    
+    threads = [threading.Thread(target=write_track, args=(i,), daemon=True) for i in range(len(video_writers))]
+    for thread in threads:
+        thread.start()
+    
+    frame_count = 0
+    try:
+        while not errors:
+            buffer = pool.acquire()
+            if frame_count == 0:
+                np.copyto(buffer, first)
+            else:
+                # Decodes straight into the pooled array, no allocation per frame
+                with tracker.time("cap.read"):
+                    ret, _ = cap.read(buffer)
+                if not ret:
+                    pool.release(buffer)
+                    break
+            
+            shared = SharedFrame(pool, buffer, len(video_writers))
+            for track_queue in track_queues:
+                track_queue.put(shared)
+            frame_count += 1
+            tracker.update()
+            
+            if frame_count % 100 == 0:
+                print(f"Processed {frame_count} frames ({pool.in_use} buffered)")
+    finally:
+        for track_queue in track_queues:
+            track_queue.put(None)
+        for thread in threads:
+            thread.join()
+    
+    if errors:
+        raise errors[0]
+    print_pool_stats([pool], "Canvas buffers")
+    return frame_count
+
+def check_raw_space(video_tracks_dir, num_tracks, total_frames, track_width, track_height):
+    """Print the disk space raw tracks will take and warn when the output drive is too small"""
+    needed = num_tracks * total_frames * track_width * track_height * 3
+    free = shutil.disk_usage(video_tracks_dir).free
+    print(f"  Raw tracks need about {needed / 1024 ** 3:.1f} GB ({free / 1024 ** 3:.1f} GB free)")
+    if needed > free:
+        print(f"Warning: Not enough free space in {video_tracks_dir} for the raw tracks")
+
+def split_horizontal_canvas_video(input_video_path, output_dir, track_width=720, track_height=1280, num_tracks=20,
+                                  ram_budget_gb=None, raw=False):
     """
     Split a horizontally concatenated video into separate video files.
     
@@ -13,6 +108,9 @@ def split_horizontal_canvas_video(input_video_path, output_dir, track_width=720,
         track_width (int): Width of each video track (default: 720)
         track_height (int): Height of each video track (default: 1280)
         num_tracks (int): Number of video tracks (default: 20)
+        ram_budget_gb (float): Encode the tracks in parallel, buffering at most this much
+            of decoded canvas (None to decode and encode one frame at a time)
+        raw (bool): Write lossless memory-mapped .vvraw tracks (see rawtrack.py) instead of mp4v videos
     """
     
     # Create output directory structure
@@ -43,6 +141,11 @@ def split_horizontal_canvas_video(input_video_path, output_dir, track_width=720,
         print(f"Warning: Video width ({video_width}) doesn't match expected canvas width ({track_width * num_tracks})")
     if video_height != track_height:
         print(f"Warning: Video height ({video_height}) doesn't match expected track height ({track_height})")
+    if raw and video_height < track_height:
+        # Raw tracks store fixed-size frames, so every tile must be the full track height
+        cap.release()
+        raise RuntimeError(f"Raw tracks need a canvas at least {track_height} pixels high, "
+                           f"{input_video_path} is {video_height}")
     
     # Calculate actual number of tracks if dimensions don't match exactly
     actual_num_tracks = min(num_tracks, video_width // track_width)
@@ -50,12 +153,19 @@ def split_horizontal_canvas_video(input_video_path, output_dir, track_width=720,
     
     # Define codec and create VideoWriter objects
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # You can also use 'XVID' or 'H264'
+    if raw:
+        check_raw_space(video_tracks_dir, actual_num_tracks, total_frames, track_width, track_height)
     
     # Create VideoWriter objects for each track
     video_writers = []
     for i in range(actual_num_tracks):
-        output_path = os.path.join(video_tracks_dir, f"video_{i:02d}.mp4")
-        writer = cv2.VideoWriter(output_path, fourcc, fps, (track_width, track_height))
+        if raw:
+            # Each tile is copied once, straight into the memory-mapped track
+            output_path = os.path.join(video_tracks_dir, f"video_{i:02d}{RAW_EXTENSION}")
+            writer = RawTrackWriter(output_path, fps, (track_width, track_height), expected_frames=total_frames)
+        else:
+            output_path = os.path.join(video_tracks_dir, f"video_{i:02d}.mp4")
+            writer = cv2.VideoWriter(output_path, fourcc, fps, (track_width, track_height))
         if not writer.isOpened():
             print(f"Error: Could not create video writer for track {i}")
             # Clean up already created writers
@@ -68,36 +178,47 @@ def split_horizontal_canvas_video(input_video_path, output_dir, track_width=720,
     
     print(f"\nStarting video processing...")
     frame_count = 0
+    failed = False
+    tracker = track("crop", total_frames)
     
     try:
-        while True:
-            ret, frame = cap.read()
+        if ram_budget_gb:
+            frame_count = write_tracks_buffered(cap, video_writers, track_width, track_height, ram_budget_gb, tracker)
+        else:
+            while True:
+                with tracker.time("cap.read"):
+                    ret, frame = cap.read()
             
-            if not ret:
-                break
+                if not ret:
+                    break
             
-            if frame_count % 100 == 0:  # Print progress every 100 frames
-                print(f"Processing frame {frame_count + 1}/{total_frames} ({((frame_count + 1)/total_frames)*100:.1f}%)")
+                if frame_count % 100 == 0:  # Print progress every 100 frames
+                    print(f"Processing frame {frame_count + 1}/{total_frames} ({((frame_count + 1)/total_frames)*100:.1f}%)")
             
-            # Split the frame horizontally and write to respective videos
-            for track_idx in range(actual_num_tracks):
-                # Calculate the region for this track
-                x_start = track_idx * track_width
-                x_end = (track_idx + 1) * track_width
+                # Split the frame horizontally and write to respective videos
+                for track_idx in range(actual_num_tracks):
+                    # Calculate the region for this track
+                    x_start = track_idx * track_width
+                    x_end = (track_idx + 1) * track_width
                 
-                # Extract the sub-frame for this track
-                track_frame = frame[0:track_height, x_start:x_end]
+                    # Extract the sub-frame for this track
+                    track_frame = frame[0:track_height, x_start:x_end]
                 
-                # Write the frame to the corresponding video file
-                video_writers[track_idx].write(track_frame)
+                    # Write the frame to the corresponding video file
+                    with tracker.time("VideoWriter.write"):
+                        video_writers[track_idx].write(track_frame)
             
-            frame_count += 1
+                frame_count += 1
+                tracker.update()
     
     except KeyboardInterrupt:
         print("\nProcessing interrupted by user")
     
     except Exception as e:
         print(f"\nError during processing: {str(e)}")
+        # The tracks are incomplete, so the caller must not take them as finished
+        failed = True
+        raise
     
     finally:
         # Clean up
@@ -105,13 +226,16 @@ def split_horizontal_canvas_video(input_video_path, output_dir, track_width=720,
         for i, writer in enumerate(video_writers):
             writer.release()
             print(f"Saved video track {i:02d}")
+        tracker.close()
         
-        print(f"\nCompleted! Processed {frame_count} frames.")
-        print(f"Created {actual_num_tracks} video files in: {video_tracks_dir}")
+        if not failed:
+            print(f"\nCompleted! Processed {frame_count} frames.")
+            print(f"Created {actual_num_tracks} video files in: {video_tracks_dir}")
 
 def split_horizontal_canvas_video_with_custom_codec(input_video_path, output_dir, track_width=720, track_height=1280, num_tracks=20, output_codec='H264'):
     """
     Enhanced version with custom codec support and better error handling.
+    output_codec='RAW' writes lossless memory-mapped .vvraw tracks (see rawtrack.py).
     """
     
     # Create output directory structure
@@ -147,7 +271,8 @@ def split_horizontal_canvas_video_with_custom_codec(input_video_path, output_dir
         'H264': cv2.VideoWriter_fourcc(*'H264'),
         'XVID': cv2.VideoWriter_fourcc(*'XVID'),
         'mp4v': cv2.VideoWriter_fourcc(*'mp4v'),
-        'MJPG': cv2.VideoWriter_fourcc(*'MJPG')
+        'MJPG': cv2.VideoWriter_fourcc(*'MJPG'),
+        'RAW': None
     }
     
     if output_codec not in codec_options:
@@ -155,16 +280,22 @@ def split_horizontal_canvas_video_with_custom_codec(input_video_path, output_dir
         output_codec = 'mp4v'
     
     fourcc = codec_options[output_codec]
+    if output_codec == 'RAW':
+        check_raw_space(video_tracks_dir, actual_num_tracks, total_frames, track_width, track_height)
     
     # Create VideoWriter objects for each track
     video_writers = []
     output_paths = []
     
     for i in range(actual_num_tracks):
-        output_path = os.path.join(video_tracks_dir, f"video_{i:02d}.mp4")
+        extension = RAW_EXTENSION if output_codec == 'RAW' else ".mp4"
+        output_path = os.path.join(video_tracks_dir, f"video_{i:02d}{extension}")
         output_paths.append(output_path)
         
-        writer = cv2.VideoWriter(output_path, fourcc, fps, (track_width, track_height))
+        if output_codec == 'RAW':
+            writer = RawTrackWriter(output_path, fps, (track_width, track_height), expected_frames=total_frames)
+        else:
+            writer = cv2.VideoWriter(output_path, fourcc, fps, (track_width, track_height))
         
         if not writer.isOpened():
             print(f"Error: Could not create video writer for track {i}")
@@ -182,10 +313,12 @@ def split_horizontal_canvas_video_with_custom_codec(input_video_path, output_dir
     
     frame_count = 0
     last_percent = -1
+    tracker = track("crop", total_frames)
     
     try:
         while True:
-            ret, frame = cap.read()
+            with tracker.time("cap.read"):
+                ret, frame = cap.read()
             
             if not ret:
                 break
@@ -207,11 +340,14 @@ def split_horizontal_canvas_video_with_custom_codec(input_video_path, output_dir
                     
                     # Resize if necessary to match expected dimensions
                     if track_frame.shape[:2] != (track_height, track_width):
-                        track_frame = cv2.resize(track_frame, (track_width, track_height))
+                        with tracker.time("cv2.resize"):
+                            track_frame = cv2.resize(track_frame, (track_width, track_height))
                     
-                    video_writers[track_idx].write(track_frame)
+                    with tracker.time("VideoWriter.write"):
+                        video_writers[track_idx].write(track_frame)
             
             frame_count += 1
+            tracker.update()
     
     except KeyboardInterrupt:
         print("\nProcessing interrupted by user")
@@ -226,6 +362,7 @@ def split_horizontal_canvas_video_with_custom_codec(input_video_path, output_dir
         cap.release()
         for writer in video_writers:
             writer.release()
+        tracker.close()
     
     print(f"\n✓ Successfully completed!")
     print(f"✓ Processed {frame_count} frames")
@@ -234,7 +371,7 @@ def split_horizontal_canvas_video_with_custom_codec(input_video_path, output_dir
     for i, path in enumerate(output_paths):
         if os.path.exists(path):
             file_size = os.path.getsize(path) / (1024 * 1024)  # Size in MB
-            print(f"  - video_{i:02d}.mp4 ({file_size:.1f} MB)")
+            print(f"  - {os.path.basename(path)} ({file_size:.1f} MB)")
     
     return True
 
@@ -257,6 +394,8 @@ def get_video_info(video_path):
     return info
 
 if __name__ == "__main__":
+    start_profiling("crop")
+    
     # Configuration
     input_video_path = "/Users/yaojie/Desktop/VV-Datasets/0702-GS/take_1/input.mkv"  # Change this to your canvas video path
     output_directory = "/Users/yaojie/Desktop/VV-Datasets/0702-GS/take_1/v"
@@ -283,7 +422,7 @@ if __name__ == "__main__":
             track_width=720,
             track_height=1280,
             num_tracks=9,
-            output_codec='MJPG'  # Options: 'H264', 'XVID', 'mp4v', 'MJPG'
+            output_codec='MJPG'  # Options: 'H264', 'XVID', 'mp4v', 'MJPG', 'RAW' (lossless, large)
         )
         
         if success:
@@ -0,0 +1,138 @@
+"""
+Image encoders for frame extraction, selected by name or by preset.
+
+The presets are all lossless, since the frames feed reconstruction:
+
+    fastest   Uncompressed BMP: almost no CPU, but ~6 MB per 1080x1920 frame,
+              so the disk becomes the limit
+    balanced  PNG level 1 with the RLE strategy: several times faster than
+              PNG level 9, and usually no larger on noisy camera footage
+    smallest  Lossless WebP: smallest files, slowest to encode; COLMAP reads
+              it, check other tools before using it
+
+Which one wins depends on the footage and the disks, so measure on a take with
+benchmark_encoders() before a long extraction.
+"""
+
+import os
+import time
+import cv2
+import numpy as np
+
+from rawtrack import find_tracks, open_track
+
+# name -> (extension, cv2.imwrite parameters, lossless). JPEG entries get the quality added by encoder_params.
+ENCODERS = {
+    "bmp": ('.bmp', [], True),
+    "tiff": ('.tiff', [cv2.IMWRITE_TIFF_COMPRESSION, 1], True),
+    "png_fast": ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 1, cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE], True),
+    "png_huffman": ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 1, cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_HUFFMAN_ONLY], True),
+    "png_3": ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 3], True),
+    # What image_format='png' has always written
+    "png": ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 9], True),
+    "webp_lossless": ('.webp', [cv2.IMWRITE_WEBP_QUALITY, 101], True),
+    "webp_90": ('.webp', [cv2.IMWRITE_WEBP_QUALITY, 90], False),
+    # OpenCV's default chroma subsampling (4:2:0)
+    "jpg": ('.jpg', [], False),
+    "jpg_444": ('.jpg', [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444], False),
+    "jpg_420": ('.jpg', [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420], False),
+}
+
+PRESETS = {
+    "fastest": "bmp",
+    "balanced": "png_fast",
+    "smallest": "webp_lossless",
+}
+
+def encoder_names():
+    return list(PRESETS) + list(ENCODERS)
+
+def encoder_params(name, quality=95):
+    """
+    File extension and cv2.imwrite parameters for an encoder or preset.
+
+    Args:
+        name (str): Key of ENCODERS or PRESETS (case-insensitive)
+        quality (int): JPEG quality (1-100, only for the jpg encoders)
+    """
+    name = PRESETS.get(name.lower(), name.lower())
+    if name not in ENCODERS:
+        raise RuntimeError(f"Unknown image encoder '{name}', expected one of {', '.join(encoder_names())}")
+    extension, params, _ = ENCODERS[name]
+    if extension == '.jpg':
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality] + params
+    return extension, list(params)
+
+def encoder_matrix(quality=95):
+    """Every encoder as (label, extension, cv2.imwrite parameters), as compared by the preview"""
+    return [(name, *encoder_params(name, quality)) for name in ENCODERS]
+
+def sample_frames(video_paths, samples_per_video=3):
+    """A few decoded frames per video, spread over its length"""
+    frames = []
+    for video_path in video_paths:
+        cap = open_track(video_path)
+        if not cap.isOpened():
+            print(f"Warning: Could not open {video_path}")
+            continue
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for index in np.linspace(0, max(frame_count - 1, 0), samples_per_video + 2)[1:-1].astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame.copy())
+        cap.release()
+    return frames
+
+def benchmark_encoders(input_folder, samples_per_video=3, names=None, quality=95):
+    """
+    Encode sample frames of a take with every encoder and report time and size per frame.
+
+    Args:
+        input_folder (str): Folder with the .mp4 videos or .vvraw tracks of the take
+        samples_per_video (int): Frames sampled from each video, spread over its length
+        names (list): Encoders or presets to compare (None for all encoders)
+        quality (int): JPEG quality for the jpg encoders
+
+    Returns:
+        list: (name, encode ms per frame, bytes per frame, lossless) sorted by encode time
+    """
+    frames = sample_frames(find_tracks(input_folder), samples_per_video)
+    if not frames:
+        raise RuntimeError(f"No frames could be read from {input_folder}")
+    raw_bytes = np.mean([frame.nbytes for frame in frames])
+    print(f"Benchmarking {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]} "
+          f"({raw_bytes / 1024:.0f} KB raw) from {input_folder}")
+
+    results = []
+    for name in names or list(ENCODERS):
+        extension, params = encoder_params(name, quality)
+        total_seconds = 0.0
+        total_bytes = 0
+        lossless = True
+        for frame in frames:
+            start = time.perf_counter()
+            success, encoded = cv2.imencode(extension, frame, params)
+            total_seconds += time.perf_counter() - start
+            if not success:
+                raise RuntimeError(f"Encoder '{name}' could not encode a sample frame")
+            total_bytes += len(encoded)
+            lossless = lossless and np.array_equal(cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED), frame)
+        results.append((name, total_seconds / len(frames) * 1000, total_bytes / len(frames), lossless))
+
+    results.sort(key=lambda result: result[1])
+    preset_of = {encoder: preset for preset, encoder in PRESETS.items()}
+    print(f"\n{'encoder':<16}{'preset':<10}{'ms/frame':>10}{'KB/frame':>10}{'of raw':>8}  lossless")
+    for name, ms, size, lossless in results:
+        preset = preset_of.get(PRESETS.get(name, name), "")
+        print(f"{name:<16}{preset:<10}{ms:>10.1f}{size / 1024:>10.0f}{size / raw_bytes:>8.0%}  {'yes' if lossless else 'no'}")
+    return results
+
+if __name__ == "__main__":
+    # Configuration
+    input_folder = "/Users/yaojie/Desktop/VV-Datasets/0709-GS/resynced_V"  # Folder containing .mp4 files or .vvraw tracks
+
+    if not os.path.exists(input_folder):
+        print(f"Error: Input folder '{input_folder}' not found!")
+    else:
+        benchmark_encoders(input_folder, samples_per_video=3)
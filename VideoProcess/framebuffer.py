@@ -0,0 +1,120 @@
+import threading
+import time
+import numpy as np
+
+# Frames every pool may hold even when the budget is smaller: one being decoded, one being encoded
+MIN_POOL_FRAMES = 2
+
+class FramePool:
+    """
+    Fixed number of reusable frame arrays.
+
+    Arrays are allocated on first use up to `count` and then recycled, so a
+    long take allocates `count` frames in total instead of one per decode.
+    acquire() blocks while all arrays are in flight: a decoder that runs ahead
+    of its encoders waits instead of growing memory.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, count=MIN_POOL_FRAMES):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.count = max(1, count)
+        self.free = []
+        self.allocated = 0
+        self.in_use = 0
+        self.high_water = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def frame_bytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def acquire(self):
+        with self._condition:
+            if not self.free and self.allocated >= self.count:
+                self.waits += 1
+                start = time.perf_counter()
+                while not self.free:
+                    self._condition.wait()
+                self.wait_seconds += time.perf_counter() - start
+
+            if self.free:
+                array = self.free.pop()
+            else:
+                array = np.empty(self.shape, dtype=self.dtype)
+                self.allocated += 1
+
+            self.in_use += 1
+            self.high_water = max(self.high_water, self.in_use)
+            return array
+
+    def release(self, array):
+        with self._condition:
+            self.in_use -= 1
+            self.free.append(array)
+            self._condition.notify()
+
+    def stats(self):
+        return {
+            "frames": self.count,
+            "allocated": self.allocated,
+            "high_water": self.high_water,
+            "allocated_mb": round(self.allocated * self.frame_bytes / (1024 * 1024), 1),
+            "waits": self.waits,
+            "wait_s": round(self.wait_seconds, 3),
+        }
+
+class SharedFrame:
+    """A pooled frame read by several consumers; it goes back to the pool after the last one is done"""
+
+    def __init__(self, pool, array, consumers):
+        self.pool = pool
+        self.array = array
+        self._remaining = consumers
+        self._lock = threading.Lock()
+
+    def done(self):
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            self.pool.release(self.array)
+
+def frames_for_budget(frame_bytes, ram_budget_gb, pools=1, maximum=None):
+    """
+    Frames each of `pools` pools may hold so all of them together stay within the RAM budget.
+
+    A budget too small for MIN_POOL_FRAMES per pool is exceeded with a warning
+    rather than refused: decoding then runs in lockstep with encoding, slower
+    but still within a known bound.
+
+    Args:
+        frame_bytes (int or list): Size of one frame, or of one frame per pool
+        ram_budget_gb (float): Memory for buffered frames, in GiB
+        pools (int): Number of pools sharing the budget (ignored when frame_bytes is a list)
+        maximum (int): Upper limit per pool (None for no limit)
+
+    Returns:
+        int: Frames per pool
+    """
+    per_round = sum(frame_bytes) if isinstance(frame_bytes, (list, tuple)) else frame_bytes * pools
+    frames = int(ram_budget_gb * 1024 ** 3 // max(per_round, 1))
+    if frames < MIN_POOL_FRAMES:
+        print(f"Warning: RAM budget of {ram_budget_gb:g} GB holds fewer than {MIN_POOL_FRAMES} frames per pool; "
+              f"using {MIN_POOL_FRAMES} ({MIN_POOL_FRAMES * per_round / 1024 ** 3:.2f} GB)")
+        frames = MIN_POOL_FRAMES
+    if maximum is not None:
+        frames = min(frames, maximum)
+    return frames
+
+def print_pool_stats(pools, label="Buffers"):
+    """One summary line for a set of pools; waits show how often decoding had to wait for encoding"""
+    allocated_mb = sum(pool.stats()["allocated_mb"] for pool in pools)
+    high_water = sum(pool.high_water for pool in pools)
+    capacity = sum(pool.count for pool in pools)
+    waits = sum(pool.waits for pool in pools)
+    wait_seconds = sum(pool.wait_seconds for pool in pools)
+    print(f"{label}: high water {high_water}/{capacity} frames, {allocated_mb:.0f} MB allocated, "
+          f"decoders waited {waits} times ({wait_seconds:.1f}s)")
@@ -0,0 +1,242 @@
+"""
+Lossless raw frame tracks, an optional intermediate between crop.py and the extractors.
+
+A .vvraw file is one camera track: a HEADER_SIZE header followed by the frames
+as plain pixel arrays, each starting on a FRAME_ALIGNMENT boundary. The fixed
+stride puts frame i at HEADER_SIZE + i * stride, so tracks are memory-mapped:
+the splitter copies each tile straight into the mapped file, and readers get
+frame i as an array view of the file without decoding or copying.
+
+Raw tracks are large (720x1280 BGR is 2.6 MB per frame, about 5 GB per camera
+per minute at 30 fps), so they suit short takes on fast local disks.
+"""
+
+import cv2
+import glob
+import os
+import struct
+import numpy as np
+
+RAW_EXTENSION = ".vvraw"
+MAGIC = b"VVRAWTRK"
+VERSION = 1
+# magic, version, width, height, channels, dtype, fps, frame count, stride
+HEADER_FORMAT = "<8sIIII8sdQQ"
+# Frames start on page boundaries, which suits mmap and direct I/O
+HEADER_SIZE = 4096
+FRAME_ALIGNMENT = 4096
+# Frame count stored until the writer is released; readers then count what the file holds
+UNFINISHED = 2 ** 64 - 1
+# Frames the writer preallocates at a time when the frame count is not known
+GROW_FRAMES = 256
+
+def _stride(frame_bytes):
+    return -(-frame_bytes // FRAME_ALIGNMENT) * FRAME_ALIGNMENT
+
+def _frame_view(buffer, count, shape, dtype, stride):
+    """count frames of shape/dtype laid out every stride bytes in buffer, as one array view"""
+    dtype = np.dtype(dtype)
+    frame_strides = tuple(int(np.prod(shape[axis + 1:])) * dtype.itemsize for axis in range(len(shape)))
+    return np.ndarray((count,) + shape, dtype, buffer=buffer, strides=(stride,) + frame_strides)
+
+class RawTrackWriter:
+    """
+    Writes frames to a .vvraw track; same write() / isOpened() / release() as cv2.VideoWriter.
+
+    The file is preallocated and memory-mapped, so write() is one copy of the
+    frame (which may be a strided tile of a larger canvas) into the page cache.
+    """
+
+    def __init__(self, path, fps, frame_size, channels=3, dtype=np.uint8, expected_frames=None):
+        """
+        Args:
+            path (str): Output path, normally ending in RAW_EXTENSION
+            fps (float): Frame rate stored in the header
+            frame_size (tuple): (width, height) as for cv2.VideoWriter
+            channels (int): Channels per pixel (3 for BGR, 1 for grayscale)
+            dtype: Pixel type
+            expected_frames (int): Frames to preallocate (None to grow in GROW_FRAMES steps)
+        """
+        width, height = frame_size
+        self.path = path
+        self.fps = fps
+        self.dtype = np.dtype(dtype)
+        self.frame_shape = (height, width, channels) if channels > 1 else (height, width)
+        self.frame_bytes = height * width * channels * self.dtype.itemsize
+        self.stride = _stride(self.frame_bytes)
+        self.count = 0
+        self._capacity = 0
+        self._map = None
+        self._frames = None
+        self._file = open(path, "w+b")
+        self._write_header(UNFINISHED)
+        self._grow(max(expected_frames or 0, 1))
+
+    def _write_header(self, frame_count):
+        height, width = self.frame_shape[:2]
+        channels = self.frame_shape[2] if len(self.frame_shape) > 2 else 1
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, width, height, channels,
+                             self.dtype.str.encode("ascii"), self.fps, frame_count, self.stride)
+        self._file.seek(0)
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._file.flush()
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.flush()
+            # The mapping must be gone before the file is resized (required on Windows)
+            self._frames = None
+            self._map = None
+
+    def _grow(self, capacity):
+        self._unmap()
+        self._file.truncate(HEADER_SIZE + capacity * self.stride)
+        self._map = np.memmap(self._file, np.uint8, "r+", offset=HEADER_SIZE, shape=(capacity * self.stride,))
+        self._frames = _frame_view(self._map, capacity, self.frame_shape, self.dtype, self.stride)
+        self._capacity = capacity
+
+    def isOpened(self):
+        return self._file is not None
+
+    def write(self, frame):
+        if frame.shape != self.frame_shape:
+            raise RuntimeError(f"Frame of shape {frame.shape} written to {self.path}, expected {self.frame_shape}")
+        if self.count == self._capacity:
+            self._grow(self._capacity + max(GROW_FRAMES, self._capacity // 4))
+        np.copyto(self._frames[self.count], frame, casting="unsafe")
+        self.count += 1
+
+    def release(self):
+        if self._file is None:
+            return
+        self._unmap()
+        # Drop the preallocated frames that were never written, then record the count
+        self._file.truncate(HEADER_SIZE + self.count * self.stride)
+        self._write_header(self.count)
+        self._file.close()
+        self._file = None
+
+class RawTrack:
+    """Read-only memory map of a .vvraw track; track[i] is frame i as a view of the file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(struct.calcsize(HEADER_FORMAT))
+        if len(header) < struct.calcsize(HEADER_FORMAT) or not header.startswith(MAGIC):
+            raise RuntimeError(f"Not a raw track: {path}")
+        (_, version, width, height, channels, dtype,
+         self.fps, frame_count, self.stride) = struct.unpack(HEADER_FORMAT, header)
+        if version != VERSION:
+            raise RuntimeError(f"Unsupported raw track version {version} in {path}")
+
+        self.width = width
+        self.height = height
+        self.dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+        self.frame_shape = (height, width, channels) if channels > 1 else (height, width)
+
+        available = max(0, os.path.getsize(path) - HEADER_SIZE) // self.stride
+        if frame_count == UNFINISHED:
+            # The writer never finished: the tail may hold preallocated, unwritten (black) frames
+            print(f"Warning: {os.path.basename(path)} was not closed properly, reading all {available} frames it holds")
+            frame_count = available
+        self.frame_count = min(frame_count, available)
+
+        self._map = None
+        self.frames = np.empty((0,) + self.frame_shape, self.dtype)
+        if self.frame_count:
+            self._map = np.memmap(path, np.uint8, "r", offset=HEADER_SIZE, shape=(self.frame_count * self.stride,))
+            self.frames = _frame_view(self._map, self.frame_count, self.frame_shape, self.dtype, self.stride)
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def close(self):
+        self.frames = None
+        self._map = None
+
+class RawTrackCapture:
+    """
+    Stand-in for cv2.VideoCapture over a .vvraw track, so the extractors read raw
+    tracks unchanged. read() returns a read-only view of the mapped frame, or
+    copies into `image` when one is passed (as cap.read(buffer) does).
+    """
+
+    def __init__(self, path):
+        try:
+            self.track = RawTrack(path)
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}")
+            self.track = None
+        self.position = 0
+
+    def isOpened(self):
+        return self.track is not None
+
+    def get(self, prop):
+        if self.track is None:
+            return 0.0
+        values = {
+            cv2.CAP_PROP_FRAME_COUNT: self.track.frame_count,
+            cv2.CAP_PROP_FPS: self.track.fps,
+            cv2.CAP_PROP_FRAME_WIDTH: self.track.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.track.height,
+            cv2.CAP_PROP_POS_FRAMES: self.position,
+        }
+        return float(values.get(prop, 0.0))
+
+    def set(self, prop, value):
+        if self.track is None or prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        self.position = min(max(0, int(value)), self.track.frame_count)
+        return True
+
+    def grab(self):
+        if self.track is None or self.position >= self.track.frame_count:
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self, image=None):
+        if self.track is None or not 0 < self.position <= self.track.frame_count:
+            return False, None
+        frame = self.track[self.position - 1]
+        if image is None:
+            return True, frame
+        np.copyto(image, frame)
+        return True, image
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        if self.track is not None:
+            self.track.close()
+            self.track = None
+
+def find_tracks(folder):
+    """Sorted camera tracks of a folder: the .vvraw tracks if there are any, otherwise the .mp4 videos"""
+    raw_paths = sorted(glob.glob(os.path.join(folder, f"*{RAW_EXTENSION}")))
+    return raw_paths or sorted(glob.glob(os.path.join(folder, "*.mp4")))
+
+def open_track(path):
+    """cv2.VideoCapture for videos, RawTrackCapture for .vvraw tracks"""
+    if path.lower().endswith(RAW_EXTENSION):
+        return RawTrackCapture(path)
+    return cv2.VideoCapture(path)
+
+if __name__ == "__main__":
+    # Configuration
+    input_folder = "/Users/yaojie/Desktop/VV-Datasets/0702-GS/take_1/v/video_tracks"  # Folder containing .vvraw tracks
+
+    for path in sorted(glob.glob(os.path.join(input_folder, f"*{RAW_EXTENSION}"))):
+        track = RawTrack(path)
+        size_gb = os.path.getsize(path) / 1024 ** 3
+        print(f"{os.path.basename(path)}: {len(track)} frames, {track.width}x{track.height}, "
+              f"{track.fps:.2f} FPS, {size_gb:.2f} GB")
+        track.close()
@@ -1,13 +1,28 @@
 import os
-import subprocess
 import shutil
 import argparse
 from pathlib import Path
 
-def run_colmap_command(cmd, working_dir=None):
-    """Run a COLMAP command using subprocess"""
+from colmap_model import drop_images, rescale_model
+from feature_cache import FeatureCache, list_colmap_images
+from framequeue import FrameQueue, process_reference_frame, work_loop
+from manifest import ProjectManifest
+from nobg import map_nobg_to_frames, generate_masks
+from profiling import start_profiling
+from progress import track
+from pyramid import build_pyramid, level_dir_name, read_image_size
+from static_frames import STATIC_FRAMES_FILE, load_static_frames
+from steplog import open_step_log, run_measured
+
+# Settings passed to every feature_extractor run; also part of the feature cache key
+FEATURE_EXTRACTOR_SETTINGS = [
+    "--ImageReader.camera_model", "SIMPLE_RADIAL"
+]
+
+def run_colmap_command(cmd, working_dir=None, frame=None):
+    """Run a COLMAP command, recording its timing under the COLMAP subcommand name"""
     print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=working_dir, capture_output=True, text=True)
+    result = run_measured(cmd, working_dir, frame=frame, step=cmd[1])
     
     if result.returncode != 0:
         print(f"Error running command: {' '.join(cmd)}")
@@ -15,35 +30,67 @@ def run_colmap_command(cmd, working_dir=None):
         print(f"stderr: {result.stderr}")
         raise RuntimeError(f"COLMAP command failed with return code {result.returncode}")
     
-    print("Command completed successfully")
+    print(f"Command completed successfully ({result.wall_time:.1f}s)")
     return result
 
-def create_directories(frame_path):
-    """Create colmap and sparse directories in frame folder"""
-    colmap_dir = frame_path / "colmap"
-    sparse_dir = frame_path / "sparse"
+def create_directories(frame_path, level=1):
+    """Create colmap and sparse directories in frame folder (colmap_2, sparse_2, ... for pyramid levels)"""
+    colmap_dir = frame_path / level_dir_name("colmap", level)
+    sparse_dir = frame_path / level_dir_name("sparse", level)
     
     colmap_dir.mkdir(exist_ok=True)
     sparse_dir.mkdir(exist_ok=True)
     
     return colmap_dir, sparse_dir
 
-def process_first_frame(frame_path, images_path):
+def extract_features(database_path, images_path, feature_cache=None):
+    """Extract features into database_path, importing them from the cache when possible"""
+    frame = images_path.parent.name
+    cmd_extract = [
+        "colmap", "feature_extractor",
+        "--database_path", str(database_path),
+        "--image_path", str(images_path)
+    ] + FEATURE_EXTRACTOR_SETTINGS
+
+    # Masks generated from the nobg frames restrict features to the subject
+    mask_path = images_path.parent / images_path.name.replace("images", "masks", 1)
+    if mask_path.exists():
+        cmd_extract.extend(["--ImageReader.mask_path", str(mask_path)])
+    else:
+        mask_path = None
+
+    if feature_cache is None:
+        run_colmap_command(cmd_extract, frame=frame)
+        return
+
+    keys, entries = feature_cache.lookup(images_path, FEATURE_EXTRACTOR_SETTINGS, mask_path)
+    if entries is not None:
+        print("Feature cache hit, skipping extraction")
+        if database_path.exists():
+            database_path.unlink()
+        run_colmap_command(["colmap", "database_creator", "--database_path", str(database_path)], frame=frame)
+        feature_cache.import_entries(database_path, entries)
+        return
+
+    run_colmap_command(cmd_extract, frame=frame)
+    feature_cache.store(database_path, images_path, FEATURE_EXTRACTOR_SETTINGS, mask_path, keys)
+
+def export_full_resolution(frame_path, recon_dir):
+    """Write a reconstruction made on a pyramid level to sparse/0 at full resolution"""
+    images_dir = frame_path / "images"
+    full_sizes = {name: read_image_size(images_dir / name) for name in list_colmap_images(images_dir)}
+    rescale_model(recon_dir, frame_path / "sparse" / "0", full_sizes)
+
+def process_first_frame(frame_path, images_path, feature_cache=None, level=1):
     """Process the first frame with full COLMAP reconstruction"""
     print(f"\n=== Processing first frame: {frame_path.name} ===")
     
-    colmap_dir, sparse_dir = create_directories(frame_path)
+    colmap_dir, sparse_dir = create_directories(frame_path, level)
     database_path = colmap_dir / "database.db"
     
     # Step 1: Create database and extract features
     print("Step 1: Feature extraction...")
-    cmd_extract = [
-        "colmap", "feature_extractor",
-        "--database_path", str(database_path),
-        "--image_path", str(images_path),
-        "--ImageReader.camera_model", "SIMPLE_RADIAL"
-    ]
-    run_colmap_command(cmd_extract)
+    extract_features(database_path, images_path, feature_cache)
     
     # Step 2: Exhaustive matching
     print("Step 2: Exhaustive matching...")
@@ -51,7 +98,7 @@ def process_first_frame(frame_path, images_path):
         "colmap", "exhaustive_matcher",
         "--database_path", str(database_path)
     ]
-    run_colmap_command(cmd_match)
+    run_colmap_command(cmd_match, frame=frame_path.name)
     
     # Step 3: Sparse reconstruction (mapping)
     print("Step 3: Sparse reconstruction...")
@@ -61,16 +108,19 @@ def process_first_frame(frame_path, images_path):
         "--image_path", str(images_path),
         "--output_path", str(sparse_dir)
     ]
-    run_colmap_command(cmd_mapper)
+    run_colmap_command(cmd_mapper, frame=frame_path.name)
+    
+    if level > 1:
+        export_full_resolution(frame_path, sparse_dir / "0")
     
     print(f"First frame reconstruction completed: {frame_path.name}")
     return sparse_dir
 
-def process_subsequent_frame(frame_path, images_path, first_frame_sparse_dir):
+def process_subsequent_frame(frame_path, images_path, first_frame_sparse_dir, feature_cache=None, level=1):
     """Process subsequent frames using camera parameters from first frame"""
     print(f"\n=== Processing frame: {frame_path.name} ===")
     
-    colmap_dir, sparse_dir = create_directories(frame_path)
+    colmap_dir, sparse_dir = create_directories(frame_path, level)
     database_path = colmap_dir / "database.db"
     
     # Find the reconstruction folder in first frame (usually "0")
@@ -112,15 +162,14 @@ def process_subsequent_frame(frame_path, images_path, first_frame_sparse_dir):
     else:
         raise RuntimeError(f"points3D.bin not found in first frame: {points3D_src}")
     
+    # Views excluded by quality.py must not stay in the model, or the triangulator looks them up
+    removed = drop_images(current_recon_dir, set(list_colmap_images(images_path)))
+    if removed:
+        print(f"Dropped {len(removed)} views missing from {images_path.name}: {', '.join(removed)}")
+    
     # Step 1: Create database and extract features
     print("Step 1: Feature extraction...")
-    cmd_extract = [
-        "colmap", "feature_extractor",
-        "--database_path", str(database_path),
-        "--image_path", str(images_path),
-        "--ImageReader.camera_model", "SIMPLE_RADIAL"
-    ]
-    run_colmap_command(cmd_extract)
+    extract_features(database_path, images_path, feature_cache)
     
     # Step 2: Exhaustive matching
     print("Step 2: Exhaustive matching...")
@@ -128,7 +177,7 @@ def process_subsequent_frame(frame_path, images_path, first_frame_sparse_dir):
         "colmap", "exhaustive_matcher",
         "--database_path", str(database_path)
     ]
-    run_colmap_command(cmd_match)
+    run_colmap_command(cmd_match, frame=frame_path.name)
     
     # Step 3: Point triangulation
     print("Step 3: Point triangulation...")
@@ -139,25 +188,74 @@ def process_subsequent_frame(frame_path, images_path, first_frame_sparse_dir):
         "--input_path", str(current_recon_dir),
         "--output_path", str(current_recon_dir)
     ]
-    run_colmap_command(cmd_triangulator)
+    run_colmap_command(cmd_triangulator, frame=frame_path.name)
+    
+    if level > 1:
+        export_full_resolution(frame_path, current_recon_dir)
     
     print(f"Frame reconstruction completed: {frame_path.name}")
 
+def reuse_static_frame(frame_path, source_path):
+    """Copy the source frame's sparse/0 into a frame marked as its duplicate; False if there is none yet"""
+    source_model = source_path / "sparse" / "0"
+    if not (source_model / "images.bin").exists():
+        return False
+
+    shutil.copytree(source_model, frame_path / "sparse" / "0", dirs_exist_ok=True)
+    print(f"Reused reconstruction of {source_path.name} for static frame {frame_path.name}")
+    return True
+
+def prepare_frames(frame_folders, args, nobg_map=None):
+    """Feature masks (from nobg_map, see nobg.map_nobg_to_frames) and the pyramid level the frames are aligned on"""
+    if nobg_map:
+        print(f"\nGenerating feature masks from {args.nobg}...")
+        generate_masks({f: nobg_map[f] for f in frame_folders if f in nobg_map}, args.mask_threshold, args.mask_dilate)
+    
+    if args.level > 1:
+        print(f"\nBuilding pyramid level {args.level}...")
+        build_pyramid(frame_folders, [args.level])
+
+def align_frame(frame_folder, first_sparse_dir, static_frames, feature_cache=None, level=1):
+    """Register one frame against the first frame's model, or reuse its static source"""
+    images_path = frame_folder / level_dir_name("images", level)
+    if not images_path.exists():
+        raise RuntimeError(f"Images folder not found in {frame_folder.name}")
+    
+    source_name = static_frames.get(frame_folder.name)
+    if source_name and reuse_static_frame(frame_folder, frame_folder.parent / source_name):
+        return
+    
+    process_subsequent_frame(frame_folder, images_path, first_sparse_dir, feature_cache, level)
+
 def main():
     parser = argparse.ArgumentParser(description="COLMAP reconstruction pipeline for multi-frame data")
     parser.add_argument("project_path", help="Path to the project folder containing all frames")
     parser.add_argument("--colmap_exe", default="colmap", help="Path to COLMAP executable (default: colmap)")
+    parser.add_argument("--feature_cache", help="Directory for cached SIFT features, keyed by image content and extractor settings")
+    parser.add_argument("--step_log", help="JSONL file for per-step timing records (default: <project_path>/_steplog.jsonl)")
+    parser.add_argument("--nobg", help="Path to no background track folders; their alpha becomes COLMAP feature masks")
+    parser.add_argument("--mask_threshold", type=int, default=127, help="Alpha value above which a pixel counts as subject (default: 127)")
+    parser.add_argument("--mask_dilate", type=int, default=0, help="Grow masks by this many pixels to keep features on the silhouette (default: 0)")
+    parser.add_argument("--level", type=int, default=1, help="Align on images downscaled by this factor; sparse/0 is still written at full resolution (default: 1)")
+    parser.add_argument("--skip_static", action="store_true", help=f"Copy the model of the source frame for duplicates listed in {STATIC_FRAMES_FILE} (see static_frames.py)")
+    parser.add_argument("--queue", action="store_true", help="Claim frames from the shared queue in <project_path>/_queue/colalign, so several workers/nodes can run at once")
+    parser.add_argument("--lease", type=float, default=600.0, help="Seconds before a crashed worker's claim is released (default: 600)")
     
     args = parser.parse_args()
+    start_profiling("colalign")
     
     project_path = Path(args.project_path)
+    feature_cache = FeatureCache(args.feature_cache) if args.feature_cache else None
     
     if not project_path.exists():
         raise RuntimeError(f"Project path does not exist: {project_path}")
     
+    open_step_log(args.step_log or project_path / "_steplog.jsonl")
+    
     # Find all frame folders
-    frame_folders = sorted([d for d in project_path.iterdir() 
-                          if d.is_dir() and d.name.startswith("frame_")])
+    # Queue workers run on several nodes, so they leave the shared manifest file to a single writer
+    manifest = ProjectManifest(project_path, read_only=args.queue)
+    frame_folders = manifest.frame_folders()
     
     if not frame_folders:
         raise RuntimeError(f"No frame folders found in {project_path}")
@@ -166,28 +264,64 @@ def main():
     for frame in frame_folders:
         print(f"  - {frame.name}")
     
-    # Process first frame
+    # Track images map to frames by position, so the map is always built over all frames
+    nobg_map = map_nobg_to_frames(Path(args.nobg), frame_folders, manifest) if args.nobg else None
+    
+    level = args.level
+    images_dir = level_dir_name("images", level)
+    
+    static_frames = load_static_frames(project_path) if args.skip_static else {}
+    if args.skip_static:
+        print(f"\n{len(static_frames)} static frames will reuse an earlier reconstruction")
+    
     first_frame = frame_folders[0]
-    first_images_path = first_frame / "images"
+    first_images_path = first_frame / images_dir
+    first_sparse_dir = first_frame / level_dir_name("sparse", level)
+    
+    if args.queue:
+        # Each worker prepares only the frames it claims, so no two nodes write the same files
+        queue = FrameQueue(project_path, "colalign", args.lease)
+        frames_by_name = {frame_folder.name: frame_folder for frame_folder in frame_folders}
+        
+        def align_first(frame_name):
+            prepare_frames([first_frame], args, nobg_map)
+            process_first_frame(first_frame, first_images_path, feature_cache, level)
+        
+        def align_claimed(frame_name):
+            prepare_frames([frames_by_name[frame_name]], args, nobg_map)
+            align_frame(frames_by_name[frame_name], first_sparse_dir, static_frames, feature_cache, level)
+        
+        process_reference_frame(queue, first_frame.name, align_first)
+        completed, failed = work_loop(queue, [f.name for f in frame_folders[1:]], align_claimed)
+        print(f"\nThis worker aligned {len(completed)} frames, {len(failed)} failed")
+        if failed:
+            raise RuntimeError(f"Frames failed: {', '.join(failed)}")
+        print("\n=== All frames processed successfully! ===")
+        return
     
+    prepare_frames(frame_folders, args, nobg_map)
+    
+    # Process first frame
     if not first_images_path.exists():
         raise RuntimeError(f"Images folder not found in first frame: {first_images_path}")
     
-    first_sparse_dir = process_first_frame(first_frame, first_images_path)
+    first_sparse_dir = process_first_frame(first_frame, first_images_path, feature_cache, level)
     
     # Process subsequent frames
+    manifest.set_stage(first_frame.name, "colalign", "done")
+    tracker = track("colalign", len(frame_folders) - 1)
     for frame_folder in frame_folders[1:]:
-        images_path = frame_folder / "images"
-        
-        if not images_path.exists():
-            print(f"Warning: Images folder not found in {frame_folder.name}, skipping...")
-            continue
-        
         try:
-            process_subsequent_frame(frame_folder, images_path, first_sparse_dir)
+            with tracker.time("frame"):
+                align_frame(frame_folder, first_sparse_dir, static_frames, feature_cache, level)
         except Exception as e:
             print(f"Error processing frame {frame_folder.name}: {e}")
+            manifest.set_stage(frame_folder.name, "colalign", "failed")
             continue
+        finally:
+            tracker.update()
+        manifest.set_stage(frame_folder.name, "colalign", "done")
+    tracker.close()
     
     print("\n=== All frames processed successfully! ===")
 
@@ -0,0 +1,235 @@
+import shutil
+import struct
+from pathlib import Path
+
+import numpy as np
+
+# model_id -> (name, number of params, number of focal lengths); params start with f.. cx cy
+CAMERA_MODELS = {
+    0: ("SIMPLE_PINHOLE", 3, 1),
+    1: ("PINHOLE", 4, 2),
+    2: ("SIMPLE_RADIAL", 4, 1),
+    3: ("RADIAL", 5, 1),
+    4: ("OPENCV", 8, 2),
+    5: ("OPENCV_FISHEYE", 8, 2),
+    6: ("FULL_OPENCV", 12, 2),
+    7: ("FOV", 5, 2),
+    8: ("SIMPLE_RADIAL_FISHEYE", 4, 1),
+    9: ("RADIAL_FISHEYE", 5, 1),
+    10: ("THIN_PRISM_FISHEYE", 12, 2),
+}
+
+POINT2D_DTYPE = np.dtype([("x", "<f8"), ("y", "<f8"), ("point3D_id", "<i8")])
+# Fixed part of a points3D.bin record; track_length (image_id, point2D_idx) int32 pairs follow it
+POINT3D_DTYPE = np.dtype([("point3D_id", "<u8"), ("xyz", "<f8", 3), ("rgb", "u1", 3),
+                          ("error", "<f8"), ("track_length", "<u8")])
+TRACK_ELEMENT_SIZE = 8
+# Records gathered per numpy step, bounding the temporary index arrays
+POINT3D_CHUNK = 65536
+
+def read_cameras_binary(path):
+    """Read cameras.bin into {camera_id: {"model_id", "width", "height", "params"}}"""
+    cameras = {}
+    with open(path, "rb") as f:
+        num_cameras, = struct.unpack("<Q", f.read(8))
+        for _ in range(num_cameras):
+            camera_id, model_id, width, height = struct.unpack("<iiQQ", f.read(24))
+            num_params = CAMERA_MODELS[model_id][1]
+            params = np.frombuffer(f.read(8 * num_params), dtype="<f8").copy()
+            cameras[camera_id] = {
+                "model_id": model_id,
+                "width": width,
+                "height": height,
+                "params": params
+            }
+    return cameras
+
+def write_cameras_binary(cameras, path):
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(cameras)))
+        for camera_id, camera in cameras.items():
+            f.write(struct.pack("<iiQQ", camera_id, camera["model_id"], camera["width"], camera["height"]))
+            f.write(np.asarray(camera["params"], dtype="<f8").tobytes())
+
+def read_images_binary(path):
+    """Read images.bin into {image_id: {"qvec", "tvec", "camera_id", "name", "points2D"}}"""
+    images = {}
+    with open(path, "rb") as f:
+        data = f.read()
+
+    num_images, = struct.unpack_from("<Q", data, 0)
+    offset = 8
+    for _ in range(num_images):
+        image_id, = struct.unpack_from("<i", data, offset)
+        qvec = np.array(struct.unpack_from("<4d", data, offset + 4))
+        tvec = np.array(struct.unpack_from("<3d", data, offset + 36))
+        camera_id, = struct.unpack_from("<i", data, offset + 60)
+        offset += 64
+
+        name_end = data.index(b"\0", offset)
+        name = data[offset:name_end].decode("utf-8")
+        offset = name_end + 1
+
+        num_points2D, = struct.unpack_from("<Q", data, offset)
+        offset += 8
+        points2D = np.frombuffer(data, dtype=POINT2D_DTYPE, count=num_points2D, offset=offset).copy()
+        offset += num_points2D * POINT2D_DTYPE.itemsize
+
+        images[image_id] = {
+            "qvec": qvec,
+            "tvec": tvec,
+            "camera_id": camera_id,
+            "name": name,
+            "points2D": points2D
+        }
+    return images
+
+def write_images_binary(images, path):
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(images)))
+        for image_id, image in images.items():
+            f.write(struct.pack("<i", image_id))
+            f.write(struct.pack("<4d", *image["qvec"]))
+            f.write(struct.pack("<3d", *image["tvec"]))
+            f.write(struct.pack("<i", image["camera_id"]))
+            f.write(image["name"].encode("utf-8") + b"\0")
+            f.write(struct.pack("<Q", len(image["points2D"])))
+            f.write(np.ascontiguousarray(image["points2D"], dtype=POINT2D_DTYPE).tobytes())
+
+def read_points3D_binary(path):
+    """
+    Read points3D.bin into a POINT3D_DTYPE array (tracks are skipped).
+
+    Records have variable length, so one pass walks the track lengths to find
+    where each record starts; the fields are then gathered with numpy in chunks
+    instead of being unpacked point by point.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    num_points, = struct.unpack_from("<Q", data, 0)
+    starts = np.empty(num_points, dtype=np.int64)
+    unpack_length = struct.Struct("<Q").unpack_from
+    length_offset = POINT3D_DTYPE.fields["track_length"][1]
+    offset = 8
+    for i in range(num_points):
+        starts[i] = offset
+        offset += POINT3D_DTYPE.itemsize + TRACK_ELEMENT_SIZE * unpack_length(data, offset + length_offset)[0]
+    if offset != len(data):
+        raise RuntimeError(f"Unexpected size of {path}: records end at byte {offset} of {len(data)}")
+
+    raw = np.frombuffer(data, dtype=np.uint8)
+    record = np.arange(POINT3D_DTYPE.itemsize)
+    points = np.empty(num_points, dtype=POINT3D_DTYPE)
+    for first in range(0, num_points, POINT3D_CHUNK):
+        chunk = starts[first:first + POINT3D_CHUNK]
+        points[first:first + len(chunk)] = raw[chunk[:, None] + record].view(POINT3D_DTYPE)[:, 0]
+    return points
+
+def drop_images(model_dir, keep_names):
+    """
+    Remove images not in keep_names from a sparse model so COLMAP can reuse it
+    with fewer views. Remaining observations are unlinked and points3D.bin is
+    emptied, since tracks may reference the removed images.
+
+    Returns:
+        list: names of the removed images
+    """
+    model_dir = Path(model_dir)
+    images = read_images_binary(model_dir / "images.bin")
+    removed = [image["name"] for image in images.values() if image["name"] not in keep_names]
+    if not removed:
+        return removed
+
+    kept = {image_id: image for image_id, image in images.items() if image["name"] in keep_names}
+    for image in kept.values():
+        image["points2D"]["point3D_id"] = -1
+    write_images_binary(kept, model_dir / "images.bin")
+    with open(model_dir / "points3D.bin", "wb") as f:
+        f.write(struct.pack("<Q", 0))
+    return removed
+
+def qvec_to_rotmat(qvec):
+    """World-to-camera rotation matrix from a COLMAP (w, x, y, z) quaternion"""
+    w, x, y, z = qvec
+    return np.array([
+        [1 - 2 * y * y - 2 * z * z, 2 * x * y - 2 * w * z, 2 * z * x + 2 * w * y],
+        [2 * x * y + 2 * w * z, 1 - 2 * x * x - 2 * z * z, 2 * y * z - 2 * w * x],
+        [2 * z * x - 2 * w * y, 2 * y * z + 2 * w * x, 1 - 2 * x * x - 2 * y * y]
+    ])
+
+def camera_views(model_dir):
+    """
+    Stack the registered views of a sparse model for vectorized projection.
+
+    Returns:
+        tuple: (rotations (V, 3, 3), translations (V, 3), focal lengths in pixels (V,))
+    """
+    model_dir = Path(model_dir)
+    cameras = read_cameras_binary(model_dir / "cameras.bin")
+    images = read_images_binary(model_dir / "images.bin")
+
+    rotations, translations, focals = [], [], []
+    for image in images.values():
+        camera = cameras[image["camera_id"]]
+        num_focal = CAMERA_MODELS[camera["model_id"]][2]
+        rotations.append(qvec_to_rotmat(image["qvec"]))
+        translations.append(image["tvec"])
+        focals.append(np.mean(camera["params"][:num_focal]))
+    return np.array(rotations), np.array(translations), np.array(focals)
+
+def rescale_model(src_dir, dst_dir, full_sizes):
+    """
+    Copy a sparse model reconstructed on downscaled images to full resolution.
+
+    Intrinsics and 2D observations are scaled by the ratio between each image's
+    full-resolution size and the size its camera was calibrated at. Poses and
+    points3D.bin are resolution independent and copied unchanged.
+
+    Args:
+        src_dir (Path): Sparse model folder (cameras.bin, images.bin, points3D.bin)
+        dst_dir (Path): Output model folder
+        full_sizes (dict): Image name -> (width, height) at full resolution
+    """
+    src_dir = Path(src_dir)
+    dst_dir = Path(dst_dir)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+
+    cameras = read_cameras_binary(src_dir / "cameras.bin")
+    images = read_images_binary(src_dir / "images.bin")
+
+    camera_scales = {}
+    for image in images.values():
+        if image["camera_id"] in camera_scales or image["name"] not in full_sizes:
+            continue
+        camera = cameras[image["camera_id"]]
+        full_width, full_height = full_sizes[image["name"]]
+        camera_scales[image["camera_id"]] = (full_width / camera["width"], full_height / camera["height"],
+                                             full_width, full_height)
+
+    for camera_id, (scale_x, scale_y, full_width, full_height) in camera_scales.items():
+        camera = cameras[camera_id]
+        _, _, num_focal = CAMERA_MODELS[camera["model_id"]]
+        params = camera["params"].copy()
+        if num_focal == 1:
+            params[0] *= scale_x
+            params[1] *= scale_x
+            params[2] *= scale_y
+        else:
+            params[[0, 2]] *= scale_x
+            params[[1, 3]] *= scale_y
+        camera.update(width=full_width, height=full_height, params=params)
+
+    for image in images.values():
+        if image["camera_id"] not in camera_scales:
+            continue
+        scale_x, scale_y, _, _ = camera_scales[image["camera_id"]]
+        image["points2D"]["x"] *= scale_x
+        image["points2D"]["y"] *= scale_y
+
+    write_cameras_binary(cameras, dst_dir / "cameras.bin")
+    write_images_binary(images, dst_dir / "images.bin")
+    if (src_dir / "points3D.bin").exists():
+        shutil.copy2(src_dir / "points3D.bin", dst_dir / "points3D.bin")
+
+    print(f"Rescaled {len(camera_scales)} cameras to full resolution: {dst_dir}")
@@ -1,41 +1,140 @@
-import subprocess
+import os
+import shutil
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from feature_cache import hash_file
+from manifest import ProjectManifest
+from nobg import map_nobg_to_frames
+from profiling import start_profiling
+
+def nobg_name(image_name):
+    """Name of a view's nobg copy: the COLMAP image name as .png, since the nobg files are PNGs with alpha"""
+    return str(Path(image_name).with_suffix(".png"))
+
+def is_up_to_date(src, dst, use_hash=False):
+    """True if dst already holds src: same file, or same size and mtime (or hash)"""
+    if not dst.exists():
+        return False
+
+    if os.path.samefile(src, dst):
+        return True
+
+    src_stat = src.stat()
+    dst_stat = dst.stat()
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+
+    if use_hash:
+        return hash_file(src) == hash_file(dst)
+
+    # Whole seconds, so copies on filesystems with coarse timestamps still match
+    return int(src_stat.st_mtime) == int(dst_stat.st_mtime)
+
+def sync_file(src, dst, mode="link", use_hash=False, dry_run=False):
+    """
+    Bring dst in line with src.
+
+    Returns:
+        str: "skipped", "linked", "symlinked" or "copied"
+    """
+    if is_up_to_date(src, dst, use_hash):
+        return "skipped"
+
+    if dry_run:
+        print(f"Would sync {src} -> {dst}")
+        return "copied" if mode == "copy" else f"{mode}ed"
+
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+
+    if mode == "link":
+        try:
+            os.link(src, dst)
+            return "linked"
+        except OSError:
+            # Different volume or no hard link support, fall back to a copy
+            pass
+    elif mode == "symlink":
+        try:
+            dst.symlink_to(src.resolve())
+            return "symlinked"
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+    return "copied"
+
+def remove_stale(dest_dir, keep_names, dry_run=False):
+    """Delete files in dest_dir that no longer have a nobg source"""
+    removed = 0
+    for path in dest_dir.iterdir():
+        if path.is_file() and path.name not in keep_names:
+            if dry_run:
+                print(f"Would delete {path}")
+            else:
+                path.unlink()
+            removed += 1
+    return removed
+
 def main():
     parser = argparse.ArgumentParser(description="Copy colmap data from one folder to another")
-    parser.add_argument("--colmap", help="Path to colmap frames")
-    parser.add_argument("--nobg", help="Path to no background frames")
-
+    parser.add_argument("--colmap", help="Path to colmap frames", required=True)
+    parser.add_argument("--nobg", help="Path to no background frames", required=True)
+    parser.add_argument("--dest", default="images_nobg", help="Folder inside each colmap frame to sync into, one <image name>.png per view (default: images_nobg)")
+    parser.add_argument("--mode", choices=["link", "symlink", "copy"], default="link", help="How to transfer files; links fall back to copies (default: link)")
+    parser.add_argument("--hash", action='store_true', help="Compare contents by SHA-256 instead of size and mtime")
+    parser.add_argument("--delete", action='store_true', help="Delete files in the destination that have no nobg source")
+    parser.add_argument("--workers", type=int, default=16, help="Number of transfer threads (default: 16)")
+    parser.add_argument("--dry_run", action='store_true', help="Only print what would change")
 
     args = parser.parse_args()
+    start_profiling("copy2nobg")
 
     colmap_path = Path(args.colmap)
     nobg_path = Path(args.nobg)
 
-    colmap_frame_folders = sorted([d for d in colmap_path.iterdir()
-                          if d.is_dir()])
-    
-    nobg_frame_folders = sorted([d for d in nobg_path.iterdir()
-                            if d.is_dir()])
+    if not colmap_path.exists():
+        raise RuntimeError(f"Colmap path does not exist: {colmap_path}")
+
+    if not nobg_path.exists():
+        raise RuntimeError(f"No background path does not exist: {nobg_path}")
+
+    with ProjectManifest(colmap_path) as manifest:
+        colmap_frame_folders = manifest.frame_folders()
+
+        if not colmap_frame_folders:
+            raise RuntimeError(f"No frame folders found in {colmap_path}")
+
+        frame_map = map_nobg_to_frames(nobg_path, colmap_frame_folders, manifest)
 
-    nobg_dict = {}
+    jobs = []
+    removed = 0
+    for colmap, pairs in frame_map.items():
+        dest_dir = colmap / args.dest
+        if not args.dry_run:
+            dest_dir.mkdir(exist_ok=True)
 
-    for track_folder in nobg_frame_folders:
-        images = sorted([img for img in track_folder.glob("*.png")])
-        nobg_dict[track_folder.name] = images
-        
+        for nobg_image, image_name in pairs:
+            jobs.append((nobg_image, dest_dir / nobg_name(image_name)))
 
-    #for i in len(colmap_frame_folders):
+        if args.delete and dest_dir.exists():
+            removed += remove_stale(dest_dir, {nobg_name(image_name) for _, image_name in pairs}, args.dry_run)
 
-    for colmap in colmap_frame_folders:
-        print(f"Processing folder: {colmap.name}")
+    print(f"Syncing {len(jobs)} files into {len(frame_map)} frame folders ({args.mode} mode)...")
 
-    for track in nobg_dict:
-        print(f"Processing track: {track}")
-        for img in nobg_dict[track]:
-            print(f"Copying {img.name} to {colmap / track}")
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        outcomes = list(executor.map(
+            lambda job: sync_file(job[0], job[1], args.mode, args.hash, args.dry_run), jobs))
 
+    counts = {outcome: outcomes.count(outcome) for outcome in set(outcomes)}
+    print(f"\nSkipped (up to date): {counts.get('skipped', 0)}")
+    print(f"Hard linked: {counts.get('linked', 0)}")
+    print(f"Symlinked: {counts.get('symlinked', 0)}")
+    print(f"Copied: {counts.get('copied', 0)}")
+    if args.delete:
+        print(f"Deleted: {removed}")
 
     print("\n=== All frames processed successfully! ===")
 
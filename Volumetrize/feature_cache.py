@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp"}
+
+def list_colmap_images(images_path):
+    """List images under images_path by the relative names COLMAP gives them"""
+    images_path = Path(images_path)
+    names = []
+    for path in images_path.rglob("*"):
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+            names.append(path.relative_to(images_path).as_posix())
+    return sorted(names)
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FeatureCache:
+    """
+    Content-addressed cache of COLMAP SIFT features.
+
+    Each entry holds the keypoints, descriptors and camera row COLMAP produced
+    for one image, keyed by the SHA-256 of the image (and its mask, if any) and
+    the feature extractor settings. Entries are stored as .npz files under
+    cache_dir/<key[:2]>/.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, image_digest, settings, mask_digest=None):
+        payload = json.dumps({"image": image_digest, "mask": mask_digest, "settings": list(settings)})
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.npz"
+
+    def keys_for(self, images_path, settings, mask_path=None):
+        """Map each image name in images_path to its cache key"""
+        images_path = Path(images_path)
+        keys = {}
+        for name in list_colmap_images(images_path):
+            mask_digest = None
+            if mask_path is not None:
+                mask_file = Path(mask_path) / f"{name}.png"
+                if mask_file.exists():
+                    mask_digest = hash_file(mask_file)
+            keys[name] = self._key(hash_file(images_path / name), settings, mask_digest)
+        return keys
+
+    def lookup(self, images_path, settings, mask_path=None):
+        """
+        Look up every image in images_path. A partial hit still needs a full COLMAP extraction.
+
+        Returns:
+            tuple: ({image name: cache key}, {image name: entry path} if every image
+                is cached, otherwise None). Pass the keys to store() after a miss,
+                so the images are not hashed again.
+        """
+        keys = self.keys_for(images_path, settings, mask_path)
+        if not keys:
+            return keys, None
+
+        entries = {}
+        for name, key in keys.items():
+            entry_path = self._entry_path(key)
+            if not entry_path.exists():
+                return keys, None
+            entries[name] = entry_path
+        return keys, entries
+
+    def store(self, database_path, images_path, settings, mask_path=None, keys=None):
+        """Copy the features of every image in database_path into the cache; keys as returned by lookup()"""
+        if keys is None:
+            keys = self.keys_for(images_path, settings, mask_path)
+
+        connection = sqlite3.connect(str(database_path))
+        try:
+            rows = connection.execute(
+                "SELECT images.name, cameras.model, cameras.width, cameras.height, "
+                "cameras.params, cameras.prior_focal_length, "
+                "keypoints.rows, keypoints.cols, keypoints.data, "
+                "descriptors.rows, descriptors.cols, descriptors.data "
+                "FROM images "
+                "JOIN cameras ON images.camera_id = cameras.camera_id "
+                "JOIN keypoints ON images.image_id = keypoints.image_id "
+                "JOIN descriptors ON images.image_id = descriptors.image_id"
+            ).fetchall()
+        finally:
+            connection.close()
+
+        stored = 0
+        for (name, model, width, height, params, prior_focal_length,
+             kp_rows, kp_cols, kp_data, desc_rows, desc_cols, desc_data) in rows:
+            if name not in keys:
+                continue
+
+            entry_path = self._entry_path(keys[name])
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = entry_path.with_name(entry_path.stem + f".{os.getpid()}.tmp.npz")
+
+            np.savez(
+                tmp_path,
+                model=np.int64(model),
+                width=np.int64(width),
+                height=np.int64(height),
+                params=np.frombuffer(params, dtype=np.float64),
+                prior_focal_length=np.int64(prior_focal_length),
+                keypoints=np.frombuffer(kp_data or b"", dtype=np.float32).reshape(kp_rows, kp_cols),
+                descriptors=np.frombuffer(desc_data or b"", dtype=np.uint8).reshape(desc_rows, desc_cols),
+            )
+            os.replace(tmp_path, entry_path)
+            stored += 1
+
+        print(f"Cached features for {stored} images")
+        return stored
+
+    def import_entries(self, database_path, entries):
+        """
+        Write cached features into an empty COLMAP database.
+
+        The database must already have COLMAP's schema (colmap database_creator),
+        so the tables match whatever COLMAP version reads it afterwards.
+        """
+        connection = sqlite3.connect(str(database_path))
+        try:
+            for image_id, name in enumerate(sorted(entries), start=1):
+                with np.load(entries[name]) as entry:
+                    keypoints = np.ascontiguousarray(entry["keypoints"], dtype=np.float32)
+                    descriptors = np.ascontiguousarray(entry["descriptors"], dtype=np.uint8)
+
+                    cursor = connection.execute(
+                        "INSERT INTO cameras (model, width, height, params, prior_focal_length) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (int(entry["model"]), int(entry["width"]), int(entry["height"]),
+                         np.ascontiguousarray(entry["params"], dtype=np.float64).tobytes(),
+                         int(entry["prior_focal_length"]))
+                    )
+                    camera_id = cursor.lastrowid
+
+                connection.execute(
+                    "INSERT INTO images (image_id, name, camera_id) VALUES (?, ?, ?)",
+                    (image_id, name, camera_id)
+                )
+                connection.execute(
+                    "INSERT INTO keypoints (image_id, rows, cols, data) VALUES (?, ?, ?, ?)",
+                    (image_id, keypoints.shape[0], keypoints.shape[1], keypoints.tobytes())
+                )
+                connection.execute(
+                    "INSERT INTO descriptors (image_id, rows, cols, data) VALUES (?, ?, ?, ?)",
+                    (image_id, descriptors.shape[0], descriptors.shape[1], descriptors.tobytes())
+                )
+            connection.commit()
+        finally:
+            connection.close()
+
+        print(f"Imported cached features for {len(entries)} images")
@@ -0,0 +1,119 @@
+"""
+Memory-mapped container shared by splat_pack.py (.vvsp) and sparse_timeline.py (.vvst):
+many frames of one structured record type, back to back in a single file.
+
+File layout (all little endian):
+
+    header   "<4sHHIQQ"  magic, version, reserved, frame count F,
+                         metadata size M, data offset
+    metadata M bytes     JSON: record dtype as [[name, type], ...], frame names
+                         and whatever else the format stores
+    offsets  uint64[F+1] first record of each frame, then the total record count
+    padding              up to the data offset (page aligned)
+    records              every frame's records back to back, fixed stride
+
+Frame i is records[offsets[i]:offsets[i+1]], so opening a frame is a slice of
+the mapping: no parsing and no copy.
+"""
+
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import numpy as np
+
+HEADER = struct.Struct("<4sHHIQQ")
+ALIGNMENT = 4096
+
+def write_header(f, magic, version, metadata, offsets):
+    """
+    Write header, metadata and offsets at the start of f, then pad the file up
+    to the data offset and leave f there for the records. The padding is written
+    even when no records follow, so an all-empty container still maps.
+
+    Args:
+        f: File opened for binary writing
+        magic (bytes): 4-byte format tag
+        version (int): Format version
+        metadata (dict): JSON-serializable metadata, including "dtype" and "frames"
+        offsets (np.ndarray): uint64[F+1] frame offsets; may be rewritten later with write_offsets
+
+    Returns:
+        int: Size of the encoded metadata, for write_offsets
+    """
+    encoded = json.dumps(metadata).encode("utf-8")
+    table_offset = HEADER.size + len(encoded)
+    data_offset = -(-(table_offset + 8 * len(offsets)) // ALIGNMENT) * ALIGNMENT
+
+    f.seek(0)
+    f.write(HEADER.pack(magic, version, 0, len(offsets) - 1, len(encoded), data_offset))
+    f.write(encoded)
+    f.write(np.asarray(offsets, dtype="<u8").tobytes())
+    f.truncate(data_offset)
+    f.seek(data_offset)
+    return len(encoded)
+
+def write_offsets(f, metadata_size, offsets):
+    """Rewrite the offsets table once the frame sizes are known"""
+    f.seek(HEADER.size + metadata_size)
+    f.write(np.asarray(offsets, dtype="<u8").tobytes())
+
+def dtype_metadata(dtype):
+    return [[name, dtype[name].str] for name in dtype.names]
+
+class FrameContainer:
+    """Read-only view of a container file; indexing returns one frame's records without a copy"""
+
+    def __init__(self, path, magic, version):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        found, found_version, _, frame_count, metadata_size, data_offset = HEADER.unpack_from(self._map, 0)
+        name = magic.decode("ascii")
+        if found != magic:
+            raise RuntimeError(f"Not a {name} file: {self.path}")
+        if found_version != version:
+            raise RuntimeError(f"Unsupported {name} version: {found_version}")
+
+        self.metadata = json.loads(self._map[HEADER.size:HEADER.size + metadata_size].decode("utf-8"))
+        self.dtype = np.dtype([tuple(field) for field in self.metadata["dtype"]])
+        self.names = self.metadata["frames"]
+        self.offsets = np.frombuffer(self._map, dtype="<u8", count=frame_count + 1,
+                                     offset=HEADER.size + metadata_size)
+        # frombuffer rejects an offset at the very end of the file, which is where empty data starts
+        self.records = np.empty(0, dtype=self.dtype)
+        if self.offsets[-1]:
+            self.records = np.frombuffer(self._map, dtype=self.dtype, count=int(self.offsets[-1]),
+                                         offset=data_offset)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        return self.records[self.offsets[index]:self.offsets[index + 1]]
+
+    def frame(self, name):
+        return self[self.names.index(name)]
+
+    def close(self):
+        """
+        Release the mapping. Frames returned by indexing are views of it: if a caller
+        still holds one, the mapping stays open until the last view is dropped.
+        """
+        self.records = None
+        self.offsets = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
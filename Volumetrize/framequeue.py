@@ -0,0 +1,334 @@
+"""
+Frame work queue on a shared filesystem, for running one stage on many nodes.
+
+Each stage keeps a folder of marker files under <project>/_queue/<stage>:
+
+    <frame>.lock    claimed; created with O_EXCL, so exactly one worker wins it.
+                    Its mtime is the lease: the holder touches it while working,
+                    and a lock older than the lease is taken over by others.
+    <frame>.done    finished
+    <frame>.failed  gave up; JSON with the error, retried only after a reset
+
+Only exclusive create, unlink and mtime updates are used, which SMB and NFS both
+provide atomically.
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from manifest import list_frame_folders
+from progress import track
+
+QUEUE_DIR = "_queue"
+# A stale-lock takeover holds this for a moment; older ones are left by a crash
+BREAKER_TIMEOUT = 60.0
+
+class FrameQueue:
+    def __init__(self, project_path, stage, lease_seconds=600.0):
+        """
+        Args:
+            project_path (Path): Project folder shared by all workers
+            stage (str): Stage name; each stage has its own queue
+            lease_seconds (float): Locks not renewed for this long are released to other workers
+        """
+        self.path = Path(project_path) / QUEUE_DIR / stage
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _marker(self, frame_name, kind):
+        return self.path / f"{frame_name}.{kind}"
+
+    def markers(self):
+        """
+        All markers of the queue from one directory listing, as {frame name: {kind: lock mtime or None}}.
+        Only locks are stat'ed, so looking up many frames costs one listing instead of a few calls per frame.
+        """
+        markers = {}
+        with os.scandir(self.path) as it:
+            for entry in it:
+                frame_name, _, kind = entry.name.rpartition(".")
+                if kind not in ("done", "failed", "lock"):
+                    continue
+                mtime = None
+                if kind == "lock":
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                markers.setdefault(frame_name, {})[kind] = mtime
+        return markers
+
+    def _frame_markers(self, frame_name):
+        """Markers of one frame, as in markers(), checking only as many files as needed"""
+        for kind in ("done", "failed"):
+            if self._marker(frame_name, kind).exists():
+                return {kind: None}
+        try:
+            return {"lock": self._marker(frame_name, "lock").stat().st_mtime}
+        except FileNotFoundError:
+            return {}
+
+    def state(self, frame_name, markers=None):
+        """
+        'done', 'failed', 'claimed', 'stale' or 'pending'. Pass markers (from markers())
+        when looking up many frames; without it the frame's own files are checked.
+        """
+        kinds = markers.get(frame_name, {}) if markers is not None else self._frame_markers(frame_name)
+        if "done" in kinds:
+            return "done"
+        if "failed" in kinds:
+            return "failed"
+        if "lock" not in kinds:
+            return "pending"
+        return "stale" if time.time() - kinds["lock"] > self.lease_seconds else "claimed"
+
+    def _create_lock(self, frame_name):
+        try:
+            fd = os.open(self._marker(frame_name, "lock"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": self.worker_id, "claimed": datetime.now().isoformat(timespec="seconds")}, f)
+        return True
+
+    def _break_stale_lock(self, frame_name):
+        """Remove a lock whose lease ran out; True if this worker removed it"""
+        breaker = self._marker(frame_name, "break")
+        try:
+            if time.time() - breaker.stat().st_mtime > BREAKER_TIMEOUT:
+                breaker.unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass
+
+        try:
+            os.close(os.open(breaker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        try:
+            # Check again under the breaker: the lock may have been renewed or replaced meanwhile
+            if self.state(frame_name) != "stale":
+                return False
+            print(f"Releasing expired claim on {frame_name} ({self.owner(frame_name)})")
+            self._marker(frame_name, "lock").unlink(missing_ok=True)
+            return True
+        finally:
+            breaker.unlink(missing_ok=True)
+
+    def owner(self, frame_name):
+        try:
+            with open(self._marker(frame_name, "lock"), "r", encoding="utf-8") as f:
+                return json.load(f).get("worker")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def claim(self, frame_names):
+        """Claim the first pending (or expired) frame, or return None if there is none right now"""
+        # The listing may be outdated by the time a frame is tried; the exclusive create and
+        # the checks under the breaker decide, so it only has to find the candidates
+        markers = self.markers()
+        for frame_name in frame_names:
+            state = self.state(frame_name, markers)
+            if state == "stale":
+                self._break_stale_lock(frame_name)
+            elif state != "pending":
+                continue
+            if self._create_lock(frame_name):
+                # Another worker may have finished it between the check and the claim
+                if self._marker(frame_name, "done").exists():
+                    self._marker(frame_name, "lock").unlink(missing_ok=True)
+                    continue
+                return frame_name
+        return None
+
+    def renew(self, frame_name):
+        """Extend the lease; False if the claim was lost to another worker"""
+        if self.owner(frame_name) != self.worker_id:
+            return False
+        os.utime(self._marker(frame_name, "lock"))
+        return True
+
+    def complete(self, frame_name):
+        """Mark the frame done; False, writing nothing, if the claim was lost to another worker"""
+        if self.owner(frame_name) != self.worker_id:
+            return False
+        self._marker(frame_name, "done").touch()
+        self._marker(frame_name, "lock").unlink(missing_ok=True)
+        return True
+
+    def fail(self, frame_name, error):
+        """Mark the frame failed; False, writing nothing, if the claim was lost to another worker"""
+        if self.owner(frame_name) != self.worker_id:
+            return False
+        with open(self._marker(frame_name, "failed"), "w", encoding="utf-8") as f:
+            json.dump({"worker": self.worker_id, "error": str(error),
+                       "time": datetime.now().isoformat(timespec="seconds")}, f)
+        self._marker(frame_name, "lock").unlink(missing_ok=True)
+        return True
+
+    def wait_done(self, frame_name, poll_seconds=10.0):
+        """Block until frame_name is done; raises if it failed"""
+        while True:
+            state = self.state(frame_name)
+            if state == "done":
+                return
+            if state == "failed":
+                raise RuntimeError(f"{frame_name} failed on another worker, see {self._marker(frame_name, 'failed')}")
+            time.sleep(poll_seconds)
+
+    def reset(self, failed_only=False):
+        """Delete failed markers (and with failed_only=False, all markers) so frames run again"""
+        kinds = (".failed",) if failed_only else (".failed", ".done", ".lock", ".break")
+        removed = 0
+        for marker in self.path.iterdir():
+            if marker.suffix in kinds:
+                marker.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+class Heartbeat:
+    """Renews a frame's lease in the background while the frame is being processed"""
+
+    def __init__(self, queue, frame_name):
+        self.queue = queue
+        self.frame_name = frame_name
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.renew(self.frame_name):
+                print(f"Warning: lost the claim on {self.frame_name}")
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def process_reference_frame(queue, frame_name, process, poll_seconds=10.0):
+    """
+    Run process(frame_name) if this worker claims the frame, otherwise wait for
+    the worker that did. For stages where every frame builds on the first one.
+    """
+    if queue.claim([frame_name]) != frame_name:
+        print(f"[{queue.worker_id}] waiting for {frame_name} on another worker...")
+        queue.wait_done(frame_name, poll_seconds)
+        return
+
+    print(f"[{queue.worker_id}] claimed reference frame {frame_name}")
+    try:
+        with Heartbeat(queue, frame_name):
+            process(frame_name)
+    except Exception as e:
+        queue.fail(frame_name, e)
+        raise
+    if not queue.complete(frame_name):
+        # The claim expired and another worker took the frame over; its result stands
+        queue.wait_done(frame_name, poll_seconds)
+
+def work_loop(queue, frame_names, process, poll_seconds=10.0, tracker=None):
+    """
+    Claim and process frames until every frame is done or failed.
+
+    Args:
+        queue (FrameQueue): Queue of the stage
+        frame_names (list): All frames of the stage, in preferred order
+        process (callable): process(frame_name), raising on failure
+        poll_seconds (float): Wait between checks while other workers hold the remaining frames
+        tracker (Tracker): Progress tracker shared by several loops (default: one of its own)
+
+    Returns:
+        tuple: (frames completed by this worker, frames failed by this worker)
+    """
+    own_tracker = tracker is None
+    if own_tracker:
+        # Other workers share the frames, so this worker cannot know its own total
+        tracker = track(queue.path.name, unit="frames")
+
+    completed, failed = [], []
+    try:
+        while True:
+            frame_name = queue.claim(frame_names)
+            if frame_name is None:
+                markers = queue.markers()
+                if all(queue.state(name, markers) in ("done", "failed") for name in frame_names):
+                    return completed, failed
+                # Remaining frames belong to live workers; their leases may still run out
+                time.sleep(poll_seconds)
+                continue
+
+            print(f"[{queue.worker_id}] claimed {frame_name}")
+            try:
+                with Heartbeat(queue, frame_name) as heartbeat, tracker.time("frame"):
+                    process(frame_name)
+            except Exception as e:
+                print(f"[{queue.worker_id}] {frame_name} failed: {e}")
+                # After losing the claim the frame is another worker's, failed or not
+                if queue.fail(frame_name, e):
+                    failed.append(frame_name)
+                continue
+
+            if heartbeat.lost or not queue.complete(frame_name):
+                # Someone else took over; their result stands
+                print(f"[{queue.worker_id}] lost the claim on {frame_name}, leaving it to its new owner")
+                continue
+            completed.append(frame_name)
+            tracker.update()
+            if tracker.enabled:
+                # One listing of the queue per frame, only paid while metrics are on
+                markers = queue.markers()
+                tracker.queue_depth("pending", sum(queue.state(name, markers) in ("pending", "stale") for name in frame_names))
+    finally:
+        if own_tracker:
+            tracker.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or reset the shared frame work queues of a project")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (("status", "Count frames per state"), ("reset", "Clear markers so frames run again")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("project_path", help="Path to the project folder")
+        sub.add_argument("--stage", required=True, help="Stage name (e.g. train, colalign, rsalign)")
+        sub.add_argument("--lease", type=float, default=600.0, help="Lease length in seconds (default: 600)")
+    subparsers.choices["reset"].add_argument("--failed_only", action="store_true", help="Only clear failed frames")
+
+    args = parser.parse_args()
+
+    project_path = Path(args.project_path)
+    if not project_path.exists():
+        raise RuntimeError(f"Project path does not exist: {project_path}")
+    queue = FrameQueue(project_path, args.stage, args.lease)
+
+    if args.command == "reset":
+        print(f"Removed {queue.reset(args.failed_only)} markers from {queue.path}")
+        return
+
+    frame_names = [frame_folder.name for frame_folder in list_frame_folders(project_path, read_only=True)]
+    markers = queue.markers()
+    states = {}
+    for name in frame_names:
+        states.setdefault(queue.state(name, markers), []).append(name)
+    print(f"Queue {queue.path} ({len(frame_names)} frames):")
+    for state in ("done", "claimed", "stale", "failed", "pending"):
+        names = states.get(state, [])
+        print(f"  {state:<8}{len(names):>6}")
+        if state in ("claimed", "stale", "failed"):
+            for name in names:
+                print(f"      {name} ({queue.owner(name) or '-'})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+SQLite index of a project's frames, images and per-frame stage status.
+
+Every directory listing is stored with the directory's mtime. A directory is
+only listed again once its mtime changes, which happens whenever an entry is
+added, removed or renamed in it, so a refresh of an unchanged project costs one
+stat per directory instead of one per file. Files rewritten in place keep the
+directory mtime; run a full refresh (rescan=True) after editing images by hand.
+The manifest only caches what is on disk, so deleting it costs one full scan.
+
+SQLite's file locking is not reliable on SMB or NFS shares, so only one machine
+may write the manifest: the extractor and tools run on a single machine. Workers
+that run on several nodes at once (the --queue modes) open it read_only; they
+start from an in-memory copy, or from a plain directory scan when the file is
+missing or cannot be read, and never write it back.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from feature_cache import IMAGE_EXTENSIONS, hash_file
+
+MANIFEST_FILE = "_manifest.sqlite"
+# Directories changed this recently may still change within the same mtime tick
+# (SMB and FAT report whole seconds), so their listing is not trusted next time
+MTIME_SETTLE_SECONDS = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    PRIMARY KEY (dir, name)
+);
+CREATE TABLE IF NOT EXISTS stages (
+    frame TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (frame, stage)
+);
+"""
+
+def open_snapshot(manifest_path):
+    """In-memory copy of a manifest file; empty, so everything is listed from disk, when it cannot be read"""
+    connection = sqlite3.connect(":memory:")
+    if not manifest_path.exists():
+        return connection
+    try:
+        source = sqlite3.connect(f"{manifest_path.as_uri()}?mode=ro", uri=True, timeout=5)
+        try:
+            source.backup(connection)
+        finally:
+            source.close()
+    except sqlite3.Error as e:
+        print(f"Warning: Could not read {manifest_path} ({e}), listing the project from disk")
+        connection.close()
+        connection = sqlite3.connect(":memory:")
+    return connection
+
+class ProjectManifest:
+    def __init__(self, project_path, rescan=False, read_only=False):
+        """
+        Args:
+            project_path (Path): Project folder holding the frame_XXXXX folders
+            rescan (bool): Ignore stored listings and list every directory again
+            read_only (bool): Never write the manifest file; listings and stage status
+                updated by this instance are kept in memory only
+        """
+        self.root = Path(project_path)
+        self.project_path = Path(os.path.abspath(project_path))
+        self.rescan = rescan
+        self.read_only = read_only
+        self._scanned = set()
+        self.scans = 0
+        if read_only:
+            self.connection = open_snapshot(self.project_path / MANIFEST_FILE)
+        else:
+            self.connection = sqlite3.connect(str(self.project_path / MANIFEST_FILE), timeout=30)
+            # A persistent journal keeps the project folder's own mtime still between writes
+            self.connection.execute("PRAGMA journal_mode=PERSIST")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _key(self, path):
+        """Directories inside the project are stored relative to it, so the project can be moved"""
+        path = Path(os.path.abspath(path))
+        try:
+            return path.relative_to(self.project_path).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def _path(self, key):
+        return Path(key) if os.path.isabs(key) else self.project_path / key
+
+    def scan_dir(self, path, writer=False):
+        """
+        List path from disk and store the listing, keeping hashes of unchanged files.
+
+        Args:
+            path (Path): Directory to list
+            writer (bool): The caller has just finished writing the directory and nothing
+                else writes to it, so the listing is trusted even though it is fresh
+        """
+        key = self._key(path)
+        path = self._path(key)
+        try:
+            dir_mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self.connection:
+                self.connection.execute("DELETE FROM entries WHERE dir = ?", (key,))
+                self.connection.execute("DELETE FROM dirs WHERE path = ?", (key,))
+            return
+
+        known = {name: (size, mtime_ns, sha256) for name, size, mtime_ns, sha256 in self.connection.execute(
+            "SELECT name, size, mtime_ns, sha256 FROM entries WHERE dir = ?", (key,))}
+
+        rows = []
+        with os.scandir(path) as it:
+            for entry in it:
+                stat = entry.stat()
+                is_dir = entry.is_dir()
+                size = 0 if is_dir else stat.st_size
+                previous = known.get(entry.name)
+                sha256 = previous[2] if previous and previous[:2] == (size, stat.st_mtime_ns) else None
+                rows.append((key, entry.name, int(is_dir), size, stat.st_mtime_ns, sha256))
+
+        if not writer and time.time() - dir_mtime / 1e9 < MTIME_SETTLE_SECONDS:
+            dir_mtime = -1
+        with self.connection:
+            self.connection.execute("DELETE FROM entries WHERE dir = ?", (key,))
+            self.connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.connection.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (key, dir_mtime))
+        self._scanned.add(key)
+        self.scans += 1
+
+    def listdir(self, path):
+        """
+        Entries of path as (name, is_dir, size, mtime_ns) sorted by name, from the
+        stored listing when the directory has not changed since it was taken.
+        """
+        key = self._key(path)
+        if key not in self._scanned:
+            row = self.connection.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (key,)).fetchone()
+            try:
+                current = self._path(key).stat().st_mtime_ns
+            except FileNotFoundError:
+                current = None
+            if self.rescan or row is None or current is None or row[0] != current:
+                self.scan_dir(self._path(key))
+            self._scanned.add(key)
+
+        return [(name, bool(is_dir), size, mtime_ns) for name, is_dir, size, mtime_ns in self.connection.execute(
+            "SELECT name, is_dir, size, mtime_ns FROM entries WHERE dir = ? ORDER BY name", (key,))]
+
+    def frame_folders(self):
+        """Sorted frame_XXXXX folders of the project"""
+        return [self.root / name for name, is_dir, _, _ in self.listdir(self.root)
+                if is_dir and name.startswith("frame_")]
+
+    def images(self, path):
+        """Sorted image file names directly inside path (e.g. frame_00000/images)"""
+        return [name for name, is_dir, _, _ in self.listdir(path)
+                if not is_dir and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+
+    def subdirs(self, path):
+        return [Path(path) / name for name, is_dir, _, _ in self.listdir(path) if is_dir]
+
+    def refresh(self, folders=("images",)):
+        """
+        Bring the listings of the project, its frames and the given frame subfolders up to date.
+
+        Returns:
+            int: Number of directories that had to be listed again
+        """
+        self._scanned.clear()
+        scans = self.scans
+        for frame_folder in self.frame_folders():
+            self.listdir(frame_folder)
+            for folder in folders:
+                self.listdir(frame_folder / folder)
+        return self.scans - scans
+
+    def hash_images(self, folders=("images",)):
+        """Fill in the SHA-256 of every indexed image that has none yet"""
+        missing = []
+        for frame_folder in self.frame_folders():
+            for folder in folders:
+                key = self._key(frame_folder / folder)
+                for (name,) in self.connection.execute(
+                        "SELECT name FROM entries WHERE dir = ? AND is_dir = 0 AND sha256 IS NULL", (key,)):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        missing.append((key, name))
+
+        with self.connection:
+            for key, name in missing:
+                self.connection.execute("UPDATE entries SET sha256 = ? WHERE dir = ? AND name = ?",
+                                        (hash_file(self._path(key) / name), key, name))
+        return len(missing)
+
+    def set_stage(self, frame_name, stage, status):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                                    (frame_name, stage, status, datetime.now().isoformat(timespec="seconds")))
+
+    def stage_status(self, stage):
+        """{frame name: status} of every frame with a recorded status for stage"""
+        return dict(self.connection.execute("SELECT frame, status FROM stages WHERE stage = ?", (stage,)))
+
+def list_frame_folders(project_path, read_only=False):
+    """Sorted frame_XXXXX folders of a project, taken from its manifest (see ProjectManifest for read_only)"""
+    with ProjectManifest(project_path, read_only=read_only) as manifest:
+        return manifest.frame_folders()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the SQLite manifest of a project")
+    parser.add_argument("project_path", help="Path to the project folder containing all frames")
+    parser.add_argument("--folders", nargs="+", default=["images"], help="Frame subfolders to index (default: images)")
+    parser.add_argument("--rescan", action="store_true", help="List every directory again, even if its mtime is unchanged")
+    parser.add_argument("--hash", action="store_true", help="Store the SHA-256 of every image")
+
+    args = parser.parse_args()
+
+    project_path = Path(args.project_path)
+    if not project_path.exists():
+        raise RuntimeError(f"Project path does not exist: {project_path}")
+
+    start = time.perf_counter()
+    with ProjectManifest(project_path, args.rescan) as manifest:
+        scans = manifest.refresh(args.folders)
+        elapsed = time.perf_counter() - start
+        print(f"Refreshed {project_path / MANIFEST_FILE} in {elapsed:.2f}s ({scans} directories listed again)")
+
+        if args.hash:
+            print(f"Hashed {manifest.hash_images(args.folders)} new images")
+
+        frame_folders = manifest.frame_folders()
+        image_count = sum(len(manifest.images(f / folder)) for f in frame_folders for folder in args.folders)
+        cameras = manifest.images(frame_folders[0] / args.folders[0]) if frame_folders else []
+        print(f"{len(frame_folders)} frames, {len(cameras)} cameras, {image_count} images")
+
+        stages = manifest.connection.execute(
+            "SELECT stage, status, COUNT(*) FROM stages GROUP BY stage, status ORDER BY stage, status").fetchall()
+        for stage, status, count in stages:
+            print(f"  {stage}: {count} {status}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from feature_cache import list_colmap_images
+
+# Settings the masks of a frame were made with, stored beside them in frame/masks
+MASK_PARAMS_FILE = "_mask_params.json"
+
+def collect_nobg_tracks(nobg_path, manifest=None):
+    """Map each track folder in nobg_path to its sorted background-removed PNGs"""
+    nobg_path = Path(nobg_path)
+    if manifest is not None:
+        # Unchanged track folders come from the stored listing instead of a network glob
+        return {track.name: [track / name for name, is_dir, _, _ in manifest.listdir(track)
+                             if not is_dir and name.endswith(".png")]
+                for track in manifest.subdirs(nobg_path)}
+
+    track_folders = sorted([d for d in nobg_path.iterdir() if d.is_dir()])
+
+    return {track.name: sorted(track.glob("*.png")) for track in track_folders}
+
+def map_nobg_to_frames(nobg_path, frame_folders, manifest=None):
+    """
+    Pair every nobg PNG with the colmap frame image it belongs to.
+
+    Tracks are matched to cameras by sorted order (track k -> k-th image in
+    frame/images) and PNGs to frames by index (i-th PNG -> i-th frame folder).
+
+    Args:
+        nobg_path (Path): Folder with one subfolder of PNGs per track
+        frame_folders (list): Sorted frame folders
+        manifest (ProjectManifest): Take the listings from this manifest instead of the disk
+
+    Returns:
+        dict: frame folder -> list of (nobg PNG, image name) pairs
+    """
+    tracks = collect_nobg_tracks(nobg_path, manifest)
+    if not tracks:
+        raise RuntimeError(f"No track folders found in {nobg_path}")
+
+    track_names = sorted(tracks)
+    frame_map = {}
+
+    for frame_idx, frame_folder in enumerate(frame_folders):
+        if manifest is not None:
+            image_names = manifest.images(frame_folder / "images")
+        else:
+            image_names = list_colmap_images(frame_folder / "images")
+        if len(image_names) != len(track_names):
+            print(f"Warning: {frame_folder.name} has {len(image_names)} images "
+                  f"but {len(track_names)} nobg tracks were found")
+
+        pairs = []
+        for track_name, image_name in zip(track_names, image_names):
+            track_images = tracks[track_name]
+            if frame_idx >= len(track_images):
+                print(f"Warning: Track {track_name} has no image for {frame_folder.name}")
+                continue
+            pairs.append((track_images[frame_idx], image_name))
+
+        frame_map[frame_folder] = pairs
+
+    return frame_map
+
+def read_mask_params(mask_dir):
+    """Threshold and dilation the masks in mask_dir were made with (None if unknown)"""
+    try:
+        with open(mask_dir / MASK_PARAMS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_mask_params(mask_dir, params):
+    mask_dir.mkdir(parents=True, exist_ok=True)
+    with open(mask_dir / MASK_PARAMS_FILE, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+def write_alpha_mask(nobg_image, mask_path, threshold=127, dilate=0, force=False):
+    """Threshold the alpha channel of a nobg PNG into a COLMAP mask (0 = ignored)"""
+    if not force and mask_path.exists() and mask_path.stat().st_mtime >= nobg_image.stat().st_mtime:
+        return False
+
+    image = cv2.imread(str(nobg_image), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise RuntimeError(f"Could not read nobg image: {nobg_image}")
+    if image.ndim != 3 or image.shape[2] != 4:
+        raise RuntimeError(f"nobg image has no alpha channel: {nobg_image}")
+
+    mask = np.where(image[:, :, 3] > threshold, 255, 0).astype(np.uint8)
+    if dilate > 0:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * dilate + 1, 2 * dilate + 1))
+        mask = cv2.dilate(mask, kernel)
+
+    mask_path.parent.mkdir(parents=True, exist_ok=True)
+    if not cv2.imwrite(str(mask_path), mask):
+        raise RuntimeError(f"Could not save mask: {mask_path}")
+    return True
+
+def generate_masks(frame_map, threshold=127, dilate=0, workers=None):
+    """
+    Write frame/masks/<image name>.png for every nobg pair, skipping masks that
+    are already newer than their source. A frame's masks are all rewritten when
+    they were made with another threshold or dilation. Returns the number of
+    masks written.
+    """
+    params = {"threshold": threshold, "dilate": dilate}
+    jobs = []
+    mask_dirs = []
+    for frame_folder, pairs in frame_map.items():
+        mask_dir = frame_folder / "masks"
+        force = read_mask_params(mask_dir) != params
+        for nobg_image, image_name in pairs:
+            jobs.append((nobg_image, mask_dir / f"{image_name}.png", force))
+        if pairs:
+            mask_dirs.append(mask_dir)
+
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        written = list(executor.map(
+            lambda job: write_alpha_mask(job[0], job[1], threshold, dilate, job[2]), jobs))
+
+    # Recorded only once every mask of the frame is written, so an interrupted run redoes them
+    for mask_dir in mask_dirs:
+        write_mask_params(mask_dir, params)
+
+    print(f"Masks: {sum(written)} written, {len(jobs) - sum(written)} up to date")
+    return sum(written)
@@ -1,121 +1,78 @@
-import subprocess
+import os
+import json
+import shutil
+import socket
 import argparse
+import threading
 import yaml
-import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
 
-def run_command_adv(cmd, working_dir=None):
+from framequeue import FrameQueue, work_loop
+from manifest import list_frame_folders
+from profiling import start_profiling
+from progress import track
+from static_frames import STATIC_FRAMES_FILE, load_static_frames
+from steplog import open_step_log, run_measured
+
+def run_command_adv(cmd, working_dir=None, frame=None, step="train"):
     print(f"Running: {' '.join(cmd)}")
     print("=" * 60)
     
-    # Use Popen for real-time output with both stdout and stderr
-    process = subprocess.Popen(
-        cmd, 
-        cwd=working_dir, 
-        stdout=subprocess.PIPE, 
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,
-        universal_newlines=True
+    # Both pipes are streamed as they fill, so neither can block the other
+    result = run_measured(
+        cmd,
+        working_dir,
+        frame=frame,
+        step=step,
+        on_line=lambda line, stream: print(f"{'ERR' if stream == 'stderr' else 'OUT'}: {line.strip()}", flush=True)
     )
     
-    stdout_lines = []
-    stderr_lines = []
-    
-    # Read output in real-time
-    while True:
-        # Check if process is still running
-        if process.poll() is not None:
-            break
-            
-        # Read from stdout
-        if process.stdout:
-            stdout_line = process.stdout.readline()
-            if stdout_line:
-                print(f"OUT: {stdout_line.strip()}")
-                stdout_lines.append(stdout_line.strip())
-                sys.stdout.flush()  # Force output to appear immediately
-        
-        # Read from stderr  
-        if process.stderr:
-            stderr_line = process.stderr.readline()
-            if stderr_line:
-                print(f"ERR: {stderr_line.strip()}")
-                stderr_lines.append(stderr_line.strip())
-                sys.stdout.flush()
-                
-        time.sleep(0.01)  # Small delay to prevent excessive CPU usage
-    
-    # Get any remaining output
-    remaining_stdout, remaining_stderr = process.communicate()
-    if remaining_stdout:
-        for line in remaining_stdout.strip().split('\n'):
-            if line:
-                print(f"OUT: {line}")
-                stdout_lines.append(line)
-    if remaining_stderr:
-        for line in remaining_stderr.strip().split('\n'):
-            if line:
-                print(f"ERR: {line}")
-                stderr_lines.append(line)
-    
-    return_code = process.returncode
     print("=" * 60)
     
-    if return_code != 0:
-        print(f"Error: Command failed with return code {return_code}")
-        raise RuntimeError(f"Command failed with return code {return_code}")
+    if result.returncode != 0:
+        print(f"Error: Command failed with return code {result.returncode}")
+        raise RuntimeError(f"Command failed with return code {result.returncode}")
     
     print("Command completed successfully")
     
-    # Create result object
-    class Result:
-        def __init__(self, returncode, stdout_lines, stderr_lines):
-            self.returncode = returncode
-            self.stdout = '\n'.join(stdout_lines)
-            self.stderr = '\n'.join(stderr_lines)
-    
-    return Result(return_code, stdout_lines, stderr_lines)
+    return result
 
-def run_command(cmd, working_dir=None):
+def run_command(cmd, working_dir=None, frame=None, step="train"):
     print(f"Running: {' '.join(cmd)}")
-#    result = subprocess.run(cmd, cwd=working_dir, capture_output=True, text=True)
-    process = subprocess.Popen(
-        cmd, 
-        cwd=working_dir, 
-        stdout=subprocess.PIPE, 
-        stderr=subprocess.STDOUT,
-        text=True, 
-        shell=False,
-        bufsize=1,
-        universal_newlines=True
+    result = run_measured(
+        cmd,
+        working_dir,
+        frame=frame,
+        step=step,
+        on_line=lambda line, _: print(f"[{frame}] {line.strip()}" if frame else line.strip()),
+        merge_stderr=True
     )
-
-    stdout_lines = []
-    while True:
-        output = process.stdout.readline()
-        if output == '' and process.poll() is not None:
-            break
-        if output:
-            print(output.strip())
-            stdout_lines.append(output.strip())
     
-    return_code = process.poll()
+    return_code = result.returncode
 
     if return_code != 0:
         print(f"Error: Command failed with return code {return_code}")
         raise RuntimeError(f"Command failed with return code {return_code}")
     
     
-    print("Command completed successfully")
+    print(f"Command completed successfully ({result.wall_time:.1f}s)")
     return return_code
 
-def train_frame(frame_path, output_path, postshot_cli_path, config):
+def resolve_postshot_cli(postshot_cli):
+    """Accept either the Postshot bin folder or the path of any CLI executable (e.g. a test stub)"""
+    postshot_cli = Path(postshot_cli).resolve()
+    if postshot_cli.is_dir():
+        return postshot_cli / "postshot-cli.exe"
+    return postshot_cli
+
+def train_frame(frame_path, output_path, postshot_cli, config):
     print(f"\n=== Processing frame: {frame_path.name} ===")
     
     postshot_train_cmd = [
-        str(postshot_cli_path / "postshot-cli.exe"),
+        str(postshot_cli),
         "train",
         "-i", f"{frame_path}",
         "-p", config['profile']
@@ -131,25 +88,212 @@ def train_frame(frame_path, output_path, postshot_cli_path, config):
     ])
 
     #run_command(postshot_train_cmd, str(Path.home))
-    run_command(postshot_train_cmd, str(frame_path.parent))
+    run_command(postshot_train_cmd, str(frame_path.parent), frame=frame_path.name)
+
+def newest_input_mtime(frame_path, extra_inputs=()):
+    """Latest modification time of any file in the frame folder or of the extra inputs"""
+    mtimes = [p.stat().st_mtime for p in frame_path.rglob("*") if p.is_file()]
+    mtimes.extend(Path(p).stat().st_mtime for p in extra_inputs)
+    return max(mtimes, default=0.0)
+
+def is_trained(frame_path, output_path, extra_inputs=()):
+    """True if the frame's PLY exists and is newer than everything it was trained from"""
+    ply_path = output_path / f"{frame_path.name}.ply"
+    if not ply_path.exists():
+        return False
+    return ply_path.stat().st_mtime > newest_input_mtime(frame_path, extra_inputs)
+
+class TrainState:
+    """Per-frame training status, persisted as JSON so an interrupted batch can be inspected and resumed"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.frames = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.frames = json.load(file)
+
+    def update(self, frame_name, **fields):
+        with self._lock:
+            entry = self.frames.setdefault(frame_name, {})
+            entry.update(fields, updated=datetime.now().isoformat(timespec="seconds"))
+
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.frames, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def train_with_retry(frame_path, output_path, postshot_cli, config, state, retries=2, retry_delay=30.0):
+    """Train one frame, retrying failures with exponential backoff. Returns True on success."""
+    for attempt in range(retries + 1):
+        state.update(frame_path.name, status="running", attempts=attempt + 1)
+        start = time.perf_counter()
+        try:
+            train_frame(frame_path, output_path, postshot_cli, config)
+        except Exception as e:
+            print(f"Error training frame {frame_path.name} (attempt {attempt + 1}/{retries + 1}): {e}")
+            state.update(frame_path.name, status="failed", error=str(e))
+            if attempt < retries:
+                delay = retry_delay * (2 ** attempt)
+                print(f"Retrying {frame_path.name} in {delay:.0f}s")
+                time.sleep(delay)
+            continue
+
+        state.update(frame_path.name, status="done", error=None,
+                     wall_s=round(time.perf_counter() - start, 1))
+        return True
+
+    return False
+
+def run_schedule(frames, output_path, postshot_cli, config, state, jobs=1, retries=2,
+                 retry_delay=30.0, force=False, extra_inputs=()):
+    """
+    Train frames on up to `jobs` concurrent Postshot processes, skipping frames
+    whose PLY is already up to date.
+
+    Returns:
+        list: names of frames that failed after all retries
+    """
+    pending = []
+    for frame_path in frames:
+        if not force and is_trained(frame_path, output_path, extra_inputs):
+            print(f"Skipping {frame_path.name}, PLY is up to date")
+            state.update(frame_path.name, status="skipped")
+            continue
+        pending.append(frame_path)
+
+    print(f"Training {len(pending)} frames ({len(frames) - len(pending)} up to date) with {jobs} concurrent jobs")
+
+    tracker = track("train", len(pending))
+
+    def train(frame_path):
+        with tracker.time("frame"):
+            return train_with_retry(frame_path, output_path, postshot_cli, config, state, retries, retry_delay)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor, tracker:
+        futures = {executor.submit(train, frame_path): frame_path for frame_path in pending}
+        failed = []
+        for finished, future in enumerate(as_completed(futures), start=1):
+            if not future.result():
+                failed.append(futures[future].name)
+            tracker.update()
+            tracker.queue_depth("waiting", max(0, len(pending) - finished - jobs))
+
+    return sorted(failed)
+
+def run_queue(frames, output_path, postshot_cli, config, state, queue, jobs=1, retries=2,
+              retry_delay=30.0, force=False, extra_inputs=(), static_copies=None):
+    """
+    Like run_schedule, but frames are claimed from a shared FrameQueue so that
+    workers on other machines can take part. Each of the `jobs` threads claims
+    its next frame as soon as it is free. Static copies (see plan_static_copies)
+    are queue items too, so each is made once, by whichever worker claims it.
+
+    Returns:
+        list: names of frames that failed on this worker
+    """
+    frames_by_name = {frame_path.name: frame_path for frame_path in frames}
+    static_copies = static_copies or {}
+
+    def copy_claimed(frame_name):
+        source_name = static_copies[frame_name]
+        if source_name in frames_by_name:
+            # The source may still be training on another node; its PLY is complete once it is done
+            queue.wait_done(source_name)
+        if copy_static_frames({frame_name: source_name}, output_path, state):
+            raise RuntimeError(f"source PLY {source_name}.ply is missing")
+
+    def train_claimed(frame_name):
+        if frame_name in static_copies:
+            copy_claimed(frame_name)
+            return
+        frame_path = frames_by_name[frame_name]
+        if not force and is_trained(frame_path, output_path, extra_inputs):
+            print(f"Skipping {frame_name}, PLY is up to date")
+            state.update(frame_name, status="skipped")
+            return
+        if not train_with_retry(frame_path, output_path, postshot_cli, config, state, retries, retry_delay):
+            raise RuntimeError(f"training failed after {retries + 1} attempts")
+
+    # Copies come last, so a worker only waits for a source once no frame is left to train
+    frame_names = list(frames_by_name) + sorted(static_copies)
+    print(f"Training frames from queue {queue.path} with {jobs} concurrent jobs")
+    with ThreadPoolExecutor(max_workers=jobs) as executor, track("train") as tracker:
+        results = list(executor.map(
+            lambda _: work_loop(queue, frame_names, train_claimed, tracker=tracker), range(jobs)))
+
+    completed = sum(len(done) for done, _ in results)
+    print(f"This worker trained {completed} frames")
+    return sorted(name for _, failed in results for name in failed)
+
+def plan_static_copies(frames, static_frames, output_path):
+    """
+    {duplicate frame name: source frame name} for selected duplicates whose source
+    is trained in this run or already has a PLY; other duplicates are trained normally.
+    """
+    selected = {frame_path.name for frame_path in frames}
+    return {
+        frame_path.name: static_frames[frame_path.name]
+        for frame_path in frames
+        if frame_path.name in static_frames
+        and (static_frames[frame_path.name] in selected
+             or (output_path / f"{static_frames[frame_path.name]}.ply").exists())
+    }
+
+def copy_static_frames(copies, output_path, state):
+    """Copy each source PLY to its duplicates; returns names whose source PLY is missing"""
+    failed = []
+    for frame_name, source_name in sorted(copies.items()):
+        source_ply = output_path / f"{source_name}.ply"
+        if not source_ply.exists():
+            print(f"Cannot reuse {source_name} for {frame_name}, its PLY is missing")
+            state.update(frame_name, status="failed", error=f"missing source PLY {source_ply.name}")
+            failed.append(frame_name)
+            continue
+        shutil.copy2(source_ply, output_path / f"{frame_name}.ply")
+        print(f"Reused {source_ply.name} for static frame {frame_name}")
+        state.update(frame_name, status="copied", source=source_name)
+    return failed
+
+def select_frames(frame_folders, start_index, count, reverse):
+    """Frames from start_index, count of them (0 = all), walking backwards when reverse"""
+    if count <= 0:
+        count = len(frame_folders)
+        print(f"Defult count to {count} based on available frames.")
+
+    step = -1 if reverse else 1
+    indices = [start_index + step * i for i in range(count)]
+    return [frame_folders[i] for i in indices if 0 <= i < len(frame_folders)]
 
 
 def main():
     parser = argparse.ArgumentParser(description="Batch train postshot frames")
     parser.add_argument("project_path", help="Path to the project folder containing all frames")
     parser.add_argument("-o", help="Path to output frames")
-    parser.add_argument("--postshot_cli", default="C:\\Program Files\\Jawset Postshot\\bin", help="Path to postshot_cli.exe")
+    parser.add_argument("--postshot_cli", default="C:\\Program Files\\Jawset Postshot\\bin", help="Path to the Postshot bin folder or to a postshot-cli compatible executable")
     parser.add_argument("--start_from", default=0, help="Index of the frame to start from (defult:0)")
     parser.add_argument("--count", default=0, help="Number of frames to process (default: 0, meaning all frames)")
     parser.add_argument("--reverse", action='store_true', help="Process frames in reverse order")
     parser.add_argument("--test", action='store_true', help="Test mode, only processes the first frame")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of frames to train concurrently (default: 1)")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per failed frame (default: 2)")
+    parser.add_argument("--retry_delay", type=float, default=30.0, help="Seconds before the first retry, doubled after each failure (default: 30)")
+    parser.add_argument("--force", action='store_true', help="Retrain frames even if their PLY is up to date")
+    parser.add_argument("--confirm", action='store_true', help="Wait for Enter before starting")
+    parser.add_argument("--skip_static", action='store_true', help=f"Copy the PLY of the source frame for duplicates listed in {STATIC_FRAMES_FILE} (see static_frames.py)")
+    parser.add_argument("--queue", action='store_true', help="Claim frames from the shared queue in <project_path>/_queue/train instead of --start_from/--count, so any number of machines can train together")
+    parser.add_argument("--lease", type=float, default=600.0, help="Seconds before a crashed worker's claim is released (default: 600)")
+    parser.add_argument("--step_log", help="JSONL file for per-step timing records (default: <project_path>/_steplog.jsonl)")
     
     
     args = parser.parse_args()
+    start_profiling("postshot_train")
     
-    project_path = Path(args.project_path)
-    output_path = Path(args.o)
-    postshot_cli_path = Path(args.postshot_cli)
+    # Postshot runs from the project folder, so every path handed to it must be absolute
+    project_path = Path(args.project_path).resolve()
+    output_path = Path(args.o).resolve()
+    postshot_cli = resolve_postshot_cli(args.postshot_cli)
     config_path = project_path / "_config.yaml"
 
     start_index = int(args.start_from)
@@ -163,12 +307,14 @@ def main():
     if not output_path.exists():
         raise RuntimeError(f"Output path does not exist: {output_path}")
 
-    if not postshot_cli_path.exists():
-        raise RuntimeError(f"Postshot CLI path does not exist: {postshot_cli_path}")
+    if not postshot_cli.exists():
+        raise RuntimeError(f"Postshot CLI does not exist: {postshot_cli}")
 
     if not config_path.exists():
         raise RuntimeError(f"Config file not found: {config_path}")
     
+    open_step_log(args.step_log or project_path / "_steplog.jsonl")
+    
     with open(config_path, 'r', encoding='utf-8') as file:
         data = yaml.safe_load(file)
 
@@ -179,23 +325,11 @@ def main():
             'antiAliasing': bool(data['antiAliasing'])
     }
     
-    frame_folders = sorted([d for d in project_path.iterdir() 
-                          if d.is_dir() and d.name.startswith("frame_")])
+    # Queue workers run on several nodes, so they leave the shared manifest file to a single writer
+    frame_folders = list_frame_folders(project_path, read_only=args.queue)
     
     if not frame_folders:
         raise RuntimeError(f"No frame folders found in {project_path}")
-    
-#    print(f"Found {len(frame_folders)} frame folders:")
-#    for frame in frame_folders:
-#        print(f"  - {frame.name}")
-
-#    train_frame(frame_folders[0], output_path, postshot_cli_path, config)
-#    for frame_folder in frame_folders:
-#        try:
-#            train_frame(frame_folder, output_path, postshot_cli_path, config)
-#        except Exception as e:
-#            print(f"Error processing frame {frame_folder.name}: {e}")
-#            continue
 
     print("\n\n=== Starting batch processing of frames ===")
     print(f"Total frames: {len(frame_folders)}")
@@ -203,37 +337,53 @@ def main():
     print(f"Splat profile: {config['profile']}")
     print(f"Iterations: {config['iterations']}")
     print(f"Max Splats: {config['maxNumSplats']}")
-    print(f"Anti-Aliasing: {config['antiAliasing']}\n\n")
+    print(f"Anti-Aliasing: {config['antiAliasing']}")
+    print(f"Concurrent jobs: {args.jobs}\n\n")
 
-    # wait for any key press before starting
-    input("Press Enter to start processing frames...")
+    if args.confirm:
+        input("Press Enter to start processing frames...")
 
     if test_mode:
         print("Test mode enabled, only processing the first frame.")
-        if frame_folders:
-            train_frame(frame_folders[0], output_path, postshot_cli_path, config)
-        else:
-            print("No frames to process in test mode.")
-        
-        return
+        frames = frame_folders[:1]
+    else:
+        frames = select_frames(frame_folders, start_index, count, reverse)
 
-    if count <= 0:
-        count = len(frame_folders)
-        print(f"Defult count to {count} based on available frames.")
+    static_copies = plan_static_copies(frames, load_static_frames(project_path), output_path) if args.skip_static else {}
+    if static_copies:
+        print(f"{len(static_copies)} static frames will reuse the PLY of an earlier frame")
+        frames = [frame_path for frame_path in frames if frame_path.name not in static_copies]
+
+    if args.queue:
+        # Every node writes its own state file; the queue markers are the shared record
+        state = TrainState(output_path / f"_train_state_{socket.gethostname()}.json")
+        failed = run_queue(
+            frames, output_path, postshot_cli, config, state,
+            FrameQueue(project_path, "train", args.lease),
+            jobs=args.jobs,
+            retries=args.retries,
+            retry_delay=args.retry_delay,
+            force=args.force,
+            extra_inputs=[config_path],
+            static_copies=static_copies
+        )
+    else:
+        state = TrainState(output_path / "_train_state.json")
+        failed = run_schedule(
+            frames, output_path, postshot_cli, config, state,
+            jobs=args.jobs,
+            retries=args.retries,
+            retry_delay=args.retry_delay,
+            force=args.force,
+            extra_inputs=[config_path]
+        )
+        failed += copy_static_frames(static_copies, output_path, state)
+    failed = sorted(failed)
 
-    if reverse:
-        for i in range(start_index, start_index - count - 1, -1):
-            if i < 0 or i >= len(frame_folders):
-                print(f"Skipping invalid index {i}")
-                break
-            train_frame(frame_folders[i], output_path, postshot_cli_path, config)
-    
-    if not reverse:
-        for i in range(start_index, start_index + count):
-            if i < 0 or i >= len(frame_folders):
-                print(f"Skipping invalid index {i}")
-                break
-            train_frame(frame_folders[i], output_path, postshot_cli_path, config)
+    if failed:
+        print(f"\n{len(failed)} frames failed: {', '.join(failed)}")
+        print(f"See {state.path} for details")
+        raise RuntimeError(f"{len(failed)} frames failed to train")
 
     print("\n=== All frames processed successfully! ===")
 
@@ -0,0 +1,135 @@
+import os
+import re
+import selectors
+import threading
+from collections import deque
+
+LINE_BREAK = re.compile(rb"\r\n|\r|\n")
+
+class LineSplitter:
+    """Turn raw pipe chunks into lines; a bare carriage return also ends a line, so progress bars don't pile up"""
+
+    def __init__(self, max_partial=64 * 1024):
+        self.partial = b""
+        self.max_partial = max_partial
+
+    def feed(self, data):
+        parts = LINE_BREAK.split(self.partial + data)
+        self.partial = parts.pop()
+        if len(self.partial) > self.max_partial:
+            parts.append(self.partial)
+            self.partial = b""
+        return [part.decode("utf-8", errors="replace") for part in parts if part]
+
+    def flush(self):
+        parts = [self.partial.decode("utf-8", errors="replace")] if self.partial else []
+        self.partial = b""
+        return parts
+
+class RotatingLog:
+    """Plain-text log file for one command's output, rotated to .1, .2, ... past max_bytes"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=3):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+
+    def _rotate(self):
+        self.file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.size = 0
+
+    def write(self, lines, stream_name):
+        # One write per pipe chunk rather than per line keeps chatty tools cheap
+        prefix = "ERR: " if stream_name == "stderr" else ""
+        text = "".join(f"{prefix}{line}\n" for line in lines)
+        self.file.write(text)
+        self.size += len(text)
+        if self.size > self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        self.file.close()
+
+class OutputSink:
+    """Fan each line out to a callback and a log file, keeping only a bounded tail per stream"""
+
+    def __init__(self, on_line=None, log=None, tail_lines=200):
+        self.on_line = on_line
+        self.log = log
+        self.tails = {"stdout": deque(maxlen=tail_lines), "stderr": deque(maxlen=tail_lines)}
+        self._lock = threading.Lock()
+
+    def emit(self, lines, stream_name):
+        with self._lock:
+            self.tails[stream_name].extend(lines)
+            if self.log is not None and lines:
+                self.log.write(lines, stream_name)
+            if self.on_line is not None:
+                for line in lines:
+                    self.on_line(line, stream_name)
+
+    def tail(self, stream_name):
+        return "\n".join(self.tails[stream_name])
+
+def _stream_selector(streams, sink):
+    # Blocks in select() until a pipe has data or closes, so an idle child costs no parent CPU
+    selector = selectors.DefaultSelector()
+    for stream_name, pipe in streams:
+        selector.register(pipe, selectors.EVENT_READ, (stream_name, LineSplitter()))
+
+    while selector.get_map():
+        for key, _ in selector.select():
+            stream_name, splitter = key.data
+            data = os.read(key.fd, 65536)
+            if data:
+                sink.emit(splitter.feed(data), stream_name)
+            else:
+                sink.emit(splitter.flush(), stream_name)
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+    selector.close()
+
+def _stream_threads(streams, sink):
+    # Windows selectors only accept sockets, so each pipe gets a thread doing blocking reads
+    def pump(stream_name, pipe):
+        splitter = LineSplitter()
+        fd = pipe.fileno()
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            sink.emit(splitter.feed(data), stream_name)
+        sink.emit(splitter.flush(), stream_name)
+        pipe.close()
+
+    threads = [threading.Thread(target=pump, args=stream, daemon=True) for stream in streams]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def stream_output(process, sink):
+    """
+    Pump the stdout/stderr pipes of a binary-mode Popen into sink until both close.
+
+    Args:
+        process (subprocess.Popen): Child started with stdout (and optionally stderr) as PIPE
+        sink (OutputSink): Receives every complete line
+    """
+    streams = [("stdout", process.stdout)]
+    if process.stderr is not None:
+        streams.append(("stderr", process.stderr))
+
+    if os.name == "nt":
+        _stream_threads(streams, sink)
+    else:
+        _stream_selector(streams, sink)
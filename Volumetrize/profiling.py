@@ -0,0 +1,209 @@
+"""
+Opt-in profiling for the VideoProcess and Volumetrize entry points.
+
+Nothing happens unless the environment asks for it, so the variables can be set
+once for a whole pipeline run and every script it starts picks them up:
+
+    VVP_PROFILE=cprofile   Deterministic cProfile of the whole run (.prof, for
+                           pstats, snakeviz or gprof2dot)
+    VVP_PROFILE=sample     Stack sampler with low overhead, written in the collapsed
+                           format read by flamegraph.pl and speedscope (.folded)
+    VVP_PROFILE=timers     Only the hot-path timers
+    VVP_PROFILE_MEMORY=1   tracemalloc snapshots at stage boundaries (.tracemalloc,
+                           for tracemalloc.Snapshot.load)
+    VVP_PROFILE_DIR        Output folder (default: ./_profiles)
+
+Every mode also collects the hot-path timers placed around decode, encode and
+file writes, and writes them to <run>_timers.json.
+"""
+
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_MODES = ("cprofile", "sample", "timers")
+SAMPLE_INTERVAL = 0.005
+
+_profile = None
+_null_timer = nullcontext()
+
+class StackSampler:
+    """Samples the Python stacks of all threads from a background thread"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="vvp-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+class _HotTimer:
+    __slots__ = ("stats", "lock", "start")
+
+    def __init__(self, stats, lock):
+        self.stats = stats
+        self.lock = lock
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with self.lock:
+            stats = self.stats
+            stats[0] += 1
+            stats[1] += elapsed
+            if elapsed > stats[2]:
+                stats[2] = elapsed
+
+class RunProfile:
+    def __init__(self, run_name, mode, memory, output_dir):
+        self.mode = mode
+        self.memory = memory
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.prefix = f"{run_name}_{datetime.now().strftime('%Y%m%d-%H%M%S')}_{os.getpid()}"
+        # name -> [count, total seconds, max seconds]
+        self.timers = {}
+        self._lock = threading.Lock()
+        self.snapshots = 0
+        self.profiler = None
+        self.sampler = None
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+            self.snapshot("start")
+        if self.mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.mode == "sample":
+            self.sampler = StackSampler()
+            self.sampler.start()
+
+    def timer(self, name):
+        stats = self.timers.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.timers.setdefault(name, [0, 0.0, 0.0])
+        # A fresh timer per use, so threads timing the same call do not share a start time
+        return _HotTimer(stats, self._lock)
+
+    def snapshot(self, label):
+        self.snapshots += 1
+        path = self.output_dir / f"{self.prefix}_{self.snapshots:02d}_{label}.tracemalloc"
+        tracemalloc.take_snapshot().dump(str(path))
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"[profile] {label}: {current / (1024 * 1024):.1f} MB traced, peak {peak / (1024 * 1024):.1f} MB -> {path}")
+
+    def stop(self):
+        written = []
+        if self.profiler is not None:
+            self.profiler.disable()
+            path = self.output_dir / f"{self.prefix}.prof"
+            self.profiler.dump_stats(str(path))
+            written.append(path)
+        if self.sampler is not None:
+            self.sampler.stop()
+            path = self.output_dir / f"{self.prefix}.folded"
+            self.sampler.write(path)
+            written.append(path)
+        if self.memory:
+            self.snapshot("end")
+            tracemalloc.stop()
+        if self.timers:
+            path = self.output_dir / f"{self.prefix}_timers.json"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({name: {"count": count, "total_s": round(total, 6), "max_s": round(longest, 6)}
+                           for name, (count, total, longest) in self.timers.items()}, f, indent=2)
+            written.append(path)
+            print_timers(self.timers)
+        for path in written:
+            print(f"[profile] written {path}")
+
+def print_timers(timers):
+    print(f"[profile] {'timer':<28}{'calls':>9}{'total s':>10}{'mean ms':>10}{'max ms':>10}")
+    for name, (count, total, longest) in sorted(timers.items(), key=lambda item: item[1][1], reverse=True):
+        print(f"[profile] {name:<28}{count:>9}{total:>10.2f}{total / max(count, 1) * 1000:>10.2f}{longest * 1000:>10.2f}")
+
+def start_profiling(run_name):
+    """
+    Start the profiling requested by VVP_PROFILE / VVP_PROFILE_MEMORY for this process;
+    results are written when the process exits. Does nothing when neither is set.
+    """
+    global _profile
+    mode = os.environ.get("VVP_PROFILE", "").lower()
+    memory = os.environ.get("VVP_PROFILE_MEMORY", "") not in ("", "0")
+    if _profile is not None or (not mode and not memory):
+        return _profile
+    if mode and mode not in PROFILE_MODES:
+        raise RuntimeError(f"Unknown VVP_PROFILE mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+
+    _profile = RunProfile(run_name, mode, memory, os.environ.get("VVP_PROFILE_DIR", "_profiles"))
+    _profile.start()
+    atexit.register(_profile.stop)
+    print(f"[profile] {mode or 'memory'} profiling, output in {_profile.output_dir}")
+    return _profile
+
+def timer(name):
+    """Context manager timing one hot-path call; a shared no-op unless profiling is on"""
+    if _profile is None:
+        return _null_timer
+    return _profile.timer(name)
+
+def stage_boundary(label):
+    """Take a tracemalloc snapshot between stages when memory profiling is on"""
+    if _profile is not None and _profile.memory:
+        _profile.snapshot(label)
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the hottest functions of a cProfile file written with VVP_PROFILE=cprofile")
+    parser.add_argument("profile_path", help="Path to the .prof file")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key (default: cumulative)")
+    parser.add_argument("--top", type=int, default=25, help="Number of functions to list (default: 25)")
+
+    args = parser.parse_args()
+
+    if not Path(args.profile_path).exists():
+        raise RuntimeError(f"Profile does not exist: {args.profile_path}")
+    pstats.Stats(args.profile_path).strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+if __name__ == "__main__":
+    main()
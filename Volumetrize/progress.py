@@ -0,0 +1,322 @@
+"""
+Progress and throughput metrics shared by the extraction and Volumetrize scripts.
+
+Metrics are off unless a destination is configured, either with open_metrics()
+or through the environment (inherited by every script the pipeline starts):
+
+    VVP_METRICS_EVENTS    JSONL file receiving start / progress / end events
+    VVP_METRICS_TEXTFILE  Prometheus text file, e.g. in node_exporter's
+                          --collector.textfile.directory
+
+When both are unset, track() returns a shared tracker whose methods do nothing,
+so instrumented loops pay one no-op method call per update.
+"""
+
+import argparse
+import bisect
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from profiling import timer
+
+# Upper bounds in seconds of the per-step latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+# Events and the text file are written at most this often per tracker
+EMIT_INTERVAL = 5.0
+
+_active_metrics = None
+
+class NullTracker:
+    """Stand-in used while metrics are off"""
+    enabled = False
+
+    def update(self, count=1, bytes_written=0):
+        pass
+
+    def add_files(self, paths):
+        pass
+
+    def observe(self, step, seconds):
+        pass
+
+    def time(self, step):
+        # Still feeds the hot-path timers when only profiling is on
+        return timer(step)
+
+    def queue_depth(self, queue, depth):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_null_tracker = NullTracker()
+
+class _Timer:
+    def __init__(self, tracker, step):
+        self.tracker = tracker
+        self.step = step
+        self.hot_timer = timer(step)
+
+    def __enter__(self):
+        self.hot_timer.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracker.observe(self.step, time.perf_counter() - self.start)
+        self.hot_timer.__exit__(*exc)
+
+class Tracker:
+    """Counts the work of one stage and reports rates, ETA, queue depths and step latencies"""
+    enabled = True
+
+    def __init__(self, metrics, stage, total=None, unit="frames"):
+        self.metrics = metrics
+        self.stage = stage
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.bytes_written = 0
+        self.queues = {}
+        # step -> [bucket counts..., +Inf count, sum]
+        self.latency = {}
+        self.started = time.time()
+        # Rates are taken over the window since the previous emit, so they follow slowdowns
+        self._window = (self.started, 0, 0)
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.byte_rate = 0.0
+        metrics.emit_event(self, "start")
+
+    def update(self, count=1, bytes_written=0):
+        with self._lock:
+            self.done += count
+            self.bytes_written += bytes_written
+            due = time.time() - self._last_emit >= EMIT_INTERVAL
+        if due:
+            self.emit()
+
+    def add_files(self, paths):
+        """Count one item per call and the size of the files it wrote"""
+        self.update(1, sum(os.path.getsize(p) for p in paths if os.path.exists(p)))
+
+    def observe(self, step, seconds):
+        with self._lock:
+            counts = self.latency.setdefault(step, [0] * (len(LATENCY_BUCKETS) + 2))
+            counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            counts[-1] += seconds
+
+    def time(self, step):
+        return _Timer(self, step)
+
+    def queue_depth(self, queue, depth):
+        with self._lock:
+            self.queues[queue] = depth
+
+    def eta(self):
+        if self.total is None or self.rate <= 0:
+            return None
+        return max(0, self.total - self.done) / self.rate
+
+    def emit(self, event="progress"):
+        with self._lock:
+            now = time.time()
+            window_start, window_done, window_bytes = self._window
+            if now - window_start > 0 and (self.done > window_done or event == "end"):
+                elapsed = now - window_start
+                self.rate = (self.done - window_done) / elapsed
+                self.byte_rate = (self.bytes_written - window_bytes) / elapsed
+                self._window = (now, self.done, self.bytes_written)
+            self._last_emit = now
+        self.metrics.emit_event(self, event)
+        self.metrics.write_textfile()
+
+    def close(self):
+        self.emit("end")
+        self.metrics.remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def snapshot(self, buckets=False):
+        """Current values as a dict; buckets=True adds the raw latency histogram counts"""
+        with self._lock:
+            eta = self.eta()
+            return {
+                "stage": self.stage,
+                "unit": self.unit,
+                "done": self.done,
+                "total": self.total,
+                "rate": round(self.rate, 3),
+                "bytes_written": self.bytes_written,
+                "byte_rate": round(self.byte_rate),
+                "eta_s": None if eta is None else round(eta, 1),
+                "elapsed_s": round(time.time() - self.started, 1),
+                "queues": dict(self.queues),
+                "latency": {step: {"count": sum(counts[:-1]), "sum_s": round(counts[-1], 4)}
+                            for step, counts in self.latency.items()},
+                **({"buckets": {step: list(counts) for step, counts in self.latency.items()}} if buckets else {}),
+            }
+
+class Metrics:
+    def __init__(self, events_path=None, textfile_path=None):
+        self.events_path = Path(events_path) if events_path else None
+        self.textfile_path = Path(textfile_path) if textfile_path else None
+        for path in (self.events_path, self.textfile_path):
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+        self.host = socket.gethostname()
+        self.trackers = []
+        # Finished stages stay in the text file, so a dashboard sees their final values
+        self.finished = {}
+        self._lock = threading.Lock()
+
+    def add(self, tracker):
+        with self._lock:
+            self.trackers.append(tracker)
+
+    def remove(self, tracker):
+        with self._lock:
+            if tracker in self.trackers:
+                self.trackers.remove(tracker)
+            self.finished[tracker.stage] = tracker.snapshot(buckets=True)
+
+    def emit_event(self, tracker, event):
+        if self.events_path is None:
+            return
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "host": self.host,
+            "pid": os.getpid(),
+            "event": event,
+            **tracker.snapshot(),
+        }
+        with self._lock:
+            with open(self.events_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def write_textfile(self):
+        if self.textfile_path is None:
+            return
+        with self._lock:
+            stages = dict(self.finished)
+            stages.update({t.stage: t.snapshot(buckets=True) for t in self.trackers})
+            stages = list(stages.values())
+        latencies = {s["stage"]: s["buckets"] for s in stages}
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        def labels(s, **extra):
+            return {"host": self.host, "stage": s["stage"], **extra}
+
+        metric("vvp_items_done_total", "counter", "Items processed by the stage",
+               [(labels(s, unit=s["unit"]), s["done"]) for s in stages])
+        metric("vvp_items_expected", "gauge", "Items the stage will process in total",
+               [(labels(s, unit=s["unit"]), s["total"]) for s in stages if s["total"] is not None])
+        metric("vvp_items_per_second", "gauge", "Recent throughput of the stage",
+               [(labels(s, unit=s["unit"]), s["rate"]) for s in stages])
+        metric("vvp_bytes_written_total", "counter", "Bytes of output written by the stage",
+               [(labels(s), s["bytes_written"]) for s in stages])
+        metric("vvp_bytes_written_per_second", "gauge", "Recent output bandwidth of the stage",
+               [(labels(s), s["byte_rate"]) for s in stages])
+        metric("vvp_eta_seconds", "gauge", "Estimated time until the stage finishes",
+               [(labels(s), s["eta_s"]) for s in stages if s["eta_s"] is not None])
+        metric("vvp_queue_depth", "gauge", "Items waiting in a queue of the stage",
+               [(labels(s, queue=queue), depth) for s in stages for queue, depth in s["queues"].items()])
+
+        lines.append("# HELP vvp_step_seconds Latency of the steps of a stage")
+        lines.append("# TYPE vvp_step_seconds histogram")
+        for stage, steps in latencies.items():
+            for step, counts in steps.items():
+                step_labels = f'host="{self.host}",stage="{stage}",step="{step}"'
+                cumulative = 0
+                for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], counts[:-1]):
+                    cumulative += count
+                    lines.append(f'vvp_step_seconds_bucket{{{step_labels},le="{bound}"}} {cumulative}')
+                lines.append(f"vvp_step_seconds_sum{{{step_labels}}} {counts[-1]}")
+                lines.append(f"vvp_step_seconds_count{{{step_labels}}} {cumulative}")
+
+        # node_exporter may read the file at any moment, so replace it in one step
+        tmp_path = self.textfile_path.with_name(f"{self.textfile_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.textfile_path)
+
+def open_metrics(events_path=None, textfile_path=None):
+    """Send the metrics of every following tracker to events_path (JSONL) and/or textfile_path (Prometheus)"""
+    global _active_metrics
+    _active_metrics = Metrics(events_path, textfile_path) if events_path or textfile_path else None
+    return _active_metrics
+
+def track(stage, total=None, unit="frames"):
+    """
+    Tracker for one stage, or a no-op tracker while metrics are off.
+
+    Args:
+        stage (str): Stage name, used as the metric label
+        total (int): Items the stage will process, for the ETA (None if unknown)
+        unit (str): What one item is (frames, images, ...)
+    """
+    if _active_metrics is None:
+        return _null_tracker
+    tracker = Tracker(_active_metrics, stage, total, unit)
+    _active_metrics.add(tracker)
+    return tracker
+
+def summarize_events(events_path):
+    """Print the last state of every stage in an events file"""
+    last = {}
+    with open(events_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                event = json.loads(line)
+                last[(event["host"], event["pid"], event["stage"])] = event
+
+    print(f"{'stage':<20}{'host':<16}{'state':<10}{'done':>10}{'rate/s':>10}{'MB/s':>8}{'eta':>10}")
+    for (host, _, stage), event in sorted(last.items(), key=lambda item: item[1]["time"]):
+        done = f"{event['done']}/{event['total']}" if event["total"] is not None else str(event["done"])
+        eta = f"{event['eta_s']:.0f}s" if event["eta_s"] is not None and event["event"] != "end" else "-"
+        print(f"{stage:<20}{host[:15]:<16}{event['event']:<10}{done:>10}{event['rate']:>10.2f}"
+              f"{event['byte_rate'] / (1024 * 1024):>8.1f}{eta:>10}")
+        for step, latency in event["latency"].items():
+            mean = latency["sum_s"] / latency["count"] if latency["count"] else 0.0
+            print(f"    {step}: {latency['count']} x {mean * 1000:.1f} ms")
+
+open_metrics(os.environ.get("VVP_METRICS_EVENTS"), os.environ.get("VVP_METRICS_TEXTFILE"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a progress events file written with VVP_METRICS_EVENTS")
+    parser.add_argument("events_path", help="Path to the JSONL events file")
+
+    args = parser.parse_args()
+
+    events_path = Path(args.events_path)
+    if not events_path.exists():
+        raise RuntimeError(f"Events file does not exist: {events_path}")
+    summarize_events(events_path)
+
+if __name__ == "__main__":
+    main()
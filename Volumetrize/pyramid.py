@@ -0,0 +1,106 @@
+import os
+import struct
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from feature_cache import list_colmap_images
+from manifest import list_frame_folders
+from profiling import start_profiling
+
+def level_dir_name(base, level):
+    """Folder holding a pyramid level: images, images_2, images_4, ..."""
+    return base if level == 1 else f"{base}_{level}"
+
+def read_image_size(path):
+    """(width, height) of an image, reading only the header for PNGs"""
+    path = Path(path)
+    if path.suffix.lower() == ".png":
+        with open(path, "rb") as f:
+            header = f.read(24)
+        if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24])
+
+    image = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise RuntimeError(f"Could not read image: {path}")
+    return image.shape[1], image.shape[0]
+
+def downscale_image(src, dst, level, interpolation=cv2.INTER_AREA):
+    """Write src shrunk by level to dst, unless dst is already newer than src"""
+    if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
+        return False
+
+    image = cv2.imread(str(src), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise RuntimeError(f"Could not read image: {src}")
+
+    height, width = image.shape[:2]
+    size = (max(1, round(width / level)), max(1, round(height / level)))
+    small = cv2.resize(image, size, interpolation=interpolation)
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if not cv2.imwrite(str(dst), small):
+        raise RuntimeError(f"Could not save image: {dst}")
+    return True
+
+def pyramid_jobs(frame_folder, level):
+    """(src, dst, level, interpolation) for every image and mask of a frame at one level"""
+    jobs = []
+    images_dir = frame_folder / "images"
+    for name in list_colmap_images(images_dir):
+        jobs.append((images_dir / name, frame_folder / level_dir_name("images", level) / name, level, cv2.INTER_AREA))
+
+    # COLMAP masks must stay binary, so they are resampled with nearest neighbour
+    masks_dir = frame_folder / "masks"
+    if masks_dir.exists():
+        for mask in sorted(masks_dir.glob("*.png")):
+            jobs.append((mask, frame_folder / level_dir_name("masks", level) / mask.name, level, cv2.INTER_NEAREST))
+    return jobs
+
+def build_pyramid(frame_folders, levels, workers=None):
+    """
+    Write downscaled copies of each frame's images/ (and masks/) beside the
+    originals, e.g. frame_00000/images_2. Up-to-date copies are skipped.
+    """
+    jobs = []
+    for frame_folder in frame_folders:
+        for level in levels:
+            if level > 1:
+                jobs.extend(pyramid_jobs(frame_folder, level))
+
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        written = list(executor.map(lambda job: downscale_image(*job), jobs))
+
+    print(f"Pyramid: {sum(written)} images written, {len(jobs) - sum(written)} up to date")
+    return sum(written)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build downscaled image pyramids for alignment")
+    parser.add_argument("project_path", help="Path to the project folder containing all frames")
+    parser.add_argument("--levels", type=int, nargs="+", default=[2, 4], help="Downscale factors to build (default: 2 4)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker threads (default: CPU count)")
+
+    args = parser.parse_args()
+    start_profiling("pyramid")
+
+    project_path = Path(args.project_path)
+
+    if not project_path.exists():
+        raise RuntimeError(f"Project path does not exist: {project_path}")
+
+    frame_folders = list_frame_folders(project_path)
+
+    if not frame_folders:
+        raise RuntimeError(f"No frame folders found in {project_path}")
+
+    print(f"Building levels {args.levels} for {len(frame_folders)} frames...")
+    build_pyramid(frame_folders, args.levels, args.workers)
+
+    print("\n=== All frames processed successfully! ===")
+
+if __name__ == "__main__":
+    main()
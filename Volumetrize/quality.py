@@ -0,0 +1,171 @@
+import argparse
+import csv
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from feature_cache import list_colmap_images
+from manifest import list_frame_folders
+from profiling import start_profiling
+
+QUALITY_FILE = "_quality.csv"
+REJECTED_DIR = "images_rejected"
+# Grey levels at or beyond these count as clipped shadows / highlights
+DARK_LEVEL = 4
+BRIGHT_LEVEL = 251
+
+def image_metrics(path):
+    """(sharpness, dark clip fraction, bright clip fraction, mean level) of one image at quarter resolution"""
+    image = cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        raise RuntimeError(f"Could not read image: {path}")
+
+    # Variance of the Laplacian: high for crisp edges, collapses under motion blur or defocus
+    sharpness = cv2.Laplacian(image, cv2.CV_32F).var()
+    histogram = np.bincount(image.ravel(), minlength=256) / image.size
+    return (
+        float(sharpness),
+        float(histogram[:DARK_LEVEL + 1].sum()),
+        float(histogram[BRIGHT_LEVEL:].sum()),
+        float(np.dot(histogram, np.arange(256)))
+    )
+
+def measure_frames(frame_folders, names, workers=8):
+    """Metrics for every (frame, camera) as a (frames, cameras, 4) array; NaN where an image is missing"""
+    jobs = []
+    for fi, frame_folder in enumerate(frame_folders):
+        for ci, name in enumerate(names):
+            for folder in ("images", REJECTED_DIR):
+                if (frame_folder / folder / name).exists():
+                    jobs.append((fi, ci, frame_folder / folder / name))
+                    break
+
+    metrics = np.full((len(frame_folders), len(names), 4), np.nan, dtype=np.float64)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (fi, ci, _), values in zip(jobs, executor.map(image_metrics, [job[2] for job in jobs])):
+            metrics[fi, ci] = values
+    return metrics
+
+def classify(metrics, blur_ratio=0.4, max_clip=0.25):
+    """
+    Flag views whose sharpness is below blur_ratio times their camera's median over
+    the take, or with more than max_clip of pixels crushed or blown out. Sharpness
+    depends on scene content and lens, so each camera is judged against itself.
+
+    Returns:
+        tuple: (relative sharpness (frames, cameras), status strings (frames, cameras))
+    """
+    sharpness, dark, bright = metrics[..., 0], metrics[..., 1], metrics[..., 2]
+    median = np.nanmedian(sharpness, axis=0)
+    relative = sharpness / np.where(median > 0, median, 1.0)
+
+    status = np.full(sharpness.shape, "ok", dtype=object)
+    status[relative < blur_ratio] = "blurred"
+    status[dark > max_clip] = "underexposed"
+    status[bright > max_clip] = "overexposed"
+    status[np.isnan(sharpness)] = "missing"
+    return relative, status
+
+def write_table(path, frame_folders, names, metrics, relative, status):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame", "image", "sharpness", "relative_sharpness", "dark_clip", "bright_clip", "mean_level", "status"])
+        for fi, frame_folder in enumerate(frame_folders):
+            for ci, name in enumerate(names):
+                if status[fi, ci] == "missing":
+                    continue
+                sharpness, dark, bright, mean = metrics[fi, ci]
+                writer.writerow([frame_folder.name, name, f"{sharpness:.2f}", f"{relative[fi, ci]:.3f}",
+                                 f"{dark:.4f}", f"{bright:.4f}", f"{mean:.1f}", status[fi, ci]])
+
+def reject_view(frame_folder, name):
+    """Move a view out of images/ and drop its pyramid copies, so no stage picks it up"""
+    if not (frame_folder / "images" / name).exists():
+        return
+    rejected_dir = frame_folder / REJECTED_DIR
+    rejected_dir.mkdir(exist_ok=True)
+    shutil.move(str(frame_folder / "images" / name), str(rejected_dir / name))
+    # A move keeps the file's mtime; touching it lets mtime checks (postshot_train) see the frame changed
+    os.utime(rejected_dir / name)
+    # Pyramid levels are rebuilt from images/, so they can simply be deleted
+    for level_dir in frame_folder.glob("images_*"):
+        if level_dir.name[len("images_"):].isdigit() and (level_dir / name).exists():
+            (level_dir / name).unlink()
+
+def restore_views(frame_folder):
+    rejected_dir = frame_folder / REJECTED_DIR
+    if not rejected_dir.exists():
+        return 0
+    names = list_colmap_images(rejected_dir)
+    for name in names:
+        destination = frame_folder / "images" / name
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(rejected_dir / name), str(destination))
+        os.utime(destination)
+    shutil.rmtree(rejected_dir)
+    return len(names)
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every view for blur and exposure before alignment")
+    parser.add_argument("project_path", help="Path to the project folder containing all frames")
+    parser.add_argument("--blur_ratio", type=float, default=0.4, help="Flag views below this fraction of their camera's median sharpness (default: 0.4)")
+    parser.add_argument("--max_clip", type=float, default=0.25, help="Flag views with more than this fraction of clipped pixels (default: 0.25)")
+    parser.add_argument("--exclude", action="store_true", help=f"Move flagged views to frame_XXXXX/{REJECTED_DIR}")
+    parser.add_argument("--restore", action="store_true", help=f"Move all views in {REJECTED_DIR} back and exit")
+    parser.add_argument("--fps", type=float, default=30.0, help="Capture frame rate, for the real time comparison (default: 30)")
+    parser.add_argument("--workers", type=int, default=8, help="Number of decoding threads (default: 8)")
+
+    args = parser.parse_args()
+    start_profiling("quality")
+
+    project_path = Path(args.project_path)
+    if not project_path.exists():
+        raise RuntimeError(f"Project path does not exist: {project_path}")
+
+    frame_folders = list_frame_folders(project_path)
+    if not frame_folders:
+        raise RuntimeError(f"No frame folders found in {project_path}")
+
+    if args.restore:
+        restored = sum(restore_views(frame_folder) for frame_folder in frame_folders)
+        print(f"Restored {restored} views")
+        return
+
+    # Views already rejected by an earlier run are scored again so the table stays complete
+    names = set(list_colmap_images(frame_folders[0] / "images"))
+    if (frame_folders[0] / REJECTED_DIR).exists():
+        names |= set(list_colmap_images(frame_folders[0] / REJECTED_DIR))
+    names = sorted(names)
+    print(f"Scoring {len(frame_folders)} frames x {len(names)} cameras with {args.workers} threads...")
+
+    start = time.perf_counter()
+    metrics = measure_frames(frame_folders, names, args.workers)
+    elapsed = time.perf_counter() - start
+
+    relative, status = classify(metrics, args.blur_ratio, args.max_clip)
+    write_table(project_path / QUALITY_FILE, frame_folders, names, metrics, relative, status)
+
+    flagged = [(frame_folders[fi], names[ci], status[fi, ci])
+               for fi, ci in zip(*np.nonzero((status != "ok") & (status != "missing")))]
+    measured = int(np.count_nonzero(status != "missing"))
+    print(f"Scored {measured} views in {elapsed:.1f}s ({measured / max(elapsed, 1e-9):.0f} views/s, "
+          f"{len(frame_folders) / max(elapsed, 1e-9) / args.fps:.1f}x real time at {args.fps:g} fps)")
+
+    print(f"\n{len(flagged)} views flagged:")
+    for frame_folder, name, reason in flagged:
+        print(f"  {frame_folder.name}/{name}: {reason}")
+
+    if args.exclude:
+        for frame_folder, name, _ in flagged:
+            reject_view(frame_folder, name)
+        print(f"\nMoved {len(flagged)} views to {REJECTED_DIR}")
+
+    print(f"\nQuality table: {project_path / QUALITY_FILE}")
+
+if __name__ == "__main__":
+    main()
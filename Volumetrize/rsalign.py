@@ -1,9 +1,14 @@
 import os
-import subprocess
 import shutil
 import argparse
 from pathlib import Path
 
+from framequeue import FrameQueue, process_reference_frame, work_loop
+from manifest import list_frame_folders
+from profiling import start_profiling
+from pyramid import build_pyramid, level_dir_name
+from steplog import open_step_log, run_measured
+
 def rs_first_align(rs_path, import_path, export_path, xml_path):
     cmd = [
         rs_path, "-headless",
@@ -14,7 +19,7 @@ def rs_first_align(rs_path, import_path, export_path, xml_path):
         "-quit"
     ]
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = run_measured(cmd, frame=Path(import_path).parent.name, step="rs_first_align")
 
     if result.returncode != 0:
         print(f"Error running command: {' '.join(cmd)}")
@@ -34,7 +39,7 @@ def rs_align_with_xmp(rs_path, import_path, export_path, xml_path):
         "-quit"
     ]
     
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = run_measured(cmd, frame=Path(import_path).parent.name, step="rs_align_with_xmp")
 
     if result.returncode != 0:
         print(f"Error running command: {' '.join(cmd)}")
@@ -52,14 +57,74 @@ def check_directories(path):
         path.mkdir(parents=True, exist_ok=True)
 
 
+def copy_xmps(xmp_files, frame_folder, level=1):
+    """Give a frame the first frame's XMP camera files, so RealityScan reuses the poses"""
+    images_dir = level_dir_name("images", level)
+    for xmp_file in xmp_files:
+        if xmp_file.parent != frame_folder/images_dir:
+            shutil.copy2(xmp_file, frame_folder/images_dir)
+            print(f"Copied XMP file {xmp_file.name} to {frame_folder/images_dir}")
+
+        # XMP stores 35mm-equivalent focal length and normalized principal point,
+        # so the same file is valid for the full resolution images
+        if level > 1:
+            shutil.copy2(xmp_file, frame_folder/"images")
+
+def align_frame(rs_exe, frame_folder, export_path_base, xml_path, level=1):
+    images_path = frame_folder/level_dir_name("images", level)
+    export_path = export_path_base/frame_folder.name
+    export_path.mkdir(parents=True, exist_ok=True)
+
+    if not images_path.exists():
+        raise RuntimeError(f"Images folder not found in {frame_folder.name}")
+
+    rs_align_with_xmp(rs_exe, images_path, export_path, xml_path)
+    print(f"Frame {frame_folder.name} aligned successfully.")
+
+def run_queue(frame_folders, rs_exe, export_path_base, xml_path, level, lease):
+    """Align frames claimed from <project>/_queue/rsalign, with any number of workers sharing the project"""
+    queue = FrameQueue(frame_folders[0].parent, "rsalign", lease)
+    first_frame = frame_folders[0]
+    first_images_path = first_frame/level_dir_name("images", level)
+    frames_by_name = {frame_folder.name: frame_folder for frame_folder in frame_folders}
+
+    def align_first(frame_name):
+        if level > 1:
+            build_pyramid([first_frame], [level])
+        export_path = export_path_base/first_frame.name
+        export_path.mkdir(parents=True, exist_ok=True)
+        rs_first_align(rs_exe, first_images_path, export_path, xml_path)
+        if not list(first_images_path.glob("*.xmp")):
+            raise RuntimeError(f"No XMP files found in {first_images_path}")
+        if level > 1:
+            copy_xmps(list(first_images_path.glob("*.xmp")), first_frame, level)
+
+    def align_claimed(frame_name):
+        frame_folder = frames_by_name[frame_name]
+        if level > 1:
+            build_pyramid([frame_folder], [level])
+        copy_xmps(list(first_images_path.glob("*.xmp")), frame_folder, level)
+        align_frame(rs_exe, frame_folder, export_path_base, xml_path, level)
+
+    process_reference_frame(queue, first_frame.name, align_first)
+    completed, failed = work_loop(queue, [f.name for f in frame_folders[1:]], align_claimed)
+    print(f"\nThis worker aligned {len(completed)} frames, {len(failed)} failed")
+    if failed:
+        raise RuntimeError(f"Frames failed: {', '.join(failed)}")
+
 def main():
     parser = argparse.ArgumentParser(description="COLMAP reconstruction pipeline for multi-frame data")
     parser.add_argument("--project_path", help="Path to the project folder containing all frames", required=True)
     parser.add_argument("--rs_exe", help="Path to RealityScan executable", required=True)
     parser.add_argument("--export_path", help="Path to export directory for RS alignment", required=True)
     parser.add_argument("--xml_path", help="Path to export profile for RS alignment", required=True)
+    parser.add_argument("--level", type=int, default=1, help="Align on images downscaled by this factor; XMPs are also copied to the full resolution images (default: 1)")
+    parser.add_argument("--queue", action="store_true", help="Claim frames from the shared queue in <project_path>/_queue/rsalign, so several workers/nodes can run at once")
+    parser.add_argument("--lease", type=float, default=600.0, help="Seconds before a crashed worker's claim is released (default: 600)")
+    parser.add_argument("--step_log", help="JSONL file for per-step timing records (default: <project_path>/_steplog.jsonl)")
     
     args = parser.parse_args()
+    start_profiling("rsalign")
     
     project_path = Path(args.project_path)
     rs_exe = Path(args.rs_exe)
@@ -69,9 +134,11 @@ def main():
     if not project_path.exists():
         raise RuntimeError(f"Project path does not exist: {project_path}")
     
+    open_step_log(args.step_log or project_path / "_steplog.jsonl")
+    
     # Find all frame folders
-    frame_folders = sorted([d for d in project_path.iterdir() 
-                          if d.is_dir() and d.name.startswith("frame_")])
+    # Queue workers run on several nodes, so they leave the shared manifest file to a single writer
+    frame_folders = list_frame_folders(project_path, read_only=args.queue)
     
     if not frame_folders:
         raise RuntimeError(f"No frame folders found in {project_path}")
@@ -80,10 +147,22 @@ def main():
     for frame in frame_folders:
         print(f"  - {frame.name}")
     
+    level = args.level
+    images_dir = level_dir_name("images", level)
+
+    if args.queue:
+        run_queue(frame_folders, rs_exe, export_path_base, xml_path, level, args.lease)
+        print("\n=== All frames processed successfully! ===")
+        return
+
+    if level > 1:
+        print(f"\nBuilding pyramid level {level}...")
+        build_pyramid(frame_folders, [level])
+    
     # Process first frame
     first_frame = frame_folders[0]
 
-    images_path = first_frame/"images"
+    images_path = first_frame/images_dir
 
     export_path = export_path_base/first_frame.name
     export_path.mkdir(parents=True, exist_ok=True)
@@ -97,29 +176,18 @@ def main():
             print(f"No XMP files found in {images_path}, skipping subsequent frames alignment.")
             exit(1)
 
-        for xmp_file in xmp_files:
-            for frame_folder in frame_folders[1:]:
-                shutil.copy2(xmp_file, frame_folder/"images")
-                print(f"Copied XMP file {xmp_file.name} to {frame_folder/'images'}")
+        for frame_folder in frame_folders[1:]:
+            copy_xmps(xmp_files, frame_folder, level)
+        if level > 1:
+            copy_xmps(xmp_files, first_frame, level)
     else:
         print(f"Failed to align first frame {first_frame.name}. Exiting.")
         exit(1)
 
     # Process subsequent frames
     for frame_folder in frame_folders[1:]:
-        images_path = frame_folder/"images"
-        export_path = export_path_base/frame_folder.name
-        export_path.mkdir(parents=True, exist_ok=True)
-
-        if not images_path.exists():
-            print(f"Warning: Images folder not found in {frame_folder.name}, skipping...")
-            continue
-        
         try:
-            if rs_align_with_xmp(rs_exe, images_path, export_path, xml_path):
-                print(f"Frame {frame_folder.name} aligned successfully.")
-            else:
-                print(f"Failed to align frame {frame_folder.name}.")
+            align_frame(rs_exe, frame_folder, export_path_base, xml_path, level)
         except Exception as e:
             print(f"Error processing frame {frame_folder.name}: {e}")
             continue
@@ -0,0 +1,230 @@
+"""
+One file holding the sparse points of every frame of a take (.vvst), with
+per-frame statistics for finding frames whose alignment went wrong.
+
+A frame_container.py file with magic b"VVST", version 1 and POINT_DTYPE records;
+the metadata also holds the model folder and the statistics of every frame.
+Frame i is points[offsets[i]:offsets[i+1]], and every point also carries its
+frame index, so the whole take can be loaded into a viewer as one cloud and
+filtered by frame.
+"""
+
+import argparse
+import csv
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from colmap_model import read_points3D_binary
+from frame_container import FrameContainer, dtype_metadata, write_header
+from manifest import list_frame_folders
+from profiling import start_profiling
+from progress import track
+
+MAGIC = b"VVST"
+VERSION = 1
+POINT_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("red", "u1"), ("green", "u1"), ("blue", "u1"),
+                        ("frame", "<u4"), ("error", "<f4")])
+STATS_FIELDS = ["frame", "status", "points", "images", "mean_error", "median_error", "mean_track_length",
+                "centroid_x", "centroid_y", "centroid_z", "extent"]
+
+def load_frame(frame_index, frame_folder, model="sparse/0"):
+    """
+    Points and statistics of one frame's sparse model; runs in a worker process.
+
+    Returns:
+        tuple: (POINT_DTYPE array, stats dict)
+    """
+    model_dir = Path(frame_folder) / model
+    stats = {"frame": Path(frame_folder).name, "status": "missing", "points": 0, "images": 0}
+    if not (model_dir / "points3D.bin").exists():
+        return np.empty(0, dtype=POINT_DTYPE), stats
+
+    sparse = read_points3D_binary(model_dir / "points3D.bin")
+    points = np.empty(len(sparse), dtype=POINT_DTYPE)
+    for axis, name in enumerate("xyz"):
+        points[name] = sparse["xyz"][:, axis]
+    for channel, name in enumerate(("red", "green", "blue")):
+        points[name] = sparse["rgb"][:, channel]
+    points["frame"] = frame_index
+    points["error"] = sparse["error"]
+
+    if (model_dir / "images.bin").exists():
+        # The registered image count is the first field of images.bin
+        with open(model_dir / "images.bin", "rb") as f:
+            stats["images"], = struct.unpack("<Q", f.read(8))
+
+    stats["points"] = len(sparse)
+    stats["status"] = "ok" if len(sparse) else "empty"
+    if len(sparse):
+        low, high = np.percentile(sparse["xyz"], [1, 99], axis=0)
+        centroid = np.median(sparse["xyz"], axis=0)
+        stats.update(
+            mean_error=round(float(sparse["error"].mean()), 4),
+            median_error=round(float(np.median(sparse["error"])), 4),
+            mean_track_length=round(float(sparse["track_length"].mean()), 2),
+            centroid_x=round(float(centroid[0]), 4),
+            centroid_y=round(float(centroid[1]), 4),
+            centroid_z=round(float(centroid[2]), 4),
+            # Diagonal of the box holding 98% of the points, so stray points do not dominate
+            extent=round(float(np.linalg.norm(high - low)), 4),
+        )
+    return points, stats
+
+def classify(stats, min_point_ratio=0.5, max_error_ratio=2.0):
+    """
+    Flag frames against the take's medians: fewer than min_point_ratio of the median
+    point count, a mean reprojection error above max_error_ratio times the median,
+    or fewer registered images than the best frame. Updates the status in place.
+    """
+    aligned = [s for s in stats if s["status"] == "ok"]
+    if not aligned:
+        return stats
+    median_points = np.median([s["points"] for s in aligned])
+    median_error = np.median([s["mean_error"] for s in aligned])
+    most_images = max(s["images"] for s in aligned)
+
+    for s in aligned:
+        if s["points"] < min_point_ratio * median_points:
+            s["status"] = "few_points"
+        elif s["mean_error"] > max_error_ratio * median_error:
+            s["status"] = "high_error"
+        elif s["images"] < most_images:
+            s["status"] = "partial"
+    return stats
+
+def build_timeline(frame_folders, out_path, model="sparse/0", workers=None, min_point_ratio=0.5, max_error_ratio=2.0):
+    """
+    Read every frame's sparse model in parallel and write them as one .vvst file.
+
+    Returns:
+        list: Statistics of every frame, in frame order
+    """
+    offsets = np.zeros(len(frame_folders) + 1, dtype="<u8")
+    stats = []
+    tracker = track("sparse_timeline", len(frame_folders))
+
+    # The metadata holds the statistics, so the points go to a temporary file first
+    points_path = Path(f"{out_path}.points.tmp")
+    with open(points_path, "wb") as f, ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(load_frame, range(len(frame_folders)), frame_folders, [model] * len(frame_folders))
+        for i, (points, frame_stats) in enumerate(results):
+            f.write(points.tobytes())
+            offsets[i + 1] = offsets[i] + len(points)
+            stats.append(frame_stats)
+            tracker.update()
+    tracker.close()
+
+    classify(stats, min_point_ratio, max_error_ratio)
+    metadata = {
+        "dtype": dtype_metadata(POINT_DTYPE),
+        "frames": [frame_folder.name for frame_folder in frame_folders],
+        "model": model,
+        "stats": stats,
+    }
+
+    try:
+        with open(out_path, "wb") as f, open(points_path, "rb") as points_file:
+            write_header(f, MAGIC, VERSION, metadata, offsets)
+            while True:
+                block = points_file.read(64 * 1024 * 1024)
+                if not block:
+                    break
+                f.write(block)
+    finally:
+        points_path.unlink()
+    return stats
+
+class SparseTimeline(FrameContainer):
+    """Read-only view of a .vvst file; indexing returns one frame's points without a copy"""
+
+    def __init__(self, path):
+        super().__init__(path, MAGIC, VERSION)
+        self.stats = self.metadata["stats"]
+
+    @property
+    def points(self):
+        return self.records
+
+def write_stats_table(path, stats):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=STATS_FIELDS)
+        writer.writeheader()
+        for frame_stats in stats:
+            writer.writerow(frame_stats)
+
+def print_stats(stats, sort_key="status", top=20):
+    """Summary of the take, then the flagged frames (or the top frames by sort_key)"""
+    aligned = [s for s in stats if s["status"] != "missing" and s["points"]]
+    counts = {}
+    for s in stats:
+        counts[s["status"]] = counts.get(s["status"], 0) + 1
+    print(f"{len(stats)} frames: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    if aligned:
+        points = np.array([s["points"] for s in aligned])
+        errors = np.array([s["mean_error"] for s in aligned])
+        print(f"  points per frame: min {points.min()}, median {np.median(points):.0f}, max {points.max()}")
+        print(f"  mean reprojection error: min {errors.min():.3f}, median {np.median(errors):.3f}, max {errors.max():.3f} px")
+
+    if sort_key == "status":
+        rows = [s for s in stats if s["status"] != "ok"]
+        print(f"\nFlagged frames ({len(rows)}):")
+    else:
+        rows = sorted(stats, key=lambda s: s.get(sort_key) or 0, reverse=sort_key != "points")
+        print(f"\nFrames by {sort_key}:")
+    print(f"  {'frame':<14}{'status':<12}{'points':>8}{'images':>8}{'mean err':>10}{'track':>8}")
+    for s in rows[:top]:
+        mean_error = f"{s['mean_error']:.3f}" if "mean_error" in s else "-"
+        track_length = f"{s['mean_track_length']:.1f}" if "mean_track_length" in s else "-"
+        print(f"  {s['frame']:<14}{s['status']:<12}{s['points']:>8}{s['images']:>8}{mean_error:>10}{track_length:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect the sparse models of all frames into one timeline file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Project folder -> .vvst file and statistics CSV")
+    build_parser.add_argument("project_path", help="Path to the project folder containing all frames")
+    build_parser.add_argument("output_file", help="Path of the .vvst file to write (statistics go next to it as .csv)")
+    build_parser.add_argument("--model", default="sparse/0", help="Model folder inside each frame (default: sparse/0)")
+    build_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    build_parser.add_argument("--min_point_ratio", type=float, default=0.5,
+                              help="Flag frames with fewer points than this times the median (default: 0.5)")
+    build_parser.add_argument("--max_error_ratio", type=float, default=2.0,
+                              help="Flag frames with a mean error above this times the median (default: 2.0)")
+
+    stats_parser = subparsers.add_parser("stats", help="Print the statistics stored in a .vvst file")
+    stats_parser.add_argument("input_file", help="Path of the .vvst file")
+    stats_parser.add_argument("--sort", default="status", choices=["status", "points", "mean_error", "median_error", "extent"],
+                              help="status: list flagged frames; otherwise list frames by this value (default: status)")
+    stats_parser.add_argument("--top", type=int, default=20, help="Number of frames to list (default: 20)")
+
+    args = parser.parse_args()
+    start_profiling("sparse_timeline")
+
+    if args.command == "build":
+        project_path = Path(args.project_path)
+        if not project_path.exists():
+            raise RuntimeError(f"Project path does not exist: {project_path}")
+        frame_folders = list_frame_folders(project_path)
+        if not frame_folders:
+            raise RuntimeError(f"No frame folders found in {project_path}")
+
+        print(f"Reading {len(frame_folders)} sparse models with {args.workers or os.cpu_count()} workers...")
+        stats = build_timeline(frame_folders, args.output_file, args.model, args.workers,
+                               args.min_point_ratio, args.max_error_ratio)
+        table_path = Path(args.output_file).with_suffix(".csv")
+        write_stats_table(table_path, stats)
+        print(f"\nWrote {args.output_file} ({Path(args.output_file).stat().st_size / 1e6:.1f} MB) and {table_path}\n")
+        print_stats(stats)
+        return
+
+    if not Path(args.input_file).exists():
+        raise RuntimeError(f"Input file does not exist: {args.input_file}")
+    with SparseTimeline(args.input_file) as timeline:
+        print_stats(timeline.stats, args.sort, args.top)
+
+if __name__ == "__main__":
+    main()
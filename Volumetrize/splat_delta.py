@@ -0,0 +1,214 @@
+"""
+Temporal delta compression for a sequence of trained splat PLYs.
+
+Frames are grouped into GOPs of keyframe_interval frames. The first frame of a
+GOP is stored as is; every other frame is matched splat-by-splat to the
+keyframe with a KD-tree on positions. Matched splats are stored as the index
+of their keyframe splat plus an int16 delta per attribute (step-quantized),
+unmatched ones are stored raw. Deltas are always taken against the keyframe,
+so any frame decodes from its keyframe alone.
+
+Output folder:
+
+    index.json      fields, quantization steps and frame -> (gop, slot) table
+    gop_NNNNN.npz   key (N0, D) float32, and per slot j >= 1:
+                    idx_j uint32, delta_j int16 (M, D), raw_j float32 (K, D)
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    # Only encoding needs the KD-tree; decoding works with numpy alone
+    cKDTree = None
+
+from profiling import start_profiling
+from splat_ply import read_splat_ply, write_splat_ply
+
+NORMAL_FIELDS = ("nx", "ny", "nz")
+INT16_LIMIT = 32767
+
+def read_frame(ply_path, dtype):
+    """Vertices of one frame, which must share the vertex layout of the first frame"""
+    vertices = read_splat_ply(ply_path)
+    if vertices.dtype != dtype:
+        raise RuntimeError(f"{ply_path.name} has a different vertex layout than the first frame")
+    return vertices
+
+def attribute_matrix(vertices, fields):
+    return np.stack([vertices[name] for name in fields], axis=1).astype(np.float32)
+
+def column_steps(fields, position_step, attribute_step):
+    """Quantization step per attribute column; max reconstruction error is step / 2"""
+    return np.array([position_step if name in ("x", "y", "z") else attribute_step for name in fields],
+                    dtype=np.float32)
+
+def encode_frame(key, key_tree, frame, steps, max_distance):
+    """Split a frame into keyframe-relative deltas and raw splats"""
+    distances, idx = key_tree.query(frame[:, :3], distance_upper_bound=max_distance)
+    matched = np.isfinite(distances)
+
+    codes = np.zeros((len(frame), frame.shape[1]), dtype=np.int64)
+    codes[matched] = np.round((frame[matched] - key[idx[matched]]) / steps)
+    # A delta too large for int16 is cheaper to store raw anyway
+    matched &= np.all(np.abs(codes) <= INT16_LIMIT, axis=1)
+
+    return idx[matched].astype(np.uint32), codes[matched].astype(np.int16), frame[~matched]
+
+def decode_frame_arrays(key, idx, delta, raw, steps):
+    matched = key[idx] + delta.astype(np.float32) * steps
+    return np.concatenate([matched, raw], axis=0)
+
+def encode_gop(ply_paths, out_path, dtype, fields, steps, max_distance):
+    """Encode one GOP; returns (input bytes, output bytes, matched splats, total splats)"""
+    key = attribute_matrix(read_frame(ply_paths[0], dtype), fields)
+    key_tree = cKDTree(key[:, :3])
+
+    arrays = {"key": key}
+    matched_total = 0
+    splat_total = len(key)
+    for slot, ply_path in enumerate(ply_paths[1:], start=1):
+        frame = attribute_matrix(read_frame(ply_path, dtype), fields)
+        idx, delta, raw = encode_frame(key, key_tree, frame, steps, max_distance)
+        arrays[f"idx_{slot}"] = idx
+        arrays[f"delta_{slot}"] = delta
+        arrays[f"raw_{slot}"] = raw
+        matched_total += len(idx)
+        splat_total += len(frame)
+
+    np.savez_compressed(out_path, **arrays)
+    input_bytes = sum(os.path.getsize(p) for p in ply_paths)
+    return input_bytes, os.path.getsize(out_path), matched_total, splat_total
+
+def encode_sequence(ply_paths, output_path, keyframe_interval=30, position_step=1e-4,
+                    attribute_step=1.0 / 512, max_distance=0.01, workers=None):
+    if cKDTree is None:
+        raise RuntimeError("Encoding needs scipy for splat matching: pip install scipy")
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    first = read_splat_ply(ply_paths[0])
+    fields = [name for name in first.dtype.names if name not in NORMAL_FIELDS]
+    steps = column_steps(fields, position_step, attribute_step)
+
+    gops = [ply_paths[i:i + keyframe_interval] for i in range(0, len(ply_paths), keyframe_interval)]
+    gop_paths = [output_path / f"gop_{i:05d}.npz" for i in range(len(gops))]
+
+    print(f"Encoding {len(ply_paths)} frames as {len(gops)} GOPs of up to {keyframe_interval} frames...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(encode_gop, gops, gop_paths, [first.dtype] * len(gops),
+                                    [fields] * len(gops), [steps] * len(gops), [max_distance] * len(gops)))
+
+    frames = []
+    for gop, gop_path in zip(gops, gop_paths):
+        for slot, ply_path in enumerate(gop):
+            frames.append({"name": ply_path.stem, "gop": gop_path.name, "slot": slot})
+
+    index = {
+        "version": 1,
+        "fields": fields,
+        "normals": "nx" in first.dtype.names,
+        "steps": steps.tolist(),
+        "keyframe_interval": keyframe_interval,
+        "frames": frames,
+    }
+    with open(output_path / "index.json", "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+
+    for gop_path, (size_in, size_out, matched, total) in zip(gop_paths, results):
+        print(f"  {gop_path.name}: {size_in / 1e6:.1f} MB -> {size_out / 1e6:.1f} MB "
+              f"({size_in / max(size_out, 1):.1f}x), {matched / max(total, 1) * 100:.1f}% splats as deltas")
+
+    total_in = sum(r[0] for r in results)
+    total_out = sum(r[1] for r in results)
+    print(f"\nTotal: {total_in / 1e6:.1f} MB -> {total_out / 1e6:.1f} MB ({total_in / max(total_out, 1):.1f}x)")
+
+class DeltaSequence:
+    """Random access to frames of an encoded sequence, decoding from the nearest keyframe"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "index.json", "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.fields = self.index["fields"]
+        self.steps = np.array(self.index["steps"], dtype=np.float32)
+        self.frames = self.index["frames"]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame_names(self):
+        return [frame["name"] for frame in self.frames]
+
+    def attributes(self, frame_index):
+        """(N, D) float32 attribute matrix of one frame, columns in self.fields order"""
+        frame = self.frames[frame_index]
+        with np.load(self.path / frame["gop"]) as gop:
+            key = gop["key"]
+            slot = frame["slot"]
+            if slot == 0:
+                return key
+            return decode_frame_arrays(key, gop[f"idx_{slot}"], gop[f"delta_{slot}"], gop[f"raw_{slot}"], self.steps)
+
+    def vertices(self, frame_index):
+        """Decoded frame as a splat vertex array ready for write_splat_ply"""
+        attributes = self.attributes(frame_index)
+        names = list(self.fields)
+        if self.index["normals"]:
+            names[3:3] = NORMAL_FIELDS
+        vertices = np.zeros(len(attributes), dtype=[(name, "<f4") for name in names])
+        for column, name in enumerate(self.fields):
+            vertices[name] = attributes[:, column]
+        return vertices
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyframe + delta compression for splat PLY sequences")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    encode_parser = subparsers.add_parser("encode", help="PLY folder -> delta sequence folder")
+    encode_parser.add_argument("input_path", help="Folder of per-frame PLYs (e.g. postshot_train output)")
+    encode_parser.add_argument("output_path", help="Folder for the encoded sequence")
+    encode_parser.add_argument("--keyframe_interval", type=int, default=30, help="Frames per keyframe (default: 30)")
+    encode_parser.add_argument("--max_distance", type=float, default=0.01, help="Largest position change still encoded as a delta (default: 0.01)")
+    encode_parser.add_argument("--position_step", type=float, default=1e-4, help="Position delta quantization step (default: 1e-4)")
+    encode_parser.add_argument("--attribute_step", type=float, default=1.0 / 512, help="Quantization step for all other attributes (default: 1/512)")
+    encode_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+
+    decode_parser = subparsers.add_parser("decode", help="Delta sequence folder -> PLY folder")
+    decode_parser.add_argument("input_path", help="Folder of the encoded sequence")
+    decode_parser.add_argument("output_path", help="Folder for decoded PLYs")
+    decode_parser.add_argument("--frames", type=int, nargs="+", help="Frame indices to decode (default: all)")
+
+    args = parser.parse_args()
+    start_profiling("splat_delta")
+
+    input_path = Path(args.input_path)
+    if not input_path.exists():
+        raise RuntimeError(f"Input path does not exist: {input_path}")
+
+    if args.command == "encode":
+        ply_paths = sorted(input_path.glob("*.ply"))
+        if not ply_paths:
+            raise RuntimeError(f"No PLY files found in {input_path}")
+        encode_sequence(ply_paths, args.output_path, args.keyframe_interval, args.position_step,
+                        args.attribute_step, args.max_distance, args.workers)
+    else:
+        sequence = DeltaSequence(input_path)
+        output_path = Path(args.output_path)
+        output_path.mkdir(parents=True, exist_ok=True)
+        for frame_index in args.frames if args.frames is not None else range(len(sequence)):
+            name = sequence.frames[frame_index]["name"]
+            write_splat_ply(output_path / f"{name}.ply", sequence.vertices(frame_index))
+            print(f"Decoded {name}")
+
+    print("\n=== All frames processed successfully! ===")
+
+if __name__ == "__main__":
+    main()
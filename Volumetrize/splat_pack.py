@@ -0,0 +1,103 @@
+"""
+Single-file, memory-mapped container for a sequence of splat PLYs (.vvsp).
+
+A frame_container.py file with magic b"VVSP", version 1, the PLY vertex dtype as
+record type and the PLY file stems as frame names. All frames share one vertex
+layout, so opening a frame is a slice of the mapping: no parsing and no copy.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from frame_container import FrameContainer, dtype_metadata, write_header, write_offsets
+from profiling import start_profiling
+from splat_ply import read_splat_ply, write_splat_ply
+
+MAGIC = b"VVSP"
+VERSION = 1
+
+def pack_sequence(ply_paths, out_path):
+    """Concatenate PLYs into one .vvsp file, streaming one frame at a time"""
+    first = read_splat_ply(ply_paths[0])
+    dtype = first.dtype
+    metadata = {"dtype": dtype_metadata(dtype), "frames": [p.stem for p in ply_paths]}
+    offsets = np.zeros(len(ply_paths) + 1, dtype="<u8")
+
+    with open(out_path, "wb") as f:
+        metadata_size = write_header(f, MAGIC, VERSION, metadata, offsets)
+
+        for i, ply_path in enumerate(ply_paths):
+            vertices = first if i == 0 else read_splat_ply(ply_path)
+            if vertices.dtype != dtype:
+                raise RuntimeError(f"{ply_path.name} has a different vertex layout than {ply_paths[0].name}")
+            f.write(np.ascontiguousarray(vertices).tobytes())
+            offsets[i + 1] = offsets[i] + len(vertices)
+            print(f"  {ply_path.name}: {len(vertices)} splats")
+
+        write_offsets(f, metadata_size, offsets)
+
+    return int(offsets[-1])
+
+class SplatSequence(FrameContainer):
+    """Read-only view of a .vvsp file; indexing returns zero-copy structured arrays"""
+
+    def __init__(self, path):
+        super().__init__(path, MAGIC, VERSION)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack splat PLY sequences into one memory-mapped file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="PLY folder -> .vvsp file")
+    pack_parser.add_argument("input_path", help="Folder of per-frame PLYs (e.g. postshot_train output)")
+    pack_parser.add_argument("output_file", help="Path of the .vvsp file to write")
+
+    unpack_parser = subparsers.add_parser("unpack", help=".vvsp file -> PLY folder")
+    unpack_parser.add_argument("input_file", help="Path of the .vvsp file")
+    unpack_parser.add_argument("output_path", help="Folder for the PLYs")
+
+    info_parser = subparsers.add_parser("info", help="Print frame counts and random seek time")
+    info_parser.add_argument("input_file", help="Path of the .vvsp file")
+
+    args = parser.parse_args()
+    start_profiling("splat_pack")
+
+    if args.command == "pack":
+        input_path = Path(args.input_path)
+        ply_paths = sorted(input_path.glob("*.ply"))
+        if not ply_paths:
+            raise RuntimeError(f"No PLY files found in {input_path}")
+        print(f"Packing {len(ply_paths)} frames into {args.output_file}...")
+        total = pack_sequence(ply_paths, args.output_file)
+        print(f"\nPacked {total} splats, {Path(args.output_file).stat().st_size / 1e6:.1f} MB")
+        return
+
+    if not Path(args.input_file).exists():
+        raise RuntimeError(f"Input file does not exist: {args.input_file}")
+
+    with SplatSequence(args.input_file) as sequence:
+        if args.command == "unpack":
+            output_path = Path(args.output_path)
+            output_path.mkdir(parents=True, exist_ok=True)
+            for i, name in enumerate(sequence.names):
+                write_splat_ply(output_path / f"{name}.ply", sequence[i])
+                print(f"  {name}: {len(sequence[i])} splats")
+            return
+
+        counts = np.diff(sequence.offsets)
+        print(f"{sequence.path.name}: {len(sequence)} frames, {int(counts.sum())} splats, "
+              f"{sequence.dtype.itemsize} bytes per splat")
+        print(f"  splats per frame: min {counts.min()}, mean {counts.mean():.0f}, max {counts.max()}")
+
+        order = np.random.default_rng().permutation(len(sequence))
+        start = time.perf_counter()
+        for i in order:
+            sequence[i]
+        elapsed = time.perf_counter() - start
+        print(f"  random frame seek: {elapsed / len(order) * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    main()
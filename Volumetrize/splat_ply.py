@@ -0,0 +1,103 @@
+import numpy as np
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2",
+    "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4",
+    "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4",
+    "double": "f8", "float64": "f8",
+}
+
+def read_ply_header(f):
+    """
+    Parse a PLY header from an open binary file.
+
+    Returns:
+        tuple: (format, [(element name, count, [(property name, ply type)])])
+    """
+    if f.readline().strip() != b"ply":
+        raise RuntimeError("Not a PLY file")
+
+    ply_format = None
+    elements = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise RuntimeError("Unexpected end of PLY header")
+        tokens = line.decode("ascii").split()
+        if not tokens or tokens[0] in ("comment", "obj_info"):
+            continue
+        if tokens[0] == "end_header":
+            break
+        if tokens[0] == "format":
+            ply_format = tokens[1]
+        elif tokens[0] == "element":
+            elements.append((tokens[1], int(tokens[2]), []))
+        elif tokens[0] == "property":
+            if tokens[1] == "list":
+                raise RuntimeError("PLY list properties are not supported for splats")
+            elements[-1][2].append((tokens[2], tokens[1]))
+
+    return ply_format, elements
+
+def element_dtype(properties, ply_format):
+    endian = ">" if ply_format == "binary_big_endian" else "<"
+    return np.dtype([(name, endian + PLY_TYPES[ply_type]) for name, ply_type in properties])
+
+def read_splat_ply(path):
+    """Read the vertex element of a Gaussian splat PLY as a structured array"""
+    with open(path, "rb") as f:
+        ply_format, elements = read_ply_header(f)
+
+        for name, count, properties in elements:
+            dtype = element_dtype(properties, ply_format)
+            if ply_format == "ascii":
+                rows = np.loadtxt(f, dtype=np.float64, max_rows=count, ndmin=2)
+                data = np.empty(count, dtype=dtype.newbyteorder("<"))
+                for column, field in enumerate(dtype.names):
+                    data[field] = rows[:, column]
+            else:
+                data = np.frombuffer(f.read(dtype.itemsize * count), dtype=dtype, count=count)
+
+            if name == "vertex":
+                return data.astype(data.dtype.newbyteorder("<"), copy=False)
+
+    raise RuntimeError(f"No vertex element in {path}")
+
+def write_splat_ply(path, vertices):
+    """Write a structured array as the vertex element of a binary little-endian PLY"""
+    vertices = np.ascontiguousarray(vertices, dtype=vertices.dtype.newbyteorder("<"))
+    type_names = {np.dtype(v).str[1:]: k for k, v in PLY_TYPES.items() if not k[-1].isdigit()}
+
+    header = ["ply", "format binary_little_endian 1.0", f"element vertex {len(vertices)}"]
+    for name in vertices.dtype.names:
+        header.append(f"property {type_names[vertices.dtype[name].str[1:]]} {name}")
+    header.append("end_header")
+
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        f.write(vertices.tobytes())
+
+def splat_dtype(num_rest, normals=True):
+    """Standard 3DGS vertex layout with num_rest higher-order SH coefficients"""
+    fields = ["x", "y", "z"]
+    if normals:
+        fields += ["nx", "ny", "nz"]
+    fields += [f"f_dc_{i}" for i in range(3)]
+    fields += [f"f_rest_{i}" for i in range(num_rest)]
+    fields += ["opacity"]
+    fields += [f"scale_{i}" for i in range(3)]
+    fields += [f"rot_{i}" for i in range(4)]
+    return np.dtype([(name, "<f4") for name in fields])
+
+def num_rest_coefficients(vertices):
+    return sum(1 for name in vertices.dtype.names if name.startswith("f_rest_"))
+
+def field_block(vertices, prefix, count):
+    """Gather prefix_0..prefix_{count-1} into an (N, count) float32 array"""
+    if count == 0:
+        return np.zeros((len(vertices), 0), dtype=np.float32)
+    return np.stack([vertices[f"{prefix}{i}"] for i in range(count)], axis=1).astype(np.float32)
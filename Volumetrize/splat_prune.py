@@ -0,0 +1,147 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from colmap_model import camera_views
+from profiling import start_profiling
+from splat_ply import field_block, read_splat_ply, write_splat_ply
+
+# Splats are drawn out to about 3 standard deviations
+SPLAT_EXTENT = 3.0
+NEAR_PLANE = 0.01
+CHUNK_SIZE = 1 << 18
+
+def max_pixel_radius(positions, max_scales, views):
+    """Largest on-screen radius of each splat over all views in front of it, in pixels"""
+    rotations, translations, focals = views
+    radius = np.zeros(len(positions), dtype=np.float32)
+    # Only depth is needed: row 3 of R and t give the camera-space z of every point in every view
+    depth_axis = rotations[:, 2, :].T.astype(np.float32)
+    depth_offset = translations[:, 2].astype(np.float32)
+
+    for start in range(0, len(positions), CHUNK_SIZE):
+        end = start + CHUNK_SIZE
+        depth = positions[start:end] @ depth_axis + depth_offset
+        size = SPLAT_EXTENT * max_scales[start:end, None] * focals[None, :] / np.maximum(depth, NEAR_PLANE)
+        radius[start:end] = np.max(np.where(depth > NEAR_PLANE, size, 0.0), axis=1)
+    return radius
+
+def importance(vertices):
+    """Opacity times the area of the splat's two largest axes"""
+    opacity = 1.0 / (1.0 + np.exp(-vertices["opacity"].astype(np.float32)))
+    log_scales = np.sort(field_block(vertices, "scale_", 3), axis=1)
+    return opacity * np.exp(log_scales[:, 1] + log_scales[:, 2])
+
+def prune_splats(vertices, min_opacity=0.0, min_scale=0.0, min_pixels=0.0, views=None, target_count=None):
+    """
+    Drop splats that cannot contribute visibly, then optionally keep only the most important.
+
+    Args:
+        vertices (np.ndarray): Splat vertex array
+        min_opacity (float): Minimum sigmoid(opacity)
+        min_scale (float): Minimum largest axis scale in scene units
+        min_pixels (float): Minimum on-screen radius in any view, needs views
+        views (tuple): Output of colmap_model.camera_views
+        target_count (int): Keep at most this many splats, ranked by importance
+
+    Returns:
+        np.ndarray: The kept splats, in their original order
+    """
+    keep = np.ones(len(vertices), dtype=bool)
+
+    if min_opacity > 0:
+        keep &= 1.0 / (1.0 + np.exp(-vertices["opacity"].astype(np.float32))) >= min_opacity
+
+    max_scales = np.exp(field_block(vertices, "scale_", 3).max(axis=1))
+    if min_scale > 0:
+        keep &= max_scales >= min_scale
+
+    if min_pixels > 0 and views is not None:
+        positions = np.stack([vertices["x"], vertices["y"], vertices["z"]], axis=1).astype(np.float32)
+        candidates = np.flatnonzero(keep)
+        keep[candidates] = max_pixel_radius(positions[candidates], max_scales[candidates], views) >= min_pixels
+
+    kept = np.flatnonzero(keep)
+    if target_count is not None and target_count < 1:
+        # argpartition(...)[-0:] would select everything
+        kept = kept[:0]
+    elif target_count is not None and len(kept) > target_count:
+        scores = importance(vertices[kept])
+        kept = np.sort(kept[np.argpartition(scores, -target_count)[-target_count:]])
+
+    return vertices[kept]
+
+def prune_file(ply_path, out_path, options, model_dir=None):
+    vertices = read_splat_ply(ply_path)
+    views = None
+    if options["min_pixels"] > 0 and model_dir is not None:
+        if (model_dir / "images.bin").exists():
+            views = camera_views(model_dir)
+        else:
+            print(f"Warning: no sparse model at {model_dir}, skipping screen-space pruning for {ply_path.name}")
+
+    pruned = prune_splats(vertices, views=views, **options)
+    write_splat_ply(out_path, pruned)
+    return ply_path.name, len(vertices), len(pruned), os.path.getsize(ply_path), os.path.getsize(out_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune and decimate trained splat PLYs")
+    parser.add_argument("input_path", help="Folder of per-frame PLYs (e.g. postshot_train output)")
+    parser.add_argument("output_path", help="Folder for pruned PLYs")
+    parser.add_argument("--min_opacity", type=float, default=0.005, help="Drop splats below this opacity (default: 0.005)")
+    parser.add_argument("--min_scale", type=float, default=0.0, help="Drop splats whose largest axis is below this size in scene units (default: off)")
+    parser.add_argument("--project", help="Project folder with frame_XXXXX/sparse/0 models, enables --min_pixels")
+    parser.add_argument("--min_pixels", type=float, default=0.5, help="Drop splats smaller than this radius in every view (default: 0.5)")
+    parser.add_argument("--target_count", type=int, default=None, help="Keep at most this many splats per frame, by importance")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+
+    args = parser.parse_args()
+    start_profiling("splat_prune")
+
+    input_path = Path(args.input_path)
+    output_path = Path(args.output_path)
+
+    if args.target_count is not None and args.target_count < 1:
+        raise RuntimeError(f"--target_count must be at least 1, got {args.target_count}")
+    if not input_path.exists():
+        raise RuntimeError(f"Input path does not exist: {input_path}")
+    if input_path.resolve() == output_path.resolve():
+        raise RuntimeError("Output path must differ from input path")
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    ply_paths = sorted(input_path.glob("*.ply"))
+    if not ply_paths:
+        raise RuntimeError(f"No PLY files found in {input_path}")
+
+    options = {
+        "min_opacity": args.min_opacity,
+        "min_scale": args.min_scale,
+        "min_pixels": args.min_pixels if args.project else 0.0,
+        "target_count": args.target_count,
+    }
+    # Postshot exports each frame as <frame folder name>.ply
+    model_dirs = [Path(args.project) / p.stem / "sparse" / "0" if args.project else None for p in ply_paths]
+
+    print(f"Pruning {len(ply_paths)} frames with {args.workers or os.cpu_count()} workers...")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(prune_file, ply_paths, [output_path / p.name for p in ply_paths],
+                                    [options] * len(ply_paths), model_dirs))
+
+    splats_in = splats_out = bytes_in = bytes_out = 0
+    for name, count_in, count_out, size_in, size_out in results:
+        splats_in += count_in
+        splats_out += count_out
+        bytes_in += size_in
+        bytes_out += size_out
+        print(f"  {name}: {count_in} -> {count_out} splats ({(1 - count_out / max(count_in, 1)) * 100:.1f}% pruned)")
+
+    print(f"\nTotal: {splats_in} -> {splats_out} splats, {bytes_in / 1e6:.1f} MB -> {bytes_out / 1e6:.1f} MB "
+          f"({(1 - bytes_out / max(bytes_in, 1)) * 100:.1f}% saved)")
+    print("\n=== All frames processed successfully! ===")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Compact quantized storage for trained Gaussian splat PLYs (.vvsq).
+
+File layout (all little endian):
+
+    header     "<4sHHII"  magic b"VVSQ", version (1), flags (bit 0: source had
+                          normals), splat count N, f_rest coefficient count R
+    ranges     float32    pos_min[3] pos_max[3] scale_min[3] scale_max[3]
+                          dc_min[3] dc_max[3] rest_min[R] rest_max[R]
+    positions  uint16[N, 3]  x y z, linear in [pos_min, pos_max]
+    scales     uint8[N, 3]   log scales, linear in [scale_min, scale_max]
+    rotations  uint32[N]     smallest-three quaternion: 2-bit index of the
+                             dropped largest component, then 3 x 10 bits in
+                             [-1/sqrt(2), 1/sqrt(2)]
+    dc         uint8[N, 3]   SH DC colour, linear in [dc_min, dc_max]
+    opacity    uint8[N]      sigmoid(opacity) in [0, 1]
+    rest       uint8[N, R]   higher-order SH, per coefficient range
+
+Sections are stored one after another (structure of arrays), so each decodes
+with a single vectorized pass. A float32 3DGS splat with normals and degree-3
+SH takes 248 bytes; the quantized one takes 62.
+"""
+
+import argparse
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from profiling import start_profiling
+from splat_ply import field_block, num_rest_coefficients, read_splat_ply, splat_dtype, write_splat_ply
+
+MAGIC = b"VVSQ"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+FLAG_NORMALS = 1
+
+# Components kept for each dropped (largest) quaternion component
+OTHER_COMPONENTS = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+ROTATION_RANGE = 1.0 / np.sqrt(2.0)
+
+def quantize(values, low, high, bits):
+    levels = (1 << bits) - 1
+    span = np.where(high > low, high - low, 1.0)
+    return np.round((np.clip(values, low, high) - low) / span * levels).astype(np.uint32)
+
+def dequantize(codes, low, high, bits):
+    levels = (1 << bits) - 1
+    return (low + codes.astype(np.float32) / levels * (high - low)).astype(np.float32)
+
+def encode_rotations(rotations):
+    norms = np.linalg.norm(rotations, axis=1, keepdims=True)
+    q = rotations / np.where(norms > 0, norms, 1.0)
+    largest = np.argmax(np.abs(q), axis=1)
+    # q and -q are the same rotation; make the dropped component positive
+    q *= np.where(np.take_along_axis(q, largest[:, None], 1) < 0, -1.0, 1.0)
+    others = np.take_along_axis(q, OTHER_COMPONENTS[largest], 1)
+    codes = quantize(others, -ROTATION_RANGE, ROTATION_RANGE, 10)
+    return (largest.astype(np.uint32) << 30) | (codes[:, 0] << 20) | (codes[:, 1] << 10) | codes[:, 2]
+
+def decode_rotations(packed):
+    largest = (packed >> 30).astype(np.int64)
+    codes = np.stack([(packed >> 20) & 1023, (packed >> 10) & 1023, packed & 1023], axis=1)
+    others = dequantize(codes, -ROTATION_RANGE, ROTATION_RANGE, 10)
+    q = np.empty((len(packed), 4), dtype=np.float32)
+    np.put_along_axis(q, OTHER_COMPONENTS[largest], others, 1)
+    np.put_along_axis(q, largest[:, None], np.sqrt(np.maximum(0.0, 1.0 - np.sum(others ** 2, axis=1)))[:, None], 1)
+    return q
+
+def encode_splats(vertices):
+    """Quantize a splat vertex array into the .vvsq byte layout"""
+    num_rest = num_rest_coefficients(vertices)
+    has_normals = "nx" in vertices.dtype.names
+
+    positions = np.stack([vertices["x"], vertices["y"], vertices["z"]], axis=1).astype(np.float32)
+    scales = field_block(vertices, "scale_", 3)
+    rotations = field_block(vertices, "rot_", 4)
+    dc = field_block(vertices, "f_dc_", 3)
+    rest = field_block(vertices, "f_rest_", num_rest)
+    opacity = 1.0 / (1.0 + np.exp(-vertices["opacity"].astype(np.float32)))
+
+    ranges = []
+    for block in (positions, scales, dc, rest):
+        low = block.min(axis=0) if len(block) else np.zeros(block.shape[1], np.float32)
+        high = block.max(axis=0) if len(block) else np.zeros(block.shape[1], np.float32)
+        ranges.append((low.astype(np.float32), high.astype(np.float32)))
+    (pos_low, pos_high), (scale_low, scale_high), (dc_low, dc_high), (rest_low, rest_high) = ranges
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION, FLAG_NORMALS if has_normals else 0, len(vertices), num_rest),
+        pos_low.tobytes(), pos_high.tobytes(),
+        scale_low.tobytes(), scale_high.tobytes(),
+        dc_low.tobytes(), dc_high.tobytes(),
+        rest_low.tobytes(), rest_high.tobytes(),
+        quantize(positions, pos_low, pos_high, 16).astype("<u2").tobytes(),
+        quantize(scales, scale_low, scale_high, 8).astype(np.uint8).tobytes(),
+        encode_rotations(rotations).astype("<u4").tobytes(),
+        quantize(dc, dc_low, dc_high, 8).astype(np.uint8).tobytes(),
+        quantize(opacity, 0.0, 1.0, 8).astype(np.uint8).tobytes(),
+        quantize(rest, rest_low, rest_high, 8).astype(np.uint8).tobytes(),
+    ]
+    return b"".join(parts)
+
+def decode_splats(data):
+    """Decode .vvsq bytes back into a float32 splat vertex array"""
+    magic, version, flags, count, num_rest = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise RuntimeError("Not a VVSQ file")
+    if version != VERSION:
+        raise RuntimeError(f"Unsupported VVSQ version: {version}")
+
+    offset = HEADER.size
+
+    def take(dtype, shape):
+        nonlocal offset
+        size = int(np.prod(shape))
+        array = np.frombuffer(data, dtype=dtype, count=size, offset=offset).reshape(shape)
+        offset += array.nbytes
+        return array
+
+    pos_low, pos_high = take("<f4", (3,)), take("<f4", (3,))
+    scale_low, scale_high = take("<f4", (3,)), take("<f4", (3,))
+    dc_low, dc_high = take("<f4", (3,)), take("<f4", (3,))
+    rest_low, rest_high = take("<f4", (num_rest,)), take("<f4", (num_rest,))
+
+    positions = dequantize(take("<u2", (count, 3)), pos_low, pos_high, 16)
+    scales = dequantize(take("u1", (count, 3)), scale_low, scale_high, 8)
+    rotations = decode_rotations(take("<u4", (count,)).astype(np.uint32))
+    dc = dequantize(take("u1", (count, 3)), dc_low, dc_high, 8)
+    opacity = np.clip(take("u1", (count,)).astype(np.float32) / 255.0, 1e-4, 1.0 - 1e-4)
+    rest = dequantize(take("u1", (count, num_rest)), rest_low, rest_high, 8)
+
+    vertices = np.zeros(count, dtype=splat_dtype(num_rest, normals=bool(flags & FLAG_NORMALS)))
+    for i, axis in enumerate("xyz"):
+        vertices[axis] = positions[:, i]
+    for i in range(3):
+        vertices[f"f_dc_{i}"] = dc[:, i]
+        vertices[f"scale_{i}"] = scales[:, i]
+    for i in range(num_rest):
+        vertices[f"f_rest_{i}"] = rest[:, i]
+    for i in range(4):
+        vertices[f"rot_{i}"] = rotations[:, i]
+    vertices["opacity"] = np.log(opacity / (1.0 - opacity))
+    return vertices
+
+def attribute_errors(original, decoded):
+    """Max and RMS error per attribute group, each in its natural domain"""
+    def stats(a, b):
+        diff = np.abs(a - b)
+        if diff.size == 0:
+            return 0.0, 0.0
+        return float(diff.max()), float(np.sqrt(np.mean(diff ** 2)))
+
+    num_rest = num_rest_coefficients(original)
+    positions = lambda v: np.stack([v["x"], v["y"], v["z"]], axis=1).astype(np.float32)
+    sigmoid = lambda v: 1.0 / (1.0 + np.exp(-v["opacity"].astype(np.float32)))
+
+    q_original = field_block(original, "rot_", 4)
+    q_original /= np.maximum(np.linalg.norm(q_original, axis=1, keepdims=True), 1e-12)
+    q_decoded = field_block(decoded, "rot_", 4)
+    # Compare against whichever sign of the decoded quaternion is closer
+    q_decoded *= np.where(np.sum(q_original * q_decoded, axis=1, keepdims=True) < 0, -1.0, 1.0)
+
+    return {
+        "position": stats(positions(original), positions(decoded)),
+        "scale": stats(field_block(original, "scale_", 3), field_block(decoded, "scale_", 3)),
+        "rotation": stats(q_original, q_decoded),
+        "sh_dc": stats(field_block(original, "f_dc_", 3), field_block(decoded, "f_dc_", 3)),
+        "sh_rest": stats(field_block(original, "f_rest_", num_rest), field_block(decoded, "f_rest_", num_rest)),
+        "opacity": stats(sigmoid(original), sigmoid(decoded)),
+    }
+
+def encode_file(ply_path, out_path):
+    vertices = read_splat_ply(ply_path)
+    data = encode_splats(vertices)
+    with open(out_path, "wb") as f:
+        f.write(data)
+    errors = attribute_errors(vertices, decode_splats(data))
+    return ply_path.name, os.path.getsize(ply_path), len(data), errors
+
+def decode_file(vvsq_path, out_path):
+    with open(vvsq_path, "rb") as f:
+        vertices = decode_splats(f.read())
+    write_splat_ply(out_path, vertices)
+    return vvsq_path.name, len(vertices)
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize trained splat PLYs into compact .vvsq files and back")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (("encode", "PLY folder -> VVSQ folder"), ("decode", "VVSQ folder -> PLY folder")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("input_path", help="Folder of input files")
+        sub.add_argument("output_path", help="Folder for output files")
+        sub.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+
+    args = parser.parse_args()
+    start_profiling("splat_quant")
+
+    input_path = Path(args.input_path)
+    output_path = Path(args.output_path)
+
+    if not input_path.exists():
+        raise RuntimeError(f"Input path does not exist: {input_path}")
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    if args.command == "encode":
+        inputs = sorted(input_path.glob("*.ply"))
+        outputs = [output_path / f"{p.stem}.vvsq" for p in inputs]
+        worker = encode_file
+    else:
+        inputs = sorted(input_path.glob("*.vvsq"))
+        outputs = [output_path / f"{p.stem}.ply" for p in inputs]
+        worker = decode_file
+
+    if not inputs:
+        raise RuntimeError(f"No input files found in {input_path}")
+
+    print(f"{args.command.capitalize()} {len(inputs)} files with {args.workers or os.cpu_count()} workers...")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(worker, inputs, outputs))
+
+    if args.command == "decode":
+        for name, count in results:
+            print(f"  {name}: {count} splats")
+        print("\n=== All frames processed successfully! ===")
+        return
+
+    total_in = total_out = 0
+    for name, size_in, size_out, errors in results:
+        total_in += size_in
+        total_out += size_out
+        error_text = ", ".join(f"{attr} max {mx:.2e} rms {rms:.2e}" for attr, (mx, rms) in errors.items())
+        print(f"  {name}: {size_in / 1e6:.1f} MB -> {size_out / 1e6:.1f} MB ({size_in / max(size_out, 1):.1f}x)")
+        print(f"      {error_text}")
+
+    print(f"\nTotal: {total_in / 1e6:.1f} MB -> {total_out / 1e6:.1f} MB "
+          f"({total_in / max(total_out, 1):.1f}x)")
+    print("\n=== All frames processed successfully! ===")
+
+if __name__ == "__main__":
+    main()
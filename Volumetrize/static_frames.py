@@ -0,0 +1,132 @@
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from feature_cache import list_colmap_images
+from manifest import list_frame_folders
+from profiling import start_profiling
+
+STATIC_FRAMES_FILE = "_static_frames.json"
+# Frames whose thumbnails are loaded ahead of the comparison; bounds memory on long takes
+PREFETCH_FRAMES = 16
+
+def load_thumbnails(images_path):
+    """
+    Quarter-resolution luminance of each camera image in images_path, as
+    {image name: (H, W) float32}. Views rejected by quality.py are simply absent,
+    and unreadable images are skipped with a warning.
+    """
+    thumbnails = {}
+    for name in list_colmap_images(images_path):
+        # The JPEG/PNG decoder downsamples while decoding, far cheaper than a full read + resize
+        image = cv2.imread(str(images_path / name), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if image is None:
+            print(f"Warning: Could not read image {images_path / name}, skipping this view")
+            continue
+        thumbnails[name] = image.astype(np.float32)
+    return thumbnails
+
+def change_scores(thumbnails, anchor):
+    """
+    Mean absolute luminance difference of every camera both frames have, in 0-255
+    grey levels, as {image name: score}. Empty when the frames share no camera.
+    """
+    scores = {}
+    for name in sorted(thumbnails.keys() & anchor.keys()):
+        if thumbnails[name].shape != anchor[name].shape:
+            scores[name] = np.inf
+        else:
+            scores[name] = float(np.abs(thumbnails[name] - anchor[name]).mean())
+    return scores
+
+def detect_static_frames(frame_folders, threshold=2.0, max_run=0, workers=8):
+    """
+    Compare every frame against the anchor of its run, the last frame that was
+    different enough to be processed. Comparing with the anchor rather than the
+    previous frame stops slow drift from adding up unnoticed.
+
+    Args:
+        frame_folders (list): Sorted frame folders with an images/ subfolder
+        threshold (float): Largest per-camera score for a frame to count as a duplicate
+        max_run (int): Force a new anchor after this many duplicates (0 = no limit)
+        workers (int): Threads decoding thumbnails
+
+    Returns:
+        tuple: ({duplicate frame name: anchor frame name}, {frame name: {image name: score}})
+    """
+    duplicates = {}
+    scores = {}
+    anchor_frame, anchor, run = None, None, 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(frame_folders), PREFETCH_FRAMES):
+            chunk = frame_folders[start:start + PREFETCH_FRAMES]
+            thumbnails_chunk = executor.map(load_thumbnails, [f / "images" for f in chunk])
+
+            for frame_folder, thumbnails in zip(chunk, thumbnails_chunk):
+                if anchor is None:
+                    anchor_frame, anchor, run = frame_folder, thumbnails, 0
+                    continue
+
+                frame_scores = change_scores(thumbnails, anchor)
+                scores[frame_folder.name] = {name: round(score, 3) for name, score in frame_scores.items()}
+
+                # Without a camera in common there is nothing to show the frame is unchanged
+                if frame_scores and max(frame_scores.values()) < threshold and (max_run <= 0 or run < max_run):
+                    duplicates[frame_folder.name] = anchor_frame.name
+                    run += 1
+                else:
+                    anchor_frame, anchor, run = frame_folder, thumbnails, 0
+
+    return duplicates, scores
+
+def load_static_frames(project_path):
+    """{duplicate frame name: source frame name} from a previous analysis, or {} if there is none"""
+    path = Path(project_path) / STATIC_FRAMES_FILE
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["duplicates"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Find frames where nothing moves so alignment and training can reuse earlier results")
+    parser.add_argument("project_path", help="Path to the project folder containing all frames")
+    parser.add_argument("--threshold", type=float, default=2.0, help="Mean grey-level change per camera below which a frame is a duplicate (default: 2.0)")
+    parser.add_argument("--max_run", type=int, default=0, help="Reprocess at least every N frames even if static (default: 0, no limit)")
+    parser.add_argument("--workers", type=int, default=8, help="Number of decoding threads (default: 8)")
+
+    args = parser.parse_args()
+    start_profiling("static_frames")
+
+    project_path = Path(args.project_path)
+    if not project_path.exists():
+        raise RuntimeError(f"Project path does not exist: {project_path}")
+
+    frame_folders = list_frame_folders(project_path)
+    if not frame_folders:
+        raise RuntimeError(f"No frame folders found in {project_path}")
+
+    print(f"Analysing {len(frame_folders)} frames (threshold {args.threshold})...")
+    duplicates, scores = detect_static_frames(frame_folders, args.threshold, args.max_run, args.workers)
+
+    with open(project_path / STATIC_FRAMES_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "threshold": args.threshold,
+            "max_run": args.max_run,
+            "duplicates": duplicates,
+            "scores": scores,
+        }, f, indent=2)
+
+    print(f"\n{len(duplicates)} of {len(frame_folders)} frames are duplicates:")
+    for name, source in duplicates.items():
+        print(f"  {name} -> {source}")
+    print(f"\nWritten to {project_path / STATIC_FRAMES_FILE}")
+
+if __name__ == "__main__":
+    main()
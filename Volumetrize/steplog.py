@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from procstream import OutputSink, RotatingLog, stream_output
+
+_active_log = None
+
+class StepLog:
+    """Append-only JSONL log of external command runs, one record per step"""
+
+    def __init__(self, path, output_dir=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_dir = Path(output_dir) if output_dir else self.path.parent / "_logs"
+        self._lock = threading.Lock()
+
+    def output_log(self, frame, step):
+        """Rotating file that receives the full output of one step"""
+        name = f"{frame}_{step}.log" if frame else f"{step}.log"
+        return RotatingLog(self.output_dir / name)
+
+    def record(self, frame, step, cmd, result):
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "host": socket.gethostname(),
+            "frame": frame,
+            "step": step,
+            "cmd": " ".join(str(c) for c in cmd),
+            "returncode": result.returncode,
+            "wall_s": round(result.wall_time, 3),
+            "cpu_s": None if result.cpu_time is None else round(result.cpu_time, 3),
+            "peak_rss_mb": None if result.peak_rss is None else round(result.peak_rss / (1024 * 1024), 1),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+def open_step_log(path, output_dir=None):
+    """
+    Send the records of every following run_measured call to path, and the full
+    output of each command to output_dir (default: _logs beside the step log).
+    """
+    global _active_log
+    _active_log = StepLog(path, output_dir)
+    print(f"Step log: {_active_log.path}")
+    print(f"Command output logs: {_active_log.output_dir}")
+    return _active_log
+
+class MeasuredResult:
+    def __init__(self, returncode, stdout, stderr, wall_time, cpu_time, peak_rss):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_rss = peak_rss
+
+def _wait_posix(process):
+    # wait4 reaps the child itself, so its rusage is exact even with other children running
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return usage.ru_utime + usage.ru_stime, peak_rss
+
+def _wait_sampled(process, interval=0.5):
+    # No wait4 here (Windows); sample with psutil when it is installed
+    try:
+        import psutil
+    except ImportError:
+        process.wait()
+        return None, None
+
+    try:
+        ps_process = psutil.Process(process.pid)
+    except psutil.Error:
+        process.wait()
+        return None, None
+
+    cpu_time, peak_rss = None, None
+    while True:
+        try:
+            times = ps_process.cpu_times()
+            memory = ps_process.memory_info()
+            cpu_time = times.user + times.system
+            peak_rss = max(peak_rss or 0, getattr(memory, "peak_wset", memory.rss))
+        except psutil.Error:
+            pass
+        try:
+            process.wait(timeout=interval)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+    return cpu_time, peak_rss
+
+def run_measured(cmd, working_dir=None, frame=None, step=None, on_line=None, merge_stderr=False,
+                 tail_lines=200):
+    """
+    Run cmd to completion while measuring wall time, child CPU time and peak RSS.
+
+    Output is streamed without polling: every line goes to on_line and, when a
+    step log is open, to a rotating per-step log file. Only the last tail_lines
+    lines of each stream are kept in memory for error reports.
+
+    Args:
+        cmd (list): Command and arguments
+        working_dir (str): Working directory for the command
+        frame (str): Frame name recorded in the step log
+        step (str): Step name recorded in the step log (default: command name)
+        on_line (callable): Called as on_line(line, "stdout"/"stderr") for every output line
+        merge_stderr (bool): Send stderr into stdout
+        tail_lines (int): Lines of each stream kept for MeasuredResult.stdout/stderr
+
+    Returns:
+        MeasuredResult: return code, output tails and resource usage
+    """
+    cmd = [str(c) for c in cmd]
+    step = step or Path(cmd[0]).stem
+    log = _active_log.output_log(frame, step) if _active_log is not None else None
+    sink = OutputSink(on_line, log, tail_lines)
+
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen(
+            cmd,
+            cwd=working_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE
+        )
+
+        if hasattr(os, "wait4"):
+            # Drain the pipes first; reaping a child that is blocked on a full pipe would hang
+            stream_output(process, sink)
+            cpu_time, peak_rss = _wait_posix(process)
+        else:
+            streamer = threading.Thread(target=stream_output, args=(process, sink))
+            streamer.start()
+            cpu_time, peak_rss = _wait_sampled(process)
+            streamer.join()
+    finally:
+        if log is not None:
+            log.close()
+
+    result = MeasuredResult(
+        process.returncode,
+        sink.tail("stdout"),
+        sink.tail("stderr"),
+        time.perf_counter() - start,
+        cpu_time,
+        peak_rss
+    )
+
+    if _active_log is not None:
+        _active_log.record(frame, step, cmd, result)
+
+    return result
+
+def load_records(log_path):
+    records = []
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+def summarize(log_path, top=10):
+    """Print p50/p95 per step and the frames with the most total wall time"""
+    records = load_records(log_path)
+    if not records:
+        print(f"No records in {log_path}")
+        return
+
+    steps = {}
+    frames = {}
+    for record in records:
+        steps.setdefault(record["step"], []).append(record)
+        if record.get("frame") is not None:
+            frames[record["frame"]] = frames.get(record["frame"], 0.0) + record["wall_s"]
+
+    print(f"Step summary for {log_path} ({len(records)} runs):")
+    print(f"  {'step':<24}{'runs':>6}{'wall p50':>10}{'wall p95':>10}{'cpu p50':>10}{'rss p95 MB':>12}{'failed':>8}")
+    for step, step_records in sorted(steps.items()):
+        wall = np.array([r["wall_s"] for r in step_records])
+        cpu = np.array([r["cpu_s"] for r in step_records if r.get("cpu_s") is not None])
+        rss = np.array([r["peak_rss_mb"] for r in step_records if r.get("peak_rss_mb") is not None])
+        failed = sum(1 for r in step_records if r["returncode"] != 0)
+
+        cpu_p50 = f"{np.percentile(cpu, 50):.1f}" if cpu.size else "-"
+        rss_p95 = f"{np.percentile(rss, 95):.0f}" if rss.size else "-"
+        print(f"  {step:<24}{len(step_records):>6}{np.percentile(wall, 50):>10.1f}"
+              f"{np.percentile(wall, 95):>10.1f}{cpu_p50:>10}{rss_p95:>12}{failed:>8}")
+
+    if frames:
+        print(f"\nSlowest frames (total wall time):")
+        for frame, wall in sorted(frames.items(), key=lambda item: item[1], reverse=True)[:top]:
+            print(f"  {frame}: {wall:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect step timing logs written by the Volumetrize tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary", help="Report p50/p95 per step and the slowest frames")
+    summary_parser.add_argument("log_path", help="Path to the JSONL step log")
+    summary_parser.add_argument("--top", type=int, default=10, help="Number of slowest frames to list (default: 10)")
+
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        log_path = Path(args.log_path)
+        if not log_path.exists():
+            raise RuntimeError(f"Step log does not exist: {log_path}")
+        summarize(log_path, args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+End-to-end runner: canvas video -> tracks -> frames -> alignment -> splats.
+
+Stages form a DAG and run on a thread pool as soon as their dependencies are
+done. Each stage is cached under a key hashed from its parameters, its external
+inputs (size and mtime) and the run tokens of the stages it depends on, so
+changing a training parameter reruns training and what follows it, never
+extraction or alignment.
+
+Example config (YAML):
+
+    work_dir: D:/VV-Datasets/0709-GS
+    canvas_video: D:/VV-Datasets/0709-GS/input.mkv   # omit to start from work_dir/video_tracks
+    stages:
+      crop:     {layout: grid, track_width: 1080, track_height: 1920, num_cols: 4, num_rows: 2}
+                # layout: raw splits a horizontal canvas into lossless .vvraw tracks (rawtrack.py)
+      sync:     {enabled: true}
+      extract:  {image_format: png, quality: 95, max_frames: null, skip_frames: 0}
+                # image_format: png, jpg or an encoder / preset (fastest, balanced, smallest) of VideoProcess/encoders.py
+      quality:  {enabled: false, blur_ratio: 0.4}
+      static:   {enabled: false, threshold: 2.0}
+      align:    {aligner: colmap, level: 1}
+      train:    {postshot_cli: C:/Program Files/Jawset Postshot/bin, profile: Splat3,
+                 iterations: 30000, maxNumSplats: 3000000, antiAliasing: true, jobs: 1}
+      compress: {enabled: false}
+      pack:     {enabled: false}
+      timeline: {enabled: false}   # sparse models of all frames -> sparse_timeline.vvst / .csv
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent
+VIDEO_PROCESS_DIR = ROOT / "VideoProcess"
+VOLUMETRIZE_DIR = ROOT / "Volumetrize"
+# The tools import their siblings directly, so both folders go on the path
+sys.path[:0] = [str(VIDEO_PROCESS_DIR), str(VOLUMETRIZE_DIR)]
+
+from profiling import PROFILE_MODES, stage_boundary, start_profiling
+from steplog import open_step_log, run_measured
+
+CACHE_FILE = "_pipeline_cache.json"
+
+def fingerprint_path(path):
+    """Cheap fingerprint of a file or folder tree: names, sizes and mtimes"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    if path.is_file():
+        stat = path.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f"{os.path.relpath(os.path.join(root, name), path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+class Stage:
+    def __init__(self, name, run, deps=(), inputs=(), outputs=(), params=None, enabled=True):
+        """
+        Args:
+            name (str): Stage name, also its section in the config
+            run (callable): run(stage, paths) doing the work
+            deps (tuple): Names of stages that must finish first
+            inputs (tuple): External files/folders; their fingerprints are part of the cache key
+            outputs (tuple): Files/folders that must exist for a cached result to count
+            params (dict): Stage parameters; part of the cache key
+            enabled (bool): Disabled stages pass through without running
+        """
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.params = params or {}
+        self.enabled = enabled
+
+    def cache_key(self, upstream_tokens):
+        payload = {
+            "stage": self.name,
+            "enabled": self.enabled,
+            "params": self.params,
+            "inputs": {str(p): fingerprint_path(p) for p in self.inputs},
+            "upstream": upstream_tokens,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class PipelineCache:
+    """{stage: {"key", "token", "finished"}} kept in the work folder, written atomically"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def set(self, name, key):
+        """Record a finished stage; the fresh token invalidates everything downstream"""
+        with self._lock:
+            self.entries[name] = {
+                "key": key,
+                "token": uuid.uuid4().hex,
+                "finished": datetime.now().isoformat(timespec="seconds"),
+            }
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            return self.entries[name]["token"]
+
+def run_tool(stage, script, args):
+    """Run a Volumetrize CLI tool, streaming its output prefixed with the stage name"""
+    cmd = [sys.executable, str(VOLUMETRIZE_DIR / script)] + [str(a) for a in args]
+    print(f"[{stage.name}] Running: {' '.join(cmd)}")
+    result = run_measured(cmd, step=stage.name, merge_stderr=True,
+                          on_line=lambda line, _: print(f"[{stage.name}] {line}", flush=True))
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} failed with return code {result.returncode}")
+
+# ---------------- Stages ----------------
+
+def run_crop(stage, paths):
+    import crop_mr
+
+    params = stage.params
+    if params.get("layout", "grid") == "raw":
+        import crop
+        crop.split_horizontal_canvas_video(
+            str(paths["canvas_video"]), str(paths["work_dir"]),
+            params.get("track_width", 720), params.get("track_height", 1280),
+            params.get("num_tracks", 20), params.get("ram_budget_gb"), raw=True)
+        success = any(paths["videos"].glob("*.vvraw"))
+    elif params.get("layout", "grid") == "grid":
+        success = crop_mr.split_grid_canvas_video_ffmpeg(
+            str(paths["canvas_video"]), str(paths["work_dir"]),
+            params.get("track_width", 1080), params.get("track_height", 1920),
+            params.get("num_cols", 4), params.get("num_rows", 2))
+    else:
+        success = crop_mr.split_horizontal_canvas_video_ffmpeg(
+            str(paths["canvas_video"]), str(paths["work_dir"]),
+            params.get("track_width", 720), params.get("track_height", 1280),
+            params.get("num_tracks", 20))
+    if not success:
+        raise RuntimeError("Splitting the canvas video failed")
+
+def run_sync(stage, paths):
+    from rawtrack import find_tracks
+    from SyncOffsets import estimate_sync_offsets, write_sync_offsets
+
+    video_paths = find_tracks(str(paths["videos"]))
+    if not video_paths:
+        raise RuntimeError(f"No .mp4 or .vvraw tracks found in {paths['videos']}")
+    result = estimate_sync_offsets(video_paths, stage.params.get("max_seconds", 60),
+                                   stage.params.get("max_lag_seconds", 10))
+    write_sync_offsets(str(paths["videos"]), result)
+    print(f"[{stage.name}] {result['method']} offsets: {result['offsets']}")
+
+def run_extract(stage, paths):
+    from SyncFrameExtract import extract_synchronized_frames_with_options
+
+    params = stage.params
+    success = extract_synchronized_frames_with_options(
+        str(paths["videos"]), str(paths["project"]),
+        image_format=params.get("image_format", "png"),
+        quality=params.get("quality", 95),
+        max_frames=params.get("max_frames"),
+        skip_frames=params.get("skip_frames", 0),
+        frame_subfolder="images")
+    if not success:
+        raise RuntimeError("Frame extraction failed")
+
+def run_quality(stage, paths):
+    run_tool(stage, "quality.py", [paths["project"], "--exclude",
+                                   "--blur_ratio", stage.params.get("blur_ratio", 0.4),
+                                   "--max_clip", stage.params.get("max_clip", 0.25)])
+
+def run_static(stage, paths):
+    run_tool(stage, "static_frames.py", [paths["project"],
+                                         "--threshold", stage.params.get("threshold", 2.0),
+                                         "--max_run", stage.params.get("max_run", 0)])
+
+def run_align(stage, paths):
+    params = stage.params
+    step_log = ["--step_log", paths["step_log"]]
+    if params.get("aligner", "colmap") == "colmap":
+        args = [paths["project"], "--level", params.get("level", 1)] + step_log
+        if params.get("feature_cache"):
+            args += ["--feature_cache", params["feature_cache"]]
+        if params.get("skip_static"):
+            args += ["--skip_static"]
+        run_tool(stage, "colalign.py", args)
+    else:
+        run_tool(stage, "rsalign.py", ["--project_path", paths["project"], "--rs_exe", params["rs_exe"],
+                                       "--export_path", params["export_path"], "--xml_path", params["xml_path"],
+                                       "--level", params.get("level", 1)] + step_log)
+
+# Settings postshot_train reads from the project's _config.yaml
+TRAIN_CONFIG_KEYS = ("profile", "iterations", "maxNumSplats", "antiAliasing")
+
+def run_train(stage, paths):
+    params = stage.params
+    # Keys set in the stage override an existing _config.yaml, which supplies the rest
+    config_path = paths["project"] / "_config.yaml"
+    train_config = {}
+    if config_path.exists():
+        with open(config_path, "r", encoding="utf-8") as f:
+            train_config = yaml.safe_load(f) or {}
+    train_config.update({key: params[key] for key in TRAIN_CONFIG_KEYS if key in params})
+    missing = [key for key in TRAIN_CONFIG_KEYS if key not in train_config]
+    if missing:
+        raise RuntimeError(f"Training needs {', '.join(missing)} in the train stage of the config or in {config_path}")
+    with open(config_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(train_config, f)
+
+    paths["splats"].mkdir(parents=True, exist_ok=True)
+    args = [paths["project"], "-o", paths["splats"], "--jobs", params.get("jobs", 1),
+            "--step_log", paths["step_log"]]
+    if params.get("postshot_cli"):
+        args += ["--postshot_cli", params["postshot_cli"]]
+    if params.get("skip_static"):
+        args += ["--skip_static"]
+    run_tool(stage, "postshot_train.py", args)
+
+def run_compress(stage, paths):
+    run_tool(stage, "splat_quant.py", ["encode", paths["splats"], paths["splats_vvsq"]])
+
+def run_pack(stage, paths):
+    run_tool(stage, "splat_pack.py", ["pack", paths["splats"], paths["splats_vvsp"]])
+
+def run_timeline(stage, paths):
+    run_tool(stage, "sparse_timeline.py", ["build", paths["project"], paths["sparse_timeline"]])
+
+def build_stages(config):
+    """The pipeline DAG for one take, with parameters from the config's stages section"""
+    work_dir = Path(config["work_dir"]).resolve()
+    settings = config.get("stages") or {}
+    paths = {
+        "work_dir": work_dir,
+        "canvas_video": Path(config["canvas_video"]).resolve() if config.get("canvas_video") else None,
+        # crop_mr writes the tracks to <output>/video_tracks
+        "videos": Path(config.get("videos_dir") or work_dir / "video_tracks").resolve(),
+        "project": work_dir / "frames",
+        "splats": work_dir / "splats",
+        "splats_vvsq": work_dir / "splats_vvsq",
+        "splats_vvsp": work_dir / "splats.vvsp",
+        "sparse_timeline": work_dir / "sparse_timeline.vvst",
+        "step_log": work_dir / "_steplog.jsonl",
+    }
+
+    def stage(name, run, deps=(), inputs=(), outputs=(), default_enabled=True):
+        params = dict(settings.get(name) or {})
+        enabled = params.pop("enabled", default_enabled)
+        return Stage(name, run, deps, inputs, outputs, params, enabled)
+
+    static_enabled = (settings.get("static") or {}).get("enabled", False)
+    for name in ("align", "train"):
+        settings[name] = dict(settings.get(name) or {}, skip_static=static_enabled)
+
+    stages = [
+        stage("crop", run_crop, inputs=[paths["canvas_video"]] if paths["canvas_video"] else [],
+              outputs=[paths["videos"]], default_enabled=paths["canvas_video"] is not None),
+        # Without a crop stage the tracks are an external input
+        stage("sync", run_sync, deps=["crop"],
+              inputs=[] if paths["canvas_video"] else sorted([*paths["videos"].glob("*.mp4"), *paths["videos"].glob("*.vvraw")]),
+              outputs=[paths["videos"] / "sync_offsets.json"]),
+        stage("extract", run_extract, deps=["sync"], outputs=[paths["project"]]),
+        stage("quality", run_quality, deps=["extract"], outputs=[paths["project"] / "_quality.csv"], default_enabled=False),
+        stage("static", run_static, deps=["quality"], outputs=[paths["project"] / "_static_frames.json"], default_enabled=False),
+        stage("align", run_align, deps=["static"], outputs=[paths["project"]]),
+        stage("train", run_train, deps=["align"], outputs=[paths["splats"]]),
+        # Both read the trained PLYs only, so they run side by side
+        stage("compress", run_compress, deps=["train"], outputs=[paths["splats_vvsq"]], default_enabled=False),
+        stage("pack", run_pack, deps=["train"], outputs=[paths["splats_vvsp"]], default_enabled=False),
+        stage("timeline", run_timeline, deps=["align"], outputs=[paths["sparse_timeline"]], default_enabled=False),
+    ]
+    return {s.name: s for s in stages}, paths
+
+def select_stages(stages, until=None):
+    """All stages, or only `until` and the stages it depends on"""
+    if until is None:
+        return list(stages)
+    if until not in stages:
+        raise RuntimeError(f"Unknown stage: {until}")
+    selected, pending = set(), [until]
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(stages[name].deps)
+    return [name for name in stages if name in selected]
+
+def run_pipeline(stages, paths, cache, names, force=(), jobs=2, dry_run=False):
+    """
+    Run the selected stages, each as soon as its dependencies are done.
+
+    Returns:
+        list: names of failed stages (stages after a failure are not run)
+    """
+    tokens = {}
+    failed = []
+    pending = list(names)
+    running = {}
+
+    def start(name):
+        stage = stages[name]
+        upstream = {dep: tokens[dep] for dep in stage.deps if dep in tokens}
+        key = stage.cache_key(upstream)
+        cached = cache.get(name)
+
+        if not stage.enabled:
+            print(f"[{name}] disabled")
+            # Pass-through: the token only changes when the stage is switched on or off
+            if cached is not None and cached["key"] == key:
+                return key, cached["token"], False
+            return key, uuid.uuid4().hex if dry_run else cache.set(name, key), False
+
+        up_to_date = (cached is not None and cached["key"] == key and name not in force
+                      and all(Path(p).exists() for p in stage.outputs))
+        if up_to_date:
+            print(f"[{name}] up to date (finished {cached['finished']})")
+            return key, cached["token"], False
+        if dry_run:
+            print(f"[{name}] would run")
+            return key, uuid.uuid4().hex, False
+
+        print(f"\n[{name}] === running ===")
+        stage.run(stage, paths)
+        stage_boundary(name)
+        return key, cache.set(name, key), True
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            ready = [name for name in pending
+                     if all(dep in tokens or dep not in names for dep in stages[name].deps)]
+            for name in ready:
+                pending.remove(name)
+                running[executor.submit(start, name)] = name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    _, tokens[name], _ = future.result()
+                except Exception as e:
+                    print(f"[{name}] failed: {e}")
+                    failed.append(name)
+
+            if failed:
+                # Let running stages finish, start nothing new
+                pending = []
+
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the volumetric video pipeline with per-stage caching")
+    parser.add_argument("config", help="Pipeline config (YAML)")
+    parser.add_argument("--until", help="Run only this stage and the stages it depends on")
+    parser.add_argument("--force", nargs="+", default=[], help="Rerun these stages even if cached")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run at the same time (default: 2)")
+    parser.add_argument("--dry_run", action="store_true", help="Show which stages would run")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="Profile every stage; output goes to work_dir/_profiles")
+    parser.add_argument("--profile_memory", action="store_true", help="Take tracemalloc snapshots at stage boundaries")
+
+    args = parser.parse_args()
+
+    config_path = Path(args.config)
+    if not config_path.exists():
+        raise RuntimeError(f"Config file not found: {config_path}")
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+
+    stages, paths = build_stages(config)
+    for name in args.force:
+        if name not in stages:
+            raise RuntimeError(f"Unknown stage: {name}")
+
+    paths["work_dir"].mkdir(parents=True, exist_ok=True)
+    if not args.dry_run:
+        open_step_log(paths["step_log"])
+
+    # Set through the environment so the stage scripts started from here profile themselves too
+    if args.profile:
+        os.environ["VVP_PROFILE"] = args.profile
+    if args.profile_memory:
+        os.environ["VVP_PROFILE_MEMORY"] = "1"
+    if args.profile or args.profile_memory:
+        os.environ.setdefault("VVP_PROFILE_DIR", str(paths["work_dir"] / "_profiles"))
+    start_profiling("pipeline")
+
+    cache = PipelineCache(paths["work_dir"] / CACHE_FILE)
+    names = select_stages(stages, args.until)
+    print(f"Stages: {' -> '.join(names)}\n")
+
+    failed = run_pipeline(stages, paths, cache, names, set(args.force), args.jobs, args.dry_run)
+    if failed:
+        raise RuntimeError(f"Pipeline failed at: {', '.join(failed)}")
+
+    print("\n=== Pipeline completed successfully! ===")
+
+if __name__ == "__main__":
+    main()
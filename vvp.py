@@ -0,0 +1,235 @@
+"""
+Single entry point for the VideoProcess and Volumetrize tools.
+
+    python vvp.py split   canvas.mkv D:/take_1 --layout grid
+    python vvp.py preview D:/take_1/video_tracks D:/take_1/frames
+    python vvp.py extract D:/take_1/video_tracks D:/take_1/frames --format png --subfolder images
+    python vvp.py encoders D:/take_1/video_tracks
+    python vvp.py align   colmap D:/take_1/frames --level 1
+    python vvp.py train   D:/take_1/frames -o D:/take_1/splats
+    python vvp.py timeline build D:/take_1/frames D:/take_1/sparse_timeline.vvst
+
+Only argparse is imported up front. Each subcommand validates its arguments,
+then imports the modules it needs (cv2, numpy, yaml, ...), so --help and
+argument errors return immediately and batch scripts that start this thousands
+of times do not pay for libraries they never use.
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# The tools import their siblings directly, so both folders go on the path
+sys.path[:0] = [os.path.join(ROOT, "VideoProcess"), os.path.join(ROOT, "Volumetrize")]
+
+def positive_int(text):
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {text}")
+    return value
+
+def non_negative_int(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be zero or more, got {text}")
+    return value
+
+def quality_value(text):
+    value = int(text)
+    if not 1 <= value <= 100:
+        raise argparse.ArgumentTypeError(f"must be between 1 and 100, got {text}")
+    return value
+
+def require_file(parser, path, what):
+    if not os.path.isfile(path):
+        parser.error(f"{what} does not exist: {path}")
+
+# Camera track extensions: videos and rawtrack.RAW_EXTENSION (not imported, it pulls in cv2)
+TRACK_EXTENSIONS = (".mp4", ".vvraw")
+
+def require_videos(parser, folder):
+    """The folder must hold .mp4 or .vvraw tracks; checked by name only, nothing is opened"""
+    if not os.path.isdir(folder):
+        parser.error(f"Video folder does not exist: {folder}")
+    if not any(name.lower().endswith(TRACK_EXTENSIONS) for name in os.listdir(folder)):
+        parser.error(f"No .mp4 or .vvraw tracks found in {folder}")
+
+# (track width, track height) per split layout, as in crop_mr.py and SingleFrameExtract.py
+SPLIT_TRACK_SIZES = {"grid": (1080, 1920), "horizontal": (720, 1280), "frames": (1280, 720)}
+
+def run_split(args, parser):
+    require_file(parser, args.input_video, "Input video")
+    default_width, default_height = SPLIT_TRACK_SIZES[args.layout]
+    args.track_width = args.track_width or default_width
+    args.track_height = args.track_height or default_height
+
+    if args.raw:
+        if args.layout != "horizontal":
+            parser.error("--raw is only supported with --layout horizontal")
+        import crop
+        crop.split_horizontal_canvas_video(args.input_video, args.output_dir, args.track_width, args.track_height,
+                                           args.num_tracks, raw=True)
+        return any(name.endswith(".vvraw") for name in os.listdir(os.path.join(args.output_dir, "video_tracks")))
+
+    if args.layout == "frames":
+        from SingleFrameExtract import extract_and_split_frames_organized
+        extract_and_split_frames_organized(args.input_video, args.output_dir, args.track_width, args.track_height)
+        return True
+
+    import crop_mr
+    if args.layout == "grid":
+        return crop_mr.split_grid_canvas_video_ffmpeg(args.input_video, args.output_dir, args.track_width,
+                                                      args.track_height, args.num_cols, args.num_rows)
+    return crop_mr.split_horizontal_canvas_video_ffmpeg(args.input_video, args.output_dir, args.track_width,
+                                                        args.track_height, args.num_tracks)
+
+def require_encoder(parser, name):
+    """Image formats are checked against encoders.py once it is imported (it needs cv2)"""
+    from encoders import encoder_names
+    if name.lower() not in encoder_names():
+        parser.error(f"Unknown format '{name}', expected one of {', '.join(encoder_names())}")
+
+def run_extract(args, parser):
+    require_videos(parser, args.input_folder)
+    require_encoder(parser, args.format)
+
+    if args.sync:
+        from rawtrack import find_tracks
+        from SyncOffsets import estimate_sync_offsets, write_sync_offsets
+        result = estimate_sync_offsets(find_tracks(args.input_folder))
+        print(f"Sync offsets ({result['method']}): {result['offsets']}")
+        write_sync_offsets(args.input_folder, result)
+
+    from SyncFrameExtract import extract_synchronized_frames_with_options
+    return extract_synchronized_frames_with_options(
+        args.input_folder, args.output_folder, image_format=args.format, quality=args.quality,
+        max_frames=args.max_frames, skip_frames=args.skip_frames, frame_subfolder=args.subfolder,
+        workers=args.workers, ram_budget_gb=args.ram_budget_gb)
+
+def run_preview(args, parser):
+    require_videos(parser, args.input_folder)
+    require_encoder(parser, args.format)
+
+    from SyncFrameExtract import preview_extraction_plan
+    preview_extraction_plan(args.input_folder, args.output_folder, args.format, args.quality,
+                            args.samples, compare_formats=not args.no_compare)
+    return True
+
+def run_encoders(args, parser):
+    require_videos(parser, args.input_folder)
+    for name in args.encoders or []:
+        require_encoder(parser, name)
+
+    from encoders import benchmark_encoders
+    benchmark_encoders(args.input_folder, args.samples, args.encoders, args.quality)
+    return True
+
+def run_tool_main(module_name, tool_args):
+    """Hand the remaining arguments to a tool's own argparse main()"""
+    module = __import__(module_name)
+    sys.argv = [f"vvp {module_name}", *tool_args]
+    module.main()
+    return True
+
+def run_align(args, parser):
+    return run_tool_main("colalign" if args.aligner == "colmap" else "rsalign", args.tool_args)
+
+def run_train(args, parser):
+    return run_tool_main("postshot_train", args.tool_args)
+
+def run_timeline(args, parser):
+    return run_tool_main("sparse_timeline", args.tool_args)
+
+# Subcommands that hand their arguments to a tool's own parser, with the number of
+# positionals vvp reads first. argparse.REMAINDER does not capture arguments that
+# start with '-' (vvp train -h, vvp train --jobs 2 ...), so these are split off
+# before parsing instead.
+FORWARDED_COMMANDS = {"align": 1, "train": 0, "timeline": 0}
+
+def parse_arguments(parser, argv):
+    if argv and argv[0] in FORWARDED_COMMANDS:
+        split = 1 + FORWARDED_COMMANDS[argv[0]]
+        args = parser.parse_args(argv[:split])
+        args.tool_args = argv[split:]
+        return args
+    return parser.parse_args(argv)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Volumetric video processing tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    split = subparsers.add_parser("split", help="Split a canvas recording into one video per camera")
+    split.add_argument("input_video", help="Canvas video with all cameras side by side")
+    split.add_argument("output_dir", help="Output folder; tracks go to output_dir/video_tracks")
+    split.add_argument("--layout", choices=["grid", "horizontal", "frames"], default="grid",
+                       help="grid / horizontal: split into .mp4 tracks with ffmpeg; "
+                            "frames: vertically stacked video to per-camera image folders (default: grid)")
+    split.add_argument("--track_width", type=positive_int, help="Width of one camera (default: 1080 grid, 720 horizontal, 1280 frames)")
+    split.add_argument("--track_height", type=positive_int, help="Height of one camera (default: 1920 grid, 1280 horizontal, 720 frames)")
+    split.add_argument("--num_cols", type=positive_int, default=4, help="Grid columns (default: 4)")
+    split.add_argument("--num_rows", type=positive_int, default=2, help="Grid rows (default: 2)")
+    split.add_argument("--num_tracks", type=positive_int, default=20, help="Cameras in a horizontal canvas (default: 20)")
+    split.add_argument("--raw", action="store_true",
+                       help="Write lossless memory-mapped .vvraw tracks instead of .mp4 (horizontal layout, large files)")
+    split.set_defaults(handler=run_split, command_parser=split)
+
+    extract = subparsers.add_parser("extract", help="Extract synchronized frames from the camera tracks")
+    extract.add_argument("input_folder", help="Folder with one .mp4 or .vvraw track per camera")
+    extract.add_argument("output_folder", help="Folder receiving the frame_XXXXX folders")
+    extract.add_argument("--format", default="png",
+                         help="png, jpg, a preset (fastest, balanced, smallest) or an encoder from encoders.py (default: png)")
+    extract.add_argument("--quality", type=quality_value, default=95, help="JPEG quality (default: 95)")
+    extract.add_argument("--max_frames", type=positive_int, default=None, help="Extract at most this many frames")
+    extract.add_argument("--skip_frames", type=non_negative_int, default=0, help="Frames skipped between extractions (default: 0)")
+    extract.add_argument("--subfolder", default="", help="Write images to frame_XXXXX/<subfolder>, e.g. images for colalign")
+    extract.add_argument("--sync", action="store_true", help="Estimate per-video sync offsets before extracting")
+    extract.add_argument("--workers", type=positive_int, default=1,
+                         help="Encoding threads; above 1 all videos are decoded in parallel (default: 1)")
+    extract.add_argument("--ram_budget_gb", type=float, default=4.0,
+                         help="RAM for decoded frames waiting to be encoded when --workers > 1 (default: 4.0)")
+    extract.set_defaults(handler=run_extract, command_parser=extract)
+
+    preview = subparsers.add_parser("preview", help="Estimate extraction size and time without extracting")
+    preview.add_argument("input_folder", help="Folder with one .mp4 or .vvraw track per camera")
+    preview.add_argument("output_folder", nargs="?", default=None, help="Planned output folder, checked for free space")
+    preview.add_argument("--format", default="png", help="Planned image format, as for extract (default: png)")
+    preview.add_argument("--quality", type=quality_value, default=95, help="Planned JPEG quality (default: 95)")
+    preview.add_argument("--samples", type=positive_int, default=3, help="Frames encoded per video (default: 3)")
+    preview.add_argument("--no_compare", action="store_true", help="Skip the comparison of other formats")
+    preview.set_defaults(handler=run_preview, command_parser=preview)
+
+    encoders = subparsers.add_parser("encoders", help="Benchmark the image encoders on sample frames of a take")
+    encoders.add_argument("input_folder", help="Folder with one .mp4 or .vvraw track per camera")
+    encoders.add_argument("--samples", type=positive_int, default=3, help="Frames sampled per video (default: 3)")
+    encoders.add_argument("--encoders", nargs="+", default=None, help="Encoders or presets to compare (default: all encoders)")
+    encoders.add_argument("--quality", type=quality_value, default=95, help="JPEG quality (default: 95)")
+    encoders.set_defaults(handler=run_encoders, command_parser=encoders)
+
+    align = subparsers.add_parser("align", help="Align all frames (arguments after the aligner go to colalign.py / rsalign.py)")
+    align.add_argument("aligner", choices=["colmap", "rs"], help="colmap: colalign.py, rs: rsalign.py (RealityScan)")
+    align.add_argument("tool_args", nargs=argparse.REMAINDER, help="Arguments of the aligner; use '-h' for its help")
+    align.set_defaults(handler=run_align, command_parser=align)
+
+    train = subparsers.add_parser("train", help="Train splats with Postshot (arguments go to postshot_train.py)")
+    train.add_argument("tool_args", nargs=argparse.REMAINDER, help="Arguments of postshot_train.py; use '-h' for its help")
+    train.set_defaults(handler=run_train, command_parser=train)
+
+    timeline = subparsers.add_parser("timeline", help="Collect all sparse models into one file (arguments go to sparse_timeline.py)")
+    timeline.add_argument("tool_args", nargs=argparse.REMAINDER, help="Arguments of sparse_timeline.py; use '-h' for its help")
+    timeline.set_defaults(handler=run_timeline, command_parser=timeline)
+
+    return parser
+
+def main():
+    parser = build_parser()
+    args = parse_arguments(parser, sys.argv[1:])
+
+    from profiling import start_profiling
+    start_profiling(f"vvp_{args.command}")
+
+    if not args.handler(args, args.command_parser):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()